@@ -22,6 +22,8 @@ const LIVE_URL =
 const MOCK_URL =
   process.env.NEXT_PUBLIC_MOCK_SERVER_URL || defaultUrl(3002);
 const SOURCE_STORAGE_KEY = "vibeSyncDataSource";
+// With a multi-tenant Python client, the user whose vibe this dashboard shows
+const VIBE_USER = process.env.NEXT_PUBLIC_VIBE_USER;
 
 export function useVibeSync() {
   const [rawState, setRawState] = useState<VibeState>({
@@ -44,7 +46,7 @@ export function useVibeSync() {
   // Connect socket whenever source changes
   useEffect(() => {
     const url = source === "mock" ? MOCK_URL : LIVE_URL;
-    const socket: Socket = io(url);
+    const socket: Socket = io(url, VIBE_USER ? { query: { user: VIBE_USER } } : undefined);
 
     socket.on("connect", () => {
       setConnected(true);
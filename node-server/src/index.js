@@ -1,6 +1,8 @@
 // Node.js server that receives vibe data from the Python client, processes it with an AI gateway, 
 // evaluates it against user-defined thresholds, and emits updates to connected frontends via Socket.io. 
 // It also caches the latest state for new clients and logs all events for debugging and monitoring purposes.
+// A multi-tenant Python client tags each event with `user`; that user's state is kept separately and
+// sent only to the Socket.io room of frontends that connected with ?user=<id>.
 
 require("dotenv").config();
 const { createServer } = require("http");
@@ -18,60 +20,112 @@ const io = new Server(httpServer, {
 });
 
 const ai = new AIGateway();
-const alerts = new AlertManager(THRESHOLD);
+// Alert deduplication is per user: one user's mismatch must not suppress another's
+const alertManagers = new Map();
+function alertsFor(user) {
+  if (!alertManagers.has(user)) {
+    alertManagers.set(user, new AlertManager(THRESHOLD));
+  }
+  return alertManagers.get(user);
+}
 
-// Cache the latest state so new frontends get it immediately
-let currentState = { type: "IDLE", message: "System starting..." };
+const INITIAL_STATE = { type: "IDLE", message: "System starting..." };
+
+// Latest state per user ("" for a single-user client) so new frontends get it immediately
+const states = new Map();
+
+const userOf = (data) => (data && typeof data.user === "string" ? data.user : "");
+const room = (user) => `user:${user}`;
+
+function publish(user, state) {
+  states.set(user, state);
+  if (user) {
+    io.to(room(user)).emit("vibe_update", state);
+  } else {
+    io.emit("vibe_update", state);
+  }
+}
 
 io.on("connection", (socket) => {
   logger.info(`Client connected: ${socket.id}`);
 
+  // Frontends pick a user with ?user=<id>; without one they follow the single-user client
+  const subscribedUser = typeof socket.handshake.query.user === "string" ? socket.handshake.query.user : "";
+  if (subscribedUser) {
+    socket.join(room(subscribedUser));
+  }
+
   // Send last known state on connect
-  socket.emit("vibe_update", currentState);
+  socket.emit("vibe_update", states.get(subscribedUser) || INITIAL_STATE);
+
+  // Last full context per user from this client, so compact deltas can be merged into it
+  const lastContexts = new Map();
 
-  socket.on("vibe_idle", () => {
-    logger.info("Received vibe_idle from Python client");
-    currentState = {
+  socket.on("vibe_idle", (data) => {
+    const user = userOf(data);
+    logger.info(`Received vibe_idle from Python client${user ? ` for ${user}` : ""}`);
+    lastContexts.delete(user);
+    publish(user, {
       type: "IDLE",
       message: "No music currently playing",
-    };
-    io.emit("vibe_update", currentState);
+    });
+  });
+
+  socket.on("vibe_context_delta", async (delta) => {
+    const user = userOf(delta);
+    const lastContext = lastContexts.get(user);
+    if (lastContext === undefined) {
+      logger.warn("Received vibe_context_delta before any vibe_context, ignoring");
+      return;
+    }
+    logger.info(`Received vibe_context_delta: ${Object.keys(delta).join(", ")}`);
+    await handleContext({ ...lastContext, ...delta });
   });
 
   socket.on("vibe_context", async (data) => {
+    await handleContext(data);
+  });
+
+  async function handleContext(data) {
+    const user = userOf(data);
+    lastContexts.set(user, data);
     const { track, events, recent_tracks } = data;
-    logger.info(`Received vibe_context: ${track.name} by ${track.artist}`);
+    logger.info(`Received vibe_context${user ? ` for ${user}` : ""}: ${track.name} by ${track.artist}`);
 
     try {
       // If no events, nothing to compare — auto-synced
       if (!events || events.length === 0) {
-        currentState = {
+        publish(user, {
           type: "SYNCED",
           compatibility_score: 100,
           music_mood: "N/A",
           task_intent: "No upcoming events",
           now_playing: track,
           timestamp: new Date().toISOString(),
-        };
-        io.emit("vibe_update", currentState);
+        });
         return;
       }
 
-      // Analyze with AI
-      const aiResponse = await ai.analyzeCompatibility(track, events, recent_tracks);
+      // The Python client pre-scores clear-cut contexts locally; only ambiguous ones need the AI
+      let aiResponse;
+      if (data.local_analysis) {
+        logger.info(`Using local pre-score ${data.local_analysis.compatibility_score} (confidence ${data.local_analysis.confidence}), skipping AI`);
+        aiResponse = data.local_analysis;
+      } else {
+        aiResponse = await ai.analyzeCompatibility(track, events, recent_tracks);
+      }
 
       // Evaluate alert
-      const result = alerts.evaluate(aiResponse, events);
+      const result = alertsFor(user).evaluate(aiResponse, events);
 
       if (result !== null) {
         result.now_playing = track;
-        currentState = result;
-        io.emit("vibe_update", currentState);
+        publish(user, result);
       }
     } catch (e) {
       logger.error(`Processing error: ${e.message}`);
     }
-  });
+  }
 
   socket.on("disconnect", () => {
     logger.info(`Client disconnected: ${socket.id}`);
@@ -0,0 +1,85 @@
+"""Off-device LED render benchmark.
+
+Renders frames through the real segment/compositor/write pipeline onto
+MockPixelStrip and reports frame time against LED count, to check render cost
+scales linearly with strip length.
+
+Usage: python bench_render.py [--frames N] [--json]
+"""
+
+import argparse
+import json
+import time
+
+from led_controller import MockPixelStrip, StripOutput
+from segments import parse_segments
+
+LED_COUNTS = (16, 150, 300, 600, 1200)
+FADE_TIME = 0.4
+
+SCENARIOS = {
+    # One segment pulsing: uniform frames, slice-fill write path
+    "pulse": lambda n: "main:0:0-{}:vibe".format(n - 1),
+    # Vibe + meter segments: non-uniform frames, per-pixel write path
+    "segments": lambda n: "left:0:0-{}:vibe,meter:0:{}-{}:meter".format(n // 2 - 1, n // 2, n - 1),
+}
+
+MISMATCH = ("VIBE_MISMATCH", "HIGH", 30)
+SYNCED = ("SYNCED", None, 90)
+
+
+def bench(scenario, num_pixels, frames, crossfade):
+    output = StripOutput(MockPixelStrip(num_pixels))
+    output.segments = parse_segments(SCENARIOS[scenario](num_pixels), [num_pixels], FADE_TIME)
+
+    now = 0.0
+    for segment in output.segments:
+        segment.set_state(SYNCED, now)
+    output.render(now)
+    for segment in output.segments:
+        segment.set_state(MISMATCH, now)
+
+    # Step simulated time so a crossfade run stays inside the fade window
+    step = (FADE_TIME / (frames + 1)) if crossfade else 1 / 50
+    started = time.perf_counter()
+    for _ in range(frames):
+        now += step
+        output.render(now)
+    elapsed = time.perf_counter() - started
+
+    frame_us = elapsed / frames * 1e6
+    return {
+        "scenario": scenario + ("+crossfade" if crossfade else ""),
+        "leds": num_pixels,
+        "frame_us": round(frame_us, 2),
+        "us_per_led": round(frame_us / num_pixels, 4),
+        "shows": output.strip.show_count,
+    }
+
+
+def run(frames=500):
+    results = []
+    for scenario in SCENARIOS:
+        for crossfade in (False, True):
+            for num_pixels in LED_COUNTS:
+                results.append(bench(scenario, num_pixels, frames, crossfade))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.frames)
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{'scenario':<22}{'leds':>6}{'frame us':>12}{'us/led':>10}{'shows':>8}")
+    for r in results:
+        print(f"{r['scenario']:<22}{r['leds']:>6}{r['frame_us']:>12}{r['us_per_led']:>10}{r['shows']:>8}")
+
+
+if __name__ == "__main__":
+    main()
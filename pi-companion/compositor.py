@@ -0,0 +1,100 @@
+"""Layer compositing and cross-fades for LED frames.
+
+Frames are raw RGB bytes for the whole strip. Blending is vectorized over the
+full buffer: with NumPy when it's installed, otherwise with bytes.translate()
+lookup tables plus one big-integer add, both of which run in C. There are no
+per-pixel Python loops either way.
+"""
+
+from functools import lru_cache
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# Alpha resolution for the pure-Python path (one pair of lookup tables per step)
+ALPHA_STEPS = 64
+
+
+def blend(under, over, alpha):
+    """(1 - alpha) * under + alpha * over, per byte, for two equal-length frames."""
+    if alpha <= 0:
+        return under
+    if alpha >= 1:
+        return over
+    if HAS_NUMPY:
+        mixed = np.frombuffer(under, np.uint8) * (1 - alpha) + np.frombuffer(over, np.uint8) * alpha
+        return mixed.astype(np.uint8).tobytes()
+
+    lut_under, lut_over = _blend_luts(round(alpha * ALPHA_STEPS))
+    scaled_under = under.translate(lut_under)
+    scaled_over = over.translate(lut_over)
+    # floor(u * (1 - a)) + floor(o * a) <= 255, so no byte lane can carry into the next:
+    # adding the buffers as two big integers adds every byte pair at once
+    total = int.from_bytes(scaled_under, "big") + int.from_bytes(scaled_over, "big")
+    return total.to_bytes(len(under), "big")
+
+
+@lru_cache(maxsize=ALPHA_STEPS + 1)
+def _blend_luts(step):
+    weight = step / ALPHA_STEPS
+    return (
+        bytes(int(v * (1 - weight)) for v in range(256)),
+        bytes(int(v * weight) for v in range(256)),
+    )
+
+
+class Layer:
+    """A frame table drawn on top of the layers below it, fading in from fade_start."""
+
+    def __init__(self, table, fade_start=None):
+        self.table = table
+        self.fade_start = fade_start
+
+    def alpha(self, now, fade_time):
+        if self.fade_start is None or fade_time <= 0:
+            return 1.0
+        return min(1.0, (now - self.fade_start) / fade_time)
+
+
+class Compositor:
+    """Stack of pattern layers rendered into one strip frame.
+
+    Switching pattern pushes a new layer that fades in over fade_time seconds;
+    once it is fully opaque the layers beneath it are dropped. A switch in the
+    middle of a fade simply stacks another layer, so nothing jumps.
+    """
+
+    # A burst of state changes can't grow the stack without bound
+    MAX_LAYERS = 4
+
+    def __init__(self, fade_time):
+        self.fade_time = fade_time
+        self._layers = []
+
+    @property
+    def is_static(self):
+        """True when the output won't change until the next set_pattern()."""
+        return len(self._layers) == 1 and self._layers[0].table.is_static
+
+    def set_pattern(self, table, now):
+        if not self._layers or self.fade_time <= 0:
+            self._layers = [Layer(table)]
+            return
+        self._layers.append(Layer(table, fade_start=now))
+        del self._layers[:-self.MAX_LAYERS]
+
+    def frame_at(self, now):
+        # Anything under a fully faded-in layer is invisible
+        for i in range(len(self._layers) - 1, 0, -1):
+            if self._layers[i].alpha(now, self.fade_time) >= 1.0:
+                del self._layers[:i]
+                self._layers[0].fade_start = None
+                break
+
+        frame = self._layers[0].table.frame_at(now)
+        for layer in self._layers[1:]:
+            frame = blend(frame, layer.table.frame_at(now), layer.alpha(now, self.fade_time))
+        return frame
@@ -10,6 +10,8 @@ load_dotenv()
 
 # Node.js server connection
 NODE_SERVER_URL = os.getenv("NODE_SERVER_URL", "http://localhost:3001")
+# With a multi-tenant Python client, the user whose vibe these LEDs show
+VIBE_USER = os.getenv("VIBE_USER")
 
 # LED strip configuration
 LED_COUNT = int(os.getenv("LED_COUNT", "16"))
@@ -19,3 +21,18 @@ LED_FREQ_HZ = 800000   # WS2812B signal frequency
 LED_DMA = 10            # DMA channel for generating signal
 LED_INVERT = False      # True to invert signal (when using NPN transistor level shift)
 LED_CHANNEL = 0         # PWM channel (0 for GPIO18)
+LED_FPS = int(os.getenv("LED_FPS", "50"))  # target animation frame rate
+LED_CROSSFADE_TIME = float(os.getenv("LED_CROSSFADE_TIME", "0.4"))  # seconds to fade between states
+
+# Optional second strip. It needs its own peripheral and DMA channel, e.g. SPI
+# on GPIO10 or PCM on GPIO21; LED_COUNT_1=0 disables it. Never use DMA channel 5:
+# current Pi OS uses it for the SD card, and sharing it corrupts the card.
+LED_COUNT_1 = int(os.getenv("LED_COUNT_1", "0"))
+LED_PIN_1 = int(os.getenv("LED_PIN_1", "10"))
+LED_DMA_1 = int(os.getenv("LED_DMA_1", "11"))
+LED_CHANNEL_1 = int(os.getenv("LED_CHANNEL_1", "0"))
+
+# Named segments, "name:strip:start-end:pattern" separated by commas, with
+# pattern one of vibe | meter | off. Empty = one vibe segment per strip.
+# e.g. LED_SEGMENTS=desk:0:0-119:vibe,meter:0:120-149:meter,shelf:1:0-299:vibe
+LED_SEGMENTS = os.getenv("LED_SEGMENTS", "")
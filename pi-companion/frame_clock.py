@@ -0,0 +1,44 @@
+"""Frame-deadline pacing for the LED render thread.
+
+Deadlines are absolute on the monotonic clock, so render cost doesn't add up
+into drift, and frames that can't be rendered in time are counted as dropped
+and skipped rather than played late.
+"""
+
+import time
+
+
+class FrameClock:
+    """Paces a render loop to a target frame rate."""
+
+    def __init__(self, fps):
+        self.period = 1.0 / fps
+        self.frames = 0
+        self.dropped = 0
+        self._next_deadline = time.monotonic()
+
+    def reset(self):
+        """Restart the deadline sequence from now (e.g. after a state change)."""
+        self._next_deadline = time.monotonic()
+
+    def wait(self, waiter, timeout=None):
+        """Wait on `waiter` (anything with wait(timeout) -> bool) until the next
+        frame deadline.
+
+        `timeout` overrides the frame deadline, e.g. for static frames that only
+        need re-rendering on a state change. Returns True if woken early.
+        """
+        self.frames += 1
+        self._next_deadline += self.period
+        now = time.monotonic()
+        if now >= self._next_deadline:
+            # Render overran one or more frame slots: skip them instead of catching up
+            missed = int((now - self._next_deadline) / self.period)
+            self.dropped += missed
+            self._next_deadline += missed * self.period
+            return False
+
+        woken = waiter.wait(timeout if timeout is not None else self._next_deadline - now)
+        if woken or timeout is not None:
+            self.reset()
+        return woken
@@ -0,0 +1,81 @@
+"""Precomputed animation frame tables for the LED strip.
+
+A table holds one full animation cycle for a (pattern, color, cycle_time) as raw
+RGB byte frames covering the whole strip. Tables are built once when the vibe
+state changes, so the render loop only indexes into them.
+"""
+
+import math
+import sys
+from array import array
+from functools import lru_cache
+
+# Frames precomputed per second of animation
+TABLE_FPS = 50
+
+# 32-bit unsigned typecode, and where R/G/B land inside a native-endian 0x00RRGGBB word
+U32 = "I" if array("I").itemsize == 4 else "L"
+_R, _G, _B = (2, 1, 0) if sys.byteorder == "little" else (1, 2, 3)
+
+
+class FrameTable:
+    """One animation cycle of full-strip RGB frames (3 bytes per pixel)."""
+
+    def __init__(self, frames, cycle_time=None):
+        self.frames = frames
+        self.cycle_time = cycle_time
+
+    @property
+    def is_static(self):
+        return len(self.frames) == 1
+
+    def frame_at(self, t):
+        """Frame for time `t` (seconds, any monotonic clock)."""
+        if self.is_static:
+            return self.frames[0]
+        phase = (t % self.cycle_time) / self.cycle_time
+        return self.frames[int(phase * len(self.frames)) % len(self.frames)]
+
+
+@lru_cache(maxsize=32)
+def build_table(pattern, color, num_pixels, cycle_time=None, min_level=0.0):
+    """Build (or reuse) the frame table for a pattern.
+
+    pattern: "solid" for a single static frame, or "wave" for a sine fade between
+    min_level and full brightness over cycle_time seconds (breathe / pulse).
+    """
+    if pattern == "solid":
+        return FrameTable((bytes(color) * num_pixels,))
+
+    steps = max(2, round(cycle_time * TABLE_FPS))
+    frames = []
+    for i in range(steps):
+        # Sine wave mapped to min_level–1.0 brightness, starting from the dimmest point
+        level = min_level + (1 - min_level) * ((math.sin(2 * math.pi * i / steps - math.pi / 2) + 1) / 2)
+        pixel = bytes(int(c * level) for c in color)
+        frames.append(pixel * num_pixels)
+    return FrameTable(tuple(frames), cycle_time)
+
+
+def pack_rgb(frame):
+    """RGB bytes -> array of 24-bit 0xRRGGBB colors (the rpi_ws281x Color layout).
+
+    Uses extended-slice copies, so the cost is a handful of C-level memory moves
+    rather than a Python loop over pixels.
+    """
+    buf = bytearray(len(frame) // 3 * 4)
+    buf[_R::4] = frame[0::3]
+    buf[_G::4] = frame[1::3]
+    buf[_B::4] = frame[2::3]
+    return array(U32, bytes(buf))
+
+
+def rgb_to_color(r, g, b):
+    """Single 24-bit color value, same as rpi_ws281x.Color(r, g, b)."""
+    return (r << 16) | (g << 8) | b
+
+
+@lru_cache(maxsize=64)
+def build_bar(color, num_pixels, lit):
+    """Static frame with the first `lit` pixels in `color` and the rest off."""
+    return FrameTable((bytes(color) * lit + bytes(3) * (num_pixels - lit),))
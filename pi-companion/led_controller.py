@@ -1,150 +1,241 @@
-"""LED controller for WS2812B NeoPixel strip.
+"""LED controller for WS2812B NeoPixel strips.
 
-Drives LEDs with color and animation patterns based on vibe state.
+Drives LEDs with color and animation patterns based on vibe state, split into
+named segments across one or two strips.
 """
 
 import threading
 import time
-import math
+from array import array
 
 try:
-    from rpi_ws281x import PixelStrip, Color
+    from rpi_ws281x import PixelStrip
+    import _rpi_ws281x as ws
     HAS_HARDWARE = True
 except ImportError:
     HAS_HARDWARE = False
 
-from config import LED_COUNT, LED_PIN, LED_BRIGHTNESS, LED_FREQ_HZ, LED_DMA, LED_INVERT, LED_CHANNEL
+from config import (
+    LED_COUNT, LED_PIN, LED_BRIGHTNESS, LED_FREQ_HZ, LED_DMA, LED_INVERT, LED_CHANNEL,
+    LED_COUNT_1, LED_PIN_1, LED_DMA_1, LED_CHANNEL_1,
+    LED_FPS, LED_CROSSFADE_TIME, LED_SEGMENTS,
+)
+from frame_clock import FrameClock
+from frames import U32, pack_rgb, rgb_to_color
+from segments import parse_segments
+from state_mailbox import LatencyHistogram, StateMailbox
 
-# Vibe state color definitions (R, G, B)
-COLORS = {
-    "IDLE": (255, 255, 255),          # White
-    "SYNCED": (0, 255, 0),            # Green
-    "LOW": (255, 255, 0),             # Yellow
-    "MEDIUM": (255, 140, 0),          # Orange
-    "HIGH": (255, 0, 0),              # Red
-}
-
-# Pulse cycle times in seconds per severity
-PULSE_SPEEDS = {
-    "LOW": 1.0,
-    "MEDIUM": 0.5,
-    "HIGH": 0.25,
-}
+# Static frames only need re-rendering on a state change; this is just a safety net
+STATIC_FRAME_TIMEOUT = 1.0
 
 
 class MockPixelStrip:
-    """Stand-in for PixelStrip when rpi_ws281x is unavailable (dev/testing)."""
+    """Stand-in for PixelStrip when rpi_ws281x is unavailable (dev/testing).
+
+    Mirrors the hardware write paths (slice fill, per-pixel led_set, show) and
+    counts them, so the render pipeline can be benchmarked off-device.
+    """
 
     def __init__(self, *args, **kwargs):
-        self._leds = [(0, 0, 0)] * (args[0] if args else 16)
+        self._leds = array(U32, [0]) * (args[0] if args else 16)
+        self.show_count = 0
+        self.pixel_writes = 0
 
     def begin(self):
         pass
 
+    def __setitem__(self, pos, color):
+        # Same semantics as PixelStrip: a slice is filled with one color
+        if isinstance(pos, slice):
+            count = len(range(*pos.indices(len(self._leds))))
+            self._leds[pos] = array(U32, [color]) * count
+        else:
+            self._leds[pos] = color
+        self.pixel_writes += 1
+
     def setPixelColor(self, i, color):
-        self._leds[i] = color
+        self[i] = color
+
+    def getPixelColor(self, i):
+        return self._leds[i]
+
+    @staticmethod
+    def led_set(strip, i, color):
+        """Counterpart of the C-level ws.ws2811_led_set(channel, i, color)."""
+        strip._leds[i] = color
+        strip.pixel_writes += 1
 
     def show(self):
-        pass
+        self.show_count += 1
 
     def numPixels(self):
         return len(self._leds)
 
 
-def _color(r, g, b):
-    """Create a color value compatible with both real and mock strips."""
-    if HAS_HARDWARE:
-        return Color(r, g, b)
-    return (r, g, b)
-
+class StripOutput:
+    """One physical strip: its frame buffer and the write path to the hardware."""
 
-class LedController:
-    """Controls WS2812B LED strip based on vibe state updates."""
+    def __init__(self, strip):
+        self.strip = strip
+        self.strip.begin()
+        self.num_pixels = strip.numPixels()
+        self.buffer = bytearray(3 * self.num_pixels)
+        self.segments = []
 
-    def __init__(self):
+        # Per-pixel writes skip PixelStrip.setPixelColor/__setitem__ and call the
+        # library's C setter directly
         if HAS_HARDWARE:
-            self.strip = PixelStrip(
-                LED_COUNT, LED_PIN, LED_FREQ_HZ, LED_DMA,
-                LED_INVERT, LED_BRIGHTNESS, LED_CHANNEL,
-            )
+            self._led_set, self._led_target = ws.ws2811_led_set, strip._channel
+        else:
+            self._led_set, self._led_target = MockPixelStrip.led_set, strip
+        self._last_frame = None
+        self.frames_skipped = 0
+
+    def render(self, now):
+        """Re-render dirty segments into the buffer and push it if anything changed."""
+        for segment in self.segments:
+            frame = segment.render(now)
+            if frame is not None:
+                self.buffer[3 * segment.start:3 * segment.end] = frame
+        self.write(bytes(self.buffer))
+
+    def write(self, frame):
+        """Push an RGB byte frame (3 bytes per pixel) to the strip.
+
+        Frames identical to the last one shown are skipped entirely, so static
+        states cost no writes and no show(). Uniform frames go out as a single
+        slice fill; others are packed once and written without per-pixel
+        setPixelColor calls.
+        """
+        if frame == self._last_frame:
+            self.frames_skipped += 1
+            return
+
+        n = self.num_pixels
+        if frame == frame[:3] * n:
+            self.strip[0:n] = rgb_to_color(frame[0], frame[1], frame[2])
         else:
-            print("[LedController] rpi_ws281x not available — using mock strip")
-            self.strip = MockPixelStrip(LED_COUNT)
+            led_set, target = self._led_set, self._led_target
+            for i, color in enumerate(pack_rgb(frame)):
+                led_set(target, i, color)
+        self.strip.show()
+        self._last_frame = frame
 
-        self.strip.begin()
 
-        # Current state
-        self._vibe_type = "IDLE"
-        self._severity = None
-        self._compatibility_score = 100
+def _create_strips():
+    """PixelStrip (or mock) for the main strip and, if configured, the second one."""
+    configs = [(LED_COUNT, LED_PIN, LED_DMA, LED_CHANNEL)]
+    if LED_COUNT_1 > 0:
+        configs.append((LED_COUNT_1, LED_PIN_1, LED_DMA_1, LED_CHANNEL_1))
+
+    if not HAS_HARDWARE:
+        print("[LedController] rpi_ws281x not available — using mock strip")
+        return [MockPixelStrip(count) for count, _, _, _ in configs]
+    return [
+        PixelStrip(count, pin, LED_FREQ_HZ, dma, LED_INVERT, LED_BRIGHTNESS, channel)
+        for count, pin, dma, channel in configs
+    ]
+
+
+def _log_state(data):
+    """Log an applied vibe state (on the render thread, after the frame is out)."""
+    label = f"{data.get('type', 'UNKNOWN')}"
+    if data.get("severity"):
+        label += f" ({data['severity']})"
+    if data.get("compatibility_score", "") != "":
+        label += f" score={data['compatibility_score']}"
+    print(f"[LedController] Showing: {label}")
+
+
+class LedController:
+    """Controls WS2812B LED strips based on vibe state updates."""
+
+    def __init__(self, segment_spec=LED_SEGMENTS):
+        self.outputs = [StripOutput(strip) for strip in _create_strips()]
+        self.strip = self.outputs[0].strip
+        self.segments = parse_segments(segment_spec, [o.num_pixels for o in self.outputs], LED_CROSSFADE_TIME)
+        for segment in self.segments:
+            self.outputs[segment.strip_index].segments.append(segment)
+
+        # State updates arrive through a latest-value mailbox, so the Socket.io
+        # thread never contends with the render thread
+        self._mailbox = StateMailbox()
+        self.latency = LatencyHistogram()
 
         # Animation thread control
         self._running = True
-        self._lock = threading.Lock()
+        self._clock = FrameClock(LED_FPS)
         self._thread = threading.Thread(target=self._animation_loop, daemon=True)
         self._thread.start()
 
     def update_state(self, vibe_state: dict):
-        """Update LED state from a vibe_update event payload."""
-        with self._lock:
-            self._vibe_type = vibe_state.get("type", "IDLE")
-            self._severity = vibe_state.get("severity")
-            self._compatibility_score = vibe_state.get("compatibility_score", 100)
+        """Post a vibe_update event payload for the render thread. Never blocks."""
+        self._mailbox.put(vibe_state)
 
     def _animation_loop(self):
-        """Continuously renders the current animation frame."""
+        """Renders the current animation frame, paced to LED_FPS.
+
+        A state change cross-fades each segment from its old pattern to its new
+        one over LED_CROSSFADE_TIME; only segments that changed are re-rendered.
+        update_state() wakes the loop immediately, so a new state starts showing
+        without waiting out the current frame.
+        """
+        state = ("IDLE", None, 100)
+        for segment in self.segments:
+            segment.set_state(state, time.monotonic())
+        update = None
         while self._running:
-            with self._lock:
-                vibe_type = self._vibe_type
-                severity = self._severity
-                score = self._compatibility_score
-
-            if vibe_type == "IDLE":
-                self._breathe(*COLORS["IDLE"])
-            elif vibe_type == "SYNCED":
-                # Brightness scales with compatibility score (50-100% of configured brightness)
-                brightness_factor = 0.5 + (score / 200)
-                r, g, b = COLORS["SYNCED"]
-                r = int(r * brightness_factor)
-                g = int(g * brightness_factor)
-                b = int(b * brightness_factor)
-                self._fill(r, g, b)
-                time.sleep(0.05)
-            elif vibe_type == "VIBE_MISMATCH" and severity:
-                color_key = severity if severity in COLORS else "LOW"
-                speed = PULSE_SPEEDS.get(severity, 1.0)
-                self._pulse(*COLORS[color_key], cycle_time=speed)
-            else:
-                self._fill(50, 50, 50)
-                time.sleep(0.1)
+            now = time.monotonic()
+            if update is not None:
+                vibe_state = update[1]
+                new_state = (
+                    vibe_state.get("type", "IDLE"),
+                    vibe_state.get("severity"),
+                    vibe_state.get("compatibility_score", 100),
+                )
+                if new_state != state:
+                    for segment in self.segments:
+                        segment.set_state(new_state, now)
+                    state = new_state
+
+            for output in self.outputs:
+                output.render(now)
+
+            if update is not None:
+                self.latency.record((time.monotonic() - update[0]) * 1000)
+                _log_state(update[1])
+
+            update = self._mailbox.take()
+            if update is not None or not self._running:
+                continue
+            static = all(segment.is_static for segment in self.segments)
+            self._clock.wait(self._mailbox, STATIC_FRAME_TIMEOUT if static else None)
+            update = self._mailbox.take()
+
+    def stats(self):
+        """Render loop counters: frames paced/dropped/skipped, updates coalesced in the
+        mailbox, and the receive-to-render latency histogram."""
+        return {
+            "frames": self._clock.frames,
+            "dropped": self._clock.dropped,
+            "skipped": sum(output.frames_skipped for output in self.outputs),
+            "coalesced": self._mailbox.coalesced,
+            "latency": self.latency.summary(),
+        }
 
     def _fill(self, r, g, b):
         """Set all LEDs to a solid color."""
-        color = _color(r, g, b)
-        for i in range(self.strip.numPixels()):
-            self.strip.setPixelColor(i, color)
-        self.strip.show()
-
-    def _breathe(self, r, g, b, cycle_time=3.0):
-        """Slow breathing animation — fade in and out."""
-        t = time.time() % cycle_time
-        # Sine wave mapped to 0.05–1.0 brightness range
-        factor = 0.05 + 0.95 * ((math.sin(2 * math.pi * t / cycle_time - math.pi / 2) + 1) / 2)
-        self._fill(int(r * factor), int(g * factor), int(b * factor))
-        time.sleep(0.03)
-
-    def _pulse(self, r, g, b, cycle_time=1.0):
-        """Pulsing animation — sharp on/off cycle."""
-        t = time.time() % cycle_time
-        # Sine wave mapped to 0.1–1.0 brightness
-        factor = 0.1 + 0.9 * ((math.sin(2 * math.pi * t / cycle_time - math.pi / 2) + 1) / 2)
-        self._fill(int(r * factor), int(g * factor), int(b * factor))
-        time.sleep(0.02)
+        for output in self.outputs:
+            output.write(bytes((r, g, b)) * output.num_pixels)
 
     def cleanup(self):
         """Turn off all LEDs and stop the animation thread."""
         self._running = False
+        self._mailbox.interrupt()
         if self._thread.is_alive():
             self._thread.join(timeout=2)
         self._fill(0, 0, 0)
+        latency = self.latency.summary()
+        print(f"[LedController] {latency['count']} updates, receive-to-render "
+              f"p50<={latency['p50_ms']}ms p99<={latency['p99_ms']}ms max={latency['max_ms']}ms")
         print("[LedController] LEDs off, cleanup complete")
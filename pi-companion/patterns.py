@@ -0,0 +1,66 @@
+"""Vibe-state LED patterns.
+
+Each pattern maps the current vibe state to a frame table for a run of pixels,
+so segments of different lengths can show different patterns of the same state.
+"""
+
+from frames import build_table, build_bar
+
+# Vibe state color definitions (R, G, B)
+COLORS = {
+    "IDLE": (255, 255, 255),          # White
+    "SYNCED": (0, 255, 0),            # Green
+    "LOW": (255, 255, 0),             # Yellow
+    "MEDIUM": (255, 140, 0),          # Orange
+    "HIGH": (255, 0, 0),              # Red
+}
+
+# Pulse cycle times in seconds per severity
+PULSE_SPEEDS = {
+    "LOW": 1.0,
+    "MEDIUM": 0.5,
+    "HIGH": 0.25,
+}
+
+NEUTRAL = (50, 50, 50)
+
+
+def vibe_pattern(vibe_type, severity, score, num_pixels):
+    """Breathe while idle, solid when synced, pulse on mismatch."""
+    if vibe_type == "IDLE":
+        # Slow breathing, 0.05–1.0 brightness
+        return build_table("wave", COLORS["IDLE"], num_pixels, cycle_time=3.0, min_level=0.05)
+    if vibe_type == "SYNCED":
+        # Brightness scales with compatibility score (50-100% of configured brightness)
+        brightness_factor = 0.5 + (score / 200)
+        color = tuple(int(c * brightness_factor) for c in COLORS["SYNCED"])
+        return build_table("solid", color, num_pixels)
+    if vibe_type == "VIBE_MISMATCH" and severity:
+        # Pulsing, 0.1–1.0 brightness, faster for higher severity
+        color_key = severity if severity in COLORS else "LOW"
+        speed = PULSE_SPEEDS.get(severity, 1.0)
+        return build_table("wave", COLORS[color_key], num_pixels, cycle_time=speed, min_level=0.1)
+    return build_table("solid", NEUTRAL, num_pixels)
+
+
+def meter_pattern(vibe_type, severity, score, num_pixels):
+    """Bar graph of the compatibility score in the state's color."""
+    if vibe_type == "SYNCED":
+        color = COLORS["SYNCED"]
+    elif vibe_type == "VIBE_MISMATCH" and severity:
+        color = COLORS.get(severity, COLORS["LOW"])
+    else:
+        return build_table("solid", NEUTRAL, num_pixels)
+    lit = round(num_pixels * max(0, min(100, score or 0)) / 100)
+    return build_bar(color, num_pixels, lit)
+
+
+def off_pattern(vibe_type, severity, score, num_pixels):
+    return build_table("solid", (0, 0, 0), num_pixels)
+
+
+PATTERNS = {
+    "vibe": vibe_pattern,
+    "meter": meter_pattern,
+    "off": off_pattern,
+}
@@ -0,0 +1,74 @@
+"""Named LED segments.
+
+A segment is a pixel range on one physical strip with its own pattern and its
+own compositor, so segments cross-fade independently and a static segment is
+not re-rendered while its neighbours animate.
+"""
+
+from compositor import Compositor
+from patterns import PATTERNS
+
+
+class Segment:
+    """A [start, end) pixel range on strip `strip_index` showing `pattern`."""
+
+    def __init__(self, name, strip_index, start, end, pattern, fade_time):
+        if pattern not in PATTERNS:
+            raise ValueError(f"Unknown LED pattern '{pattern}' for segment '{name}'")
+        self.name = name
+        self.strip_index = strip_index
+        self.start = start
+        self.end = end
+        self.pattern = pattern
+        self._compositor = Compositor(fade_time)
+        self._table = None
+        self._needs_render = True
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def is_static(self):
+        return not self._needs_render and self._compositor.is_static
+
+    def set_state(self, state, now):
+        """Switch to the pattern for a new vibe state (cross-fading if it differs)."""
+        table = PATTERNS[self.pattern](*state, len(self))
+        if table is not self._table:
+            self._compositor.set_pattern(table, now)
+            self._table = table
+            self._needs_render = True
+
+    def render(self, now):
+        """This segment's frame, or None when it is unchanged since the last render."""
+        if self.is_static:
+            return None
+        frame = self._compositor.frame_at(now)
+        self._needs_render = False
+        return frame
+
+
+def parse_segments(spec, strip_counts, fade_time):
+    """Parse "name:strip:start-end:pattern,..." into Segments.
+
+    An empty spec gives one "main" vibe segment per strip. Ranges are inclusive
+    and must fit their strip.
+    """
+    if not spec.strip():
+        return [
+            Segment("main" if i == 0 else f"strip{i}", i, 0, count, "vibe", fade_time)
+            for i, count in enumerate(strip_counts)
+        ]
+
+    segments = []
+    for entry in spec.split(","):
+        try:
+            name, strip_index, pixel_range, pattern = (part.strip() for part in entry.split(":"))
+            first, last = (int(p) for p in pixel_range.split("-"))
+            strip_index = int(strip_index)
+        except ValueError:
+            raise ValueError(f"Bad LED segment '{entry}', expected name:strip:start-end:pattern")
+        if not 0 <= strip_index < len(strip_counts) or not 0 <= first <= last < strip_counts[strip_index]:
+            raise ValueError(f"LED segment '{name}' doesn't fit strip {strip_index}")
+        segments.append(Segment(name, strip_index, first, last + 1, pattern, fade_time))
+    return segments
@@ -0,0 +1,90 @@
+"""Latest-value-wins handoff of vibe states from the Socket.io thread to the
+LED render thread, plus receive-to-render latency tracking.
+"""
+
+import bisect
+import threading
+import time
+
+
+class StateMailbox:
+    """Single-slot mailbox: the newest state replaces any the renderer hasn't taken.
+
+    put() only swaps one tuple reference (atomic under the GIL) and sets an
+    Event, so the Socket.io thread never touches a lock the render loop holds
+    while drawing, and a burst of updates coalesces to its last state.
+    """
+
+    def __init__(self):
+        self._slot = None
+        self._seq = 0
+        self._taken_seq = 0
+        self._wakeup = threading.Event()
+        self.coalesced = 0
+
+    def put(self, value):
+        """Post a new state (called from the single Socket.io receive thread)."""
+        if self._slot is not None and self._slot[0] > self._taken_seq:
+            self.coalesced += 1
+        self._seq += 1
+        self._slot = (self._seq, time.monotonic(), value)
+        self._wakeup.set()
+
+    def take(self):
+        """(received_at, value) for a state newer than the last one taken, else None."""
+        slot = self._slot
+        if slot is None or slot[0] <= self._taken_seq:
+            return None
+        self._taken_seq = slot[0]
+        return slot[1], slot[2]
+
+    def has_pending(self):
+        slot = self._slot
+        return slot is not None and slot[0] > self._taken_seq
+
+    def wait(self, timeout=None):
+        """Block until put() or interrupt(), or timeout. Returns True if woken."""
+        woken = self._wakeup.wait(timeout)
+        self._wakeup.clear()
+        return woken
+
+    def interrupt(self):
+        """Wake the waiting renderer without posting a state (e.g. on shutdown)."""
+        self._wakeup.set()
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of latencies in milliseconds."""
+
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.total = 0
+        self.max_ms = 0.0
+
+    def record(self, ms):
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p):
+        """Upper bound (ms) of the bucket containing the p-th percentile."""
+        if self.total == 0:
+            return None
+        rank = p / 100 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.BUCKETS_MS[i] if i < len(self.BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self):
+        return {
+            "count": self.total,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 2),
+            "buckets": dict(zip([f"<={b}" for b in self.BUCKETS_MS] + ["inf"], self.counts)),
+        }
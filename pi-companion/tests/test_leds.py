@@ -0,0 +1,127 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import compositor
+from compositor import blend
+from frame_clock import FrameClock
+from frames import build_bar, build_table, pack_rgb, rgb_to_color
+from segments import Segment
+from state_mailbox import StateMailbox
+
+UNDER = bytes(range(256)) * 3
+OVER = bytes(reversed(range(256))) * 3
+
+
+def _reference_blend(under, over, alpha):
+    return bytes(int(u * (1 - alpha)) + int(o * alpha) for u, o in zip(under, over))
+
+
+def test_wave_table_starts_dim_peaks_mid_cycle_and_wraps():
+    table = build_table("wave", (200, 100, 0), 3, cycle_time=1.0, min_level=0.2)
+
+    assert len(table.frames) == 50
+    assert all(len(frame) == 9 for frame in table.frames)
+    assert table.frame_at(0) == bytes((40, 20, 0)) * 3
+    assert table.frame_at(0.5) == bytes((200, 100, 0)) * 3
+    # Any monotonic time maps into the cycle
+    assert table.frame_at(1.0) == table.frame_at(0)
+    assert table.frame_at(1234.5) == table.frame_at(0.5)
+
+
+def test_static_tables():
+    solid = build_table("solid", (1, 2, 3), 4)
+    assert solid.is_static
+    assert solid.frame_at(99.9) == bytes((1, 2, 3)) * 4
+
+    bar = build_bar((9, 8, 7), 4, 1)
+    assert bar.frame_at(0) == bytes((9, 8, 7)) + bytes(9)
+
+
+def test_pack_rgb_matches_ws281x_color_layout():
+    frame = bytes((1, 2, 3, 255, 0, 16, 0, 0, 0))
+
+    assert list(pack_rgb(frame)) == [0x010203, 0xFF0010, 0]
+    assert list(pack_rgb(frame)) == [rgb_to_color(1, 2, 3), rgb_to_color(255, 0, 16), rgb_to_color(0, 0, 0)]
+
+
+@pytest.mark.parametrize("alpha", [0, 0.25, 0.5, 1])
+def test_blend_matches_reference(monkeypatch, alpha):
+    monkeypatch.setattr(compositor, "HAS_NUMPY", False)
+
+    # Exact, including 255 + 255 lanes, where a carry would spill into the next byte
+    full = bytes([255]) * 6
+    assert blend(UNDER, OVER, alpha) == _reference_blend(UNDER, OVER, alpha)
+    assert blend(full, full, alpha) == _reference_blend(full, full, alpha)
+
+
+@pytest.mark.parametrize("alpha", [0, 0.5, 1])
+def test_numpy_blend_agrees_with_reference(monkeypatch, alpha):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr(compositor, "HAS_NUMPY", True)
+
+    # NumPy rounds the sum rather than each term, so lanes can differ by one
+    for got, want in zip(blend(UNDER, OVER, alpha), _reference_blend(UNDER, OVER, alpha)):
+        assert abs(got - want) <= 1
+
+
+def test_mailbox_coalesces_to_the_newest_state():
+    mailbox = StateMailbox()
+    for state in ("IDLE", "SYNCED", "VIBE_MISMATCH"):
+        mailbox.put(state)
+
+    assert mailbox.wait(0)
+    assert mailbox.has_pending()
+    _, state = mailbox.take()
+    assert state == "VIBE_MISMATCH"
+    assert mailbox.coalesced == 2
+    assert mailbox.take() is None
+    assert not mailbox.has_pending()
+
+
+def test_mailbox_wakes_a_waiting_renderer():
+    mailbox = StateMailbox()
+    threading.Timer(0.01, mailbox.put, args=("SYNCED",)).start()
+
+    assert mailbox.wait(5)
+    assert mailbox.take()[1] == "SYNCED"
+
+
+def test_frame_clock_counts_and_skips_overrun_frames():
+    now = [100.0]
+    with patch("frame_clock.time.monotonic", lambda: now[0]):
+        clock = FrameClock(fps=4)
+        waiter = MagicMock()
+        waiter.wait.return_value = False
+
+        # A 1s render stall at 4 fps overruns this frame's slot and three more
+        now[0] += 1.0
+        assert clock.wait(waiter) is False
+        assert clock.dropped == 3
+        waiter.wait.assert_not_called()
+
+        # Back on schedule: the next frame waits out its slot instead of catching up
+        clock.wait(waiter)
+        assert clock.dropped == 3
+        assert clock.frames == 2
+        assert waiter.wait.call_args.args[0] == pytest.approx(0.25)
+
+
+def test_segment_renders_only_when_its_frame_changes():
+    segment = Segment("main", 0, 0, 4, "vibe", fade_time=1.0)
+    synced = ("SYNCED", None, 100)
+
+    segment.set_state(synced, now=0)
+    assert segment.render(0) == bytes((0, 255, 0)) * 4
+    assert segment.render(0.1) is None
+
+    # The same state again is the same table: nothing to redraw
+    segment.set_state(synced, now=0.2)
+    assert segment.render(0.2) is None
+
+    # A new state is redrawn every frame while it fades in, then goes quiet
+    segment.set_state(("UNKNOWN", None, 0), now=1)
+    assert segment.render(1.5) not in (None, bytes((0, 255, 0)) * 4)
+    assert segment.render(2.5) == bytes((50, 50, 50)) * 4
+    assert segment.render(3) is None
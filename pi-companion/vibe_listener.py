@@ -5,7 +5,7 @@ Mirrors the pattern in python-client/emitter.py but as a receiver.
 
 import socketio
 
-from config import NODE_SERVER_URL
+from config import NODE_SERVER_URL, VIBE_USER
 from led_controller import LedController
 
 
@@ -36,21 +36,15 @@ class VibeListener:
 
         @self.sio.on("vibe_update")
         def on_vibe_update(data):
-            vibe_type = data.get("type", "UNKNOWN")
-            severity = data.get("severity", "")
-            score = data.get("compatibility_score", "")
-            label = f"{vibe_type}"
-            if severity:
-                label += f" ({severity})"
-            if score != "":
-                label += f" score={score}"
-            print(f"[VibeListener] Received: {label}")
+            # Hand off and return: the LED controller's mailbox coalesces bursts,
+            # and logging happens on the render thread once the state is shown
             self.led.update_state(data)
 
     def connect(self):
         """Connect to the Node.js server."""
-        print(f"[VibeListener] Connecting to {NODE_SERVER_URL} ...")
-        self.sio.connect(NODE_SERVER_URL)
+        url = f"{NODE_SERVER_URL}?user={VIBE_USER}" if VIBE_USER else NODE_SERVER_URL
+        print(f"[VibeListener] Connecting to {url} ...")
+        self.sio.connect(url)
 
     def wait(self):
         """Block until disconnected."""
@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from unittest.mock import MagicMock, patch
+
+import config
+from tests.mock_data import (
+    MOCK_AUDIO_FEATURES,
+    MOCK_CALENDAR_RESPONSE,
+    MOCK_RECENTLY_PLAYED,
+    MOCK_SPOTIFY_PLAYING,
+)
+
+# offline benchmark for the Python client: drives poll_cycle through real SpotifyClient, CalendarClient
+# and Emitter instances whose network edges are replaced by canned tests/mock_data.py responses with
+# injectable latency, then runs the pi-companion LED render benchmark, and reports everything as JSON.
+#
+# usage (from python-client/): python -m benchmarks.bench_poll_cycle [--cycles N] [--spotify-ms MS]
+#                              [--calendar-ms MS] [--output results.json] [--skip-leds]
+
+PI_COMPANION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "pi-companion")
+
+PLAYS_START_MS = 1771300000000
+
+SCENARIOS = {
+    # Same track every cycle: warm caches, unchanged contexts suppressed by the emitter
+    "steady": 1000000,
+    # A new track (and artist) every 5 cycles: cache misses and real emits
+    "changing": 5,
+    # A new track every cycle: worst case for lookups and emits
+    "cold": 1,
+}
+
+
+class FakeSpotifyAPI:
+    """Stands in for spotipy.Spotify: canned responses after `latency` seconds, calls counted."""
+
+    def __init__(self, latency, track_every):
+        self.latency = latency
+        self.track_every = track_every
+        self.cycle = 0
+        self.calls = Counter()
+
+    def _call(self, name):
+        self.calls[name] += 1
+        time.sleep(self.latency)
+
+    def _track_number(self):
+        return self.cycle // self.track_every
+
+    def current_user_playing_track(self):
+        self._call("current_user_playing_track")
+        n = self._track_number()
+        item = dict(MOCK_SPOTIFY_PLAYING["item"], id=f"track{n}",
+                    artists=[{"id": f"artist{n}", "name": f"Artist {n}"}])
+        return dict(MOCK_SPOTIFY_PLAYING, item=item, progress_ms=60000, duration_ms=200000)
+
+    def current_user_recently_played(self, limit=50, after=None):
+        self._call("current_user_recently_played")
+        # Every finished track is one play, spaced a second apart
+        n = self._track_number()
+        items = []
+        for played in range(n - 1, max(-1, n - 1 - limit), -1):
+            played_at_ms = PLAYS_START_MS + played * 1000
+            if after is not None and played_at_ms <= after:
+                break
+            entry = MOCK_RECENTLY_PLAYED["items"][played % len(MOCK_RECENTLY_PLAYED["items"])]
+            items.append({
+                "track": dict(entry["track"], id=f"track{played}", name=f"Track {played}"),
+                "played_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(played_at_ms / 1000)) + ".000Z",
+            })
+        return {"items": items}
+
+    def artist(self, artist_id):
+        self._call("artist")
+        return {"id": artist_id, "genres": ["canadian pop", "pop"]}
+
+    def artists(self, artist_ids):
+        self._call("artists")
+        return {"artists": [{"id": a, "genres": ["dance pop", "pop"]} for a in artist_ids]}
+
+    def audio_features(self, track_ids):
+        self._call("audio_features")
+        return [dict(MOCK_AUDIO_FEATURES[0], id=t) for t in track_ids]
+
+
+class FakeCalendarService:
+    """Stands in for the googleapiclient calendar service."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = Counter()
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        request = MagicMock()
+
+        def execute(http=None):
+            self.calls["events.list"] += 1
+            time.sleep(self.latency)
+            return MOCK_CALENDAR_RESPONSE
+
+        request.execute.side_effect = execute
+        return request
+
+
+class FakeSocket:
+    """Stands in for socketio.AsyncClient, measuring what would go over the wire."""
+
+    def __init__(self, *args, **kwargs):
+        self.connected = True
+        self.emits = Counter()
+        self.bytes_emitted = 0
+
+    def event(self, handler):
+        return handler
+
+    async def connect(self, *args, **kwargs):
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+    async def emit(self, event, data):
+        self.emits[event] += 1
+        self.bytes_emitted += len(json.dumps([event, data]).encode())
+
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))]
+
+
+async def _run_cycles(main, spotify, calendar, emitter, api, cycles):
+    latencies = []
+    for cycle in range(cycles):
+        api.cycle = cycle
+        started = time.perf_counter()
+        await main.poll_cycle(spotify, calendar, emitter)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def bench_poll_cycle(scenario, cycles, spotify_latency, calendar_latency):
+    """Run `cycles` poll cycles against fresh clients and fresh on-disk caches."""
+    import main
+    import spotify_client
+    from calendar_client import CalendarClient
+    from emitter import Emitter
+    from spotify_client import SpotifyClient
+
+    api = FakeSpotifyAPI(spotify_latency, SCENARIOS[scenario])
+    service = FakeCalendarService(calendar_latency)
+
+    with tempfile.TemporaryDirectory() as state_dir, \
+            patch.multiple(
+                config,
+                GENRE_CACHE_PATH=os.path.join(state_dir, "genres.sqlite"),
+                AUDIO_FEATURES_CACHE_PATH=os.path.join(state_dir, "features.sqlite"),
+                PLAY_LOG_PATH=os.path.join(state_dir, "play_log.jsonl"),
+                CALENDAR_SYNC_STATE_PATH=os.path.join(state_dir, "calendar_sync.json"),
+                GOOGLE_TOKEN_PATH=os.path.join(state_dir, "google_token.json"),
+                GOOGLE_CALENDAR_IDS=["primary"],
+                CALENDAR_INCREMENTAL_SYNC=False,
+                EMIT_SPILL_PATH=None,
+                # Cycles run back to back, far faster than real polling; don't let the
+                # client-side token bucket turn that into throttling sleeps
+                SPOTIFY_MAX_REQUESTS_PER_WINDOW=10 ** 6,
+            ), \
+            patch.object(spotify_client, "CACHE_PATH", os.path.join(state_dir, ".cache")), \
+            patch("spotify_client.SpotifyOAuth"), \
+            patch("spotify_client.spotipy.Spotify", return_value=api), \
+            patch("calendar_client.build", return_value=service), \
+            patch("calendar_client.Credentials"), \
+            patch("calendar_client.os.path.exists", return_value=True), \
+            patch("emitter.socketio.AsyncClient", FakeSocket):
+        spotify = SpotifyClient()
+        calendar = CalendarClient()
+        emitter = Emitter(config.NODE_SERVER_URL)
+        latencies = asyncio.run(_run_cycles(main, spotify, calendar, emitter, api, cycles))
+
+    api_calls = api.calls + service.calls
+    return {
+        "scenario": scenario,
+        "cycles": cycles,
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "api_calls_per_cycle": round(sum(api_calls.values()) / cycles, 2),
+        "api_calls": dict(sorted(api_calls.items())),
+        "emits": dict(emitter.sio.emits),
+        "bytes_emitted": emitter.sio.bytes_emitted,
+        "bytes_per_cycle": round(emitter.sio.bytes_emitted / cycles, 1),
+    }
+
+
+def bench_leds(frames):
+    """LED frame times from pi-companion/bench_render.py, run in its own directory and interpreter
+    (its config module would clash with ours)."""
+    try:
+        result = subprocess.run(
+            [sys.executable, "bench_render.py", "--json", "--frames", str(frames)],
+            cwd=PI_COMPANION_DIR, capture_output=True, text=True, check=True, timeout=600,
+        )
+        # Only the last line is the JSON payload; earlier ones are the controller's own logging
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    except (OSError, subprocess.SubprocessError, ValueError, IndexError) as e:
+        return {"error": str(e)}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(cycles=200, spotify_ms=20.0, calendar_ms=30.0, led_frames=300, skip_leds=False):
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "params": {"cycles": cycles, "spotify_ms": spotify_ms, "calendar_ms": calendar_ms, "led_frames": led_frames},
+        "poll_cycle": [
+            bench_poll_cycle(scenario, cycles, spotify_ms / 1000, calendar_ms / 1000)
+            for scenario in SCENARIOS
+        ],
+        "led_render": None if skip_leds else bench_leds(led_frames),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for poll_cycle, Emitter and LED rendering")
+    parser.add_argument("--cycles", type=int, default=200)
+    parser.add_argument("--spotify-ms", type=float, default=20.0, help="injected latency per Spotify call")
+    parser.add_argument("--calendar-ms", type=float, default=30.0, help="injected latency per Calendar call")
+    parser.add_argument("--led-frames", type=int, default=300)
+    parser.add_argument("--skip-leds", action="store_true")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    # Keep the clients' INFO logging out of the results
+    import logging
+    logging.disable(logging.WARNING)
+
+    results = run(args.cycles, args.spotify_ms, args.calendar_ms, args.led_frames, args.skip_leds)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        for r in results["poll_cycle"]:
+            print(f"{r['scenario']:<10} p50 {r['p50_ms']:>7}ms  p99 {r['p99_ms']:>7}ms  "
+                  f"{r['api_calls_per_cycle']:>5} calls/cycle  {r['bytes_per_cycle']:>8} B/cycle")
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,81 +1,397 @@
 import os
+import json
+import time
 import datetime
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httplib2
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 import config
+from event_index import EventIndex, parse_event_time
+from utils import atomic_write_json
 
-# client for fetching calendar events using Google Calendar API with OAuth2 authentication
+# client for fetching calendar events using Google Calendar API with OAuth2 authentication.
+# In incremental mode it keeps a local event store and only pulls deltas using syncToken. Events are
+# held in a time-sorted EventIndex, so per-cycle queries don't reparse timestamps. Several calendars
+# are fetched in one batch request (or, for syncs, on a bounded thread pool) and k-way merged, with
+# cross-calendar duplicates removed.
 
 logger = logging.getLogger(__name__)
 
 SCOPES = ["https://www.googleapis.com/auth/calendar.readonly"]
+# How far back the initial full sync reaches, so events already in progress are kept
+FULL_SYNC_LOOKBACK = datetime.timedelta(days=1)
+# How far ahead a full sync expands recurring events, instead of an open-ended series' every
+# instance. Events past it are dropped, and a full resync runs before less than the margin is left.
+FULL_SYNC_HORIZON = datetime.timedelta(days=7)
+FULL_SYNC_HORIZON_MARGIN = datetime.timedelta(days=1)
+# Google caps a batch request at 50 calls
+BATCH_MAX_REQUESTS = 50
+EVENT_FIELDS = ("summary", "description", "start", "end", "location", "status", "iCalUID")
+
+
+class GoogleTokenSource:
+    """Proactive refresh hook for TokenManager. google-auth would otherwise refresh inline
+    on the first request after expiry, on a poll cycle's time."""
+
+    name = "google"
+
+    def __init__(self, creds, token_path=None):
+        self.creds = creds
+        self.token_path = token_path or config.GOOGLE_TOKEN_PATH
+        self._lock = threading.Lock()
+
+    def expires_at(self):
+        expiry = self.creds.expiry
+        if expiry is None:
+            return None
+        # google-auth keeps expiry as naive UTC
+        return expiry.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+    def refresh(self):
+        with self._lock:
+            self.creds.refresh(Request())
+            atomic_write_json(self.token_path, json.loads(self.creds.to_json()))
+
+
+# httplib2 connections aren't thread-safe: each thread gets its own, shared by every client
+_thread_connections = threading.local()
+
+
+def _thread_connection():
+    http = getattr(_thread_connections, "http", None)
+    if http is None:
+        http = _thread_connections.http = httplib2.Http(timeout=config.CALENDAR_HTTP_TIMEOUT)
+    return http
+
+
+def build_shared_service():
+    """A Calendar service with no credentials of its own, for sharing between clients:
+    every request is executed with the calling client's authorized http."""
+    return build("calendar", "v3", http=httplib2.Http(), static_discovery=True, cache_discovery=False)
 
 
 class CalendarClient:
-    def __init__(self):
-        self.service = self._authenticate()
+    def __init__(self, incremental=None, calendar_ids=None, token_path=None, sync_state_path=None,
+                 service=None, pool=None, interactive=True):
+        """Defaults are the single-user setup from config. A multi-tenant poller passes each
+        user's own token and state paths, plus a shared service and thread pool, and turns
+        off the interactive login it has no browser for."""
+        self.token_path = token_path or config.GOOGLE_TOKEN_PATH
+        self.sync_state_path = sync_state_path or config.CALENDAR_SYNC_STATE_PATH
+        self._creds = None
+        self.token_source = None
+        self._authenticate(interactive)
+        # The client library bundles the discovery document: never fetch it over the network
+        self.service = service or build(
+            "calendar", "v3", credentials=self._creds, static_discovery=True, cache_discovery=False
+        )
+        self.incremental = config.CALENDAR_INCREMENTAL_SYNC if incremental is None else incremental
+        self.calendar_ids = list(calendar_ids or config.GOOGLE_CALENDAR_IDS)
+        # Per-calendar event stores and sync tokens for incremental mode
+        self._events = {calendar_id: {} for calendar_id in self.calendar_ids}
+        self._sync_tokens = {}
+        self._horizons = {}
+        # Set when the stores change, so unchanged syncs don't rewrite the state file
+        self._dirty = False
+        self._last_sync = None
+        self.index = EventIndex()
+        # Per-thread authorized wrappers around the thread's shared connection
+        self._local = threading.local()
+        self._pool = None
+        if len(self.calendar_ids) > 1:
+            self._pool = pool or ThreadPoolExecutor(
+                max_workers=min(len(self.calendar_ids), config.CALENDAR_FETCH_WORKERS),
+                thread_name_prefix="calendar",
+            )
+        if self.incremental:
+            self._load_sync_state()
 
-    def _authenticate(self):
+    def _authenticate(self, interactive=True):
         """Handles OAuth2 flow with token caching."""
         creds = None
 
-        if os.path.exists(config.GOOGLE_TOKEN_PATH):
+        if os.path.exists(self.token_path):
             creds = Credentials.from_authorized_user_file(
-                config.GOOGLE_TOKEN_PATH, SCOPES
+                self.token_path, SCOPES
             )
 
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
                 creds.refresh(Request())
+            elif not interactive:
+                raise ValueError(f"No refreshable Google token in {self.token_path}")
             else:
                 flow = InstalledAppFlow.from_client_secrets_file(
                     config.GOOGLE_CREDENTIALS_PATH, SCOPES
                 )
                 creds = flow.run_local_server(port=0)
 
-            os.makedirs(os.path.dirname(config.GOOGLE_TOKEN_PATH), exist_ok=True)
-            with open(config.GOOGLE_TOKEN_PATH, "w") as token:
-                token.write(creds.to_json())
+            atomic_write_json(self.token_path, json.loads(creds.to_json()))
+
+        self._creds = creds
+        self.token_source = GoogleTokenSource(creds, self.token_path)
+
+    def _http(self):
+        """This thread's authorized http object, created on first use and kept for the
+        client's lifetime so the thread's keep-alive connection to Google is reused every cycle."""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = AuthorizedHttp(self._creds, http=_thread_connection())
+        return http
 
-        return build("calendar", "v3", credentials=creds)
+    def _execute(self, request):
+        return request.execute(http=self._http())
+
+    def _map(self, func, calendar_ids):
+        """Run func for each calendar, concurrently when there are several."""
+        if self._pool is None:
+            return [func(calendar_id) for calendar_id in calendar_ids]
+        return list(self._pool.map(func, calendar_ids))
 # fetches calendar events in the next 2 hours by default, returns empty list if no events or error occurs
     def get_upcoming_events(self, hours=2):
         """Returns list of events in the next N hours."""
         try:
-            now = datetime.datetime.utcnow()
-            time_min = now.isoformat() + "Z"
-            time_max = (now + datetime.timedelta(hours=hours)).isoformat() + "Z"
-
-            result = self.service.events().list(
-                calendarId="primary",
-                timeMin=time_min,
-                timeMax=time_max,
+            if self.incremental:
+                if self._last_sync is None or time.monotonic() - self._last_sync >= config.CALENDAR_SYNC_INTERVAL:
+                    try:
+                        self.sync()
+                    except Exception as e:
+                        # The local store is still the best answer; the next cycle retries the sync
+                        logger.error(f"Calendar sync failed, serving stored events: {e}")
+                entries = self.index.window(hours=hours)
+            else:
+                if len(self.calendar_ids) > 1 and config.CALENDAR_BATCH_REQUESTS:
+                    indexes = self._fetch_windows_batched(hours)
+                else:
+                    indexes = self._map(lambda calendar_id: self._fetch_window(calendar_id, hours), self.calendar_ids)
+                self.index = EventIndex.merge(indexes)
+                # Google already limited the window; the index serves the event queries below
+                entries = list(self.index)
+
+            now = time.time()
+            return [self._format_event(entry, now) for entry in entries]
+
+        except Exception as e:
+            logger.error(f"Calendar API error: {e}")
+            return []
+
+    def _window_request(self, calendar_id, hours):
+        now = datetime.datetime.utcnow()
+        time_min = now.isoformat() + "Z"
+        time_max = (now + datetime.timedelta(hours=hours)).isoformat() + "Z"
+        return self.service.events().list(
+            calendarId=calendar_id,
+            timeMin=time_min,
+            timeMax=time_max,
+            singleEvents=True,
+            orderBy="startTime",
+        )
+
+    def _fetch_window(self, calendar_id, hours):
+        """One calendar's events in the next N hours, as a sorted index."""
+        try:
+            result = self._execute(self._window_request(calendar_id, hours))
+        except Exception as e:
+            if len(self.calendar_ids) == 1:
+                raise
+            # One unreachable calendar shouldn't blank out the others
+            logger.error(f"Calendar {calendar_id} fetch failed: {e}")
+            return EventIndex()
+        return EventIndex(result.get("items", []))
+
+    def _fetch_windows_batched(self, hours):
+        """Every calendar's window in one multipart batch request (up to 50 calls each),
+        so more calendars add neither round trips nor threads."""
+        results = {}
+
+        def on_response(calendar_id, response, exception):
+            if exception is not None:
+                logger.error(f"Calendar {calendar_id} fetch failed: {exception}")
+                response = {}
+            results[calendar_id] = EventIndex(response.get("items", []))
+
+        for i in range(0, len(self.calendar_ids), BATCH_MAX_REQUESTS):
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for calendar_id in self.calendar_ids[i:i + BATCH_MAX_REQUESTS]:
+                batch.add(self._window_request(calendar_id, hours), request_id=calendar_id)
+            batch.execute(http=self._http())
+        return [results.get(calendar_id, EventIndex()) for calendar_id in self.calendar_ids]
+
+    def current_event(self):
+        """The event in progress right now (latest-starting if several overlap), or None."""
+        in_progress = self.index.current()
+        return self._format_event(in_progress[0], time.time()) if in_progress else None
+
+    def next_event(self, within_minutes=None):
+        """The next event to start, optionally only if it starts within N minutes, or None."""
+        entry = self.index.next_event(within_minutes=within_minutes)
+        return self._format_event(entry, time.time()) if entry else None
+
+    def free_gap_minutes(self):
+        """Free minutes from now until the next event (0 while busy, None if nothing is scheduled)."""
+        gap = self.index.free_gap()
+        return None if gap is None else round(gap / 60)
+
+    @staticmethod
+    def _format_event(entry, now):
+        item = entry.item
+        return {
+            "summary": item.get("summary", "Untitled Event"),
+            "description": item.get("description", ""),
+            "start_time": item["start"].get("dateTime", item["start"].get("date")),
+            "minutes_until": round(max(0, (entry.start - now) / 60)),
+            "location": item.get("location", ""),
+        }
+
+    def sync(self):
+        """Pull changes since the last sync into the local event stores, one
+        calendar per pool thread, and rebuild the merged index."""
+        self._map(self._sync_calendar, self.calendar_ids)
+        self._prune_past_events()
+        self.index = EventIndex.merge([
+            EventIndex(self._events[calendar_id].values()) for calendar_id in self.calendar_ids
+        ])
+        self._last_sync = time.monotonic()
+        if self._dirty:
+            self._dirty = False
+            self._save_sync_state()
+
+    def _sync_calendar(self, calendar_id):
+        """Sync one calendar, falling back to a full resync when there is no sync
+        token yet, the horizon is running out, or Google invalidates it (410 Gone)."""
+        try:
+            horizon = self._horizons.get(calendar_id)
+            horizon_low = horizon is None or horizon - datetime.datetime.now(datetime.timezone.utc) < FULL_SYNC_HORIZON_MARGIN
+            if self._sync_tokens.get(calendar_id) is None or horizon_low:
+                self._full_sync(calendar_id)
+                return
+            try:
+                self._incremental_sync(calendar_id)
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                logger.warning(f"Calendar {calendar_id} sync token expired (410), doing a full resync")
+                self._full_sync(calendar_id)
+        except Exception as e:
+            if len(self.calendar_ids) == 1:
+                raise
+            # Keep this calendar's last known events; the next sync retries it
+            logger.error(f"Calendar {calendar_id} sync failed: {e}")
+
+    def _full_sync(self, calendar_id):
+        """Re-list a calendar from just before now up to the horizon and start a fresh sync token."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        time_min = now - FULL_SYNC_LOOKBACK
+        time_max = now + FULL_SYNC_HORIZON
+        self._events[calendar_id] = {}
+        self._sync_tokens[calendar_id] = None
+        self._horizons[calendar_id] = time_max
+        self._dirty = True
+        self._sync_tokens[calendar_id] = self._list_pages(
+            calendar_id, timeMin=time_min.isoformat(), timeMax=time_max.isoformat()
+        )
+        logger.info(f"Calendar {calendar_id} full sync stored {len(self._events[calendar_id])} events")
+
+    def _incremental_sync(self, calendar_id):
+        """Apply only the events changed since the stored sync token."""
+        before = len(self._events[calendar_id])
+        self._sync_tokens[calendar_id] = self._list_pages(calendar_id, syncToken=self._sync_tokens[calendar_id])
+        logger.debug(f"Calendar {calendar_id} incremental sync: {before} -> {len(self._events[calendar_id])} events")
+
+    def _list_pages(self, calendar_id, **params):
+        """Page through events().list, applying each item to the store. Returns nextSyncToken."""
+        page_token = None
+        while True:
+            result = self._execute(self.service.events().list(
+                calendarId=calendar_id,
                 singleEvents=True,
-                orderBy="startTime",
-            ).execute()
+                pageToken=page_token,
+                **params,
+            ))
+            for item in result.get("items", []):
+                self._apply_event(calendar_id, item)
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                return result.get("nextSyncToken")
 
-            events = []
-            for event in result.get("items", []):
-                if event.get("status") == "cancelled":
-                    continue
+    def _apply_event(self, calendar_id, item):
+        """Upsert or delete a single event in a calendar's local store."""
+        event_id = item.get("id")
+        if event_id is None:
+            return
+        events = self._events[calendar_id]
+        if item.get("status") == "cancelled" or self._past_horizon(calendar_id, item):
+            if events.pop(event_id, None) is not None:
+                self._dirty = True
+            return
+        event = {k: item[k] for k in EVENT_FIELDS if k in item}
+        if events.get(event_id) != event:
+            events[event_id] = event
+            self._dirty = True
 
-                start = event["start"].get("dateTime", event["start"].get("date"))
-                events.append({
-                    "summary": event.get("summary", "Untitled Event"),
-                    "description": event.get("description", ""),
-                    "start_time": start,
-                    "minutes_until": self._minutes_until(start),
-                    "location": event.get("location", ""),
-                })
+    def _past_horizon(self, calendar_id, item):
+        """Whether an event starts after the calendar's horizon; the next full resync lists it."""
+        horizon = self._horizons.get(calendar_id)
+        start = parse_event_time(item.get("start", {}))
+        return horizon is not None and start is not None and start > horizon
 
-            return events
+    def _prune_past_events(self):
+        """Drop events that have already ended so the stores stay small."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for events in self._events.values():
+            for event_id, event in list(events.items()):
+                end = parse_event_time(event.get("end", event["start"]))
+                if end is not None and end <= now:
+                    del events[event_id]
+                    self._dirty = True
 
+    def _load_sync_state(self):
+        """Restore the event stores and sync tokens persisted by a previous run."""
+        try:
+            with open(self.sync_state_path, "r") as f:
+                state = json.load(f)
+            calendars = state.get("calendars", {})
+            for calendar_id in self.calendar_ids:
+                saved = calendars.get(calendar_id, {})
+                self._events[calendar_id] = saved.get("events", {})
+                self._sync_tokens[calendar_id] = saved.get("sync_token")
+                if saved.get("horizon"):
+                    self._horizons[calendar_id] = datetime.datetime.fromisoformat(saved["horizon"])
+            self.index = EventIndex.merge([
+                EventIndex(self._events[calendar_id].values()) for calendar_id in self.calendar_ids
+            ])
+            logger.info(f"Loaded {len(self.index)} calendar events from local store")
+        except FileNotFoundError:
+            pass
         except Exception as e:
-            logger.error(f"Calendar API error: {e}")
-            return []
+            logger.warning(f"Could not read calendar sync state, will do a full sync: {e}")
+            self._events = {calendar_id: {} for calendar_id in self.calendar_ids}
+            self._sync_tokens = {}
+            self._horizons = {}
+
+    def _save_sync_state(self):
+        try:
+            atomic_write_json(self.sync_state_path, {
+                "calendars": {
+                    calendar_id: {
+                        "sync_token": self._sync_tokens.get(calendar_id),
+                        "horizon": (
+                            self._horizons[calendar_id].isoformat() if calendar_id in self._horizons else None
+                        ),
+                        "events": self._events[calendar_id],
+                    }
+                    for calendar_id in self.calendar_ids
+                },
+            })
+        except OSError as e:
+            logger.warning(f"Could not persist calendar sync state: {e}")
 
     @staticmethod
     def _minutes_until(start_time_str):
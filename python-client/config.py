@@ -13,6 +13,36 @@ SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI", "http://127.0.0.1:8888/
 # App Settings
 POLLING_INTERVAL = int(os.getenv("POLLING_INTERVAL", "30"))
 
+# Per-source deadlines (seconds) for a single poll cycle
+SPOTIFY_DEADLINE = float(os.getenv("SPOTIFY_DEADLINE", "10"))
+CALENDAR_DEADLINE = float(os.getenv("CALENDAR_DEADLINE", "10"))
+
+# Local pre-scoring: confident heuristic scores are sent with the context so the server skips the LLM
+PRESCORE_ENABLED = os.getenv("PRESCORE_ENABLED", "true").lower() == "true"
+PRESCORE_MIN_CONFIDENCE = float(os.getenv("PRESCORE_MIN_CONFIDENCE", "0.6"))
+PRESCORE_HORIZON_MINUTES = int(os.getenv("PRESCORE_HORIZON_MINUTES", "60"))
+# Same threshold the Node.js server alerts on
+COMPATIBILITY_THRESHOLD = int(os.getenv("COMPATIBILITY_THRESHOLD", "60"))
+
+# OAuth tokens are refreshed in the background this many seconds before they expire
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+TOKEN_CHECK_INTERVAL = int(os.getenv("TOKEN_CHECK_INTERVAL", "60"))
+
+# Multi-tenant mode: when TENANTS_FILE is set, poll every user it lists from this one process.
+# Each user's token caches and state live in TENANTS_DIR/<user>/ (default: next to TENANTS_FILE).
+TENANTS_FILE = os.getenv("TENANTS_FILE")
+TENANTS_DIR = os.getenv("TENANTS_DIR")
+# Threads for blocking API calls, shared by all users; a poll cycle uses up to three at once
+TENANT_WORKERS = int(os.getenv("TENANT_WORKERS", "32"))
+TENANT_MAX_CONCURRENT_CYCLES = int(os.getenv("TENANT_MAX_CONCURRENT_CYCLES", "16"))
+# A user's whole poll cycle is cut off after this long, freeing its slot for the next user
+TENANT_CYCLE_DEADLINE = float(os.getenv("TENANT_CYCLE_DEADLINE", "20"))
+# First polls are staggered over this many seconds instead of all firing at startup
+TENANT_STARTUP_SPREAD = float(os.getenv("TENANT_STARTUP_SPREAD", "10"))
+
+# Local Prometheus-text metrics endpoint (http://127.0.0.1:METRICS_PORT/metrics); 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+
 # Node.js Server
 NODE_SERVER_URL = os.getenv("NODE_SERVER_URL", "http://localhost:3001")
 
@@ -23,3 +53,68 @@ GOOGLE_CREDENTIALS_PATH = os.path.join(
 GOOGLE_TOKEN_PATH = os.path.join(
     os.path.dirname(os.path.abspath(__file__)), "credentials", "google_token.json"
 )
+
+# Calendars to aggregate (comma-separated IDs), fetched concurrently by up to CALENDAR_FETCH_WORKERS threads
+GOOGLE_CALENDAR_IDS = [c.strip() for c in os.getenv("GOOGLE_CALENDAR_IDS", "primary").split(",") if c.strip()]
+CALENDAR_FETCH_WORKERS = int(os.getenv("CALENDAR_FETCH_WORKERS", "4"))
+# Fetch several calendars' windows as one BatchHttpRequest instead of parallel requests
+CALENDAR_BATCH_REQUESTS = os.getenv("CALENDAR_BATCH_REQUESTS", "true").lower() == "true"
+# Socket timeout for the kept-alive Google API connections
+CALENDAR_HTTP_TIMEOUT = float(os.getenv("CALENDAR_HTTP_TIMEOUT", "10"))
+# Seconds before retrying a Calendar client that failed to start; polling continues without it meanwhile
+CALENDAR_INIT_RETRY = int(os.getenv("CALENDAR_INIT_RETRY", "300"))
+
+# Incremental Calendar sync: keep a local event store and only pull deltas via syncToken
+CALENDAR_INCREMENTAL_SYNC = os.getenv("CALENDAR_INCREMENTAL_SYNC", "false").lower() == "true"
+CALENDAR_SYNC_INTERVAL = int(os.getenv("CALENDAR_SYNC_INTERVAL", "120"))
+CALENDAR_SYNC_STATE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".calendar_sync.json"
+)
+
+# Adaptive Spotify polling: sleep until shortly before the predicted track end,
+# poll fast around transitions and back off exponentially while paused/idle
+ADAPTIVE_MAX_INTERVAL = int(os.getenv("ADAPTIVE_MAX_INTERVAL", "90"))
+ADAPTIVE_FAST_INTERVAL = float(os.getenv("ADAPTIVE_FAST_INTERVAL", "2"))
+TRACK_TRANSITION_LEAD = float(os.getenv("TRACK_TRANSITION_LEAD", "3"))
+IDLE_MAX_INTERVAL = int(os.getenv("IDLE_MAX_INTERVAL", "120"))
+
+# Artist genre cache (SQLite, next to the Spotify token .cache)
+GENRE_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".genre_cache.sqlite"
+)
+GENRE_CACHE_TTL = int(os.getenv("GENRE_CACHE_TTL", str(7 * 24 * 3600)))
+GENRE_CACHE_MAX_ITEMS = int(os.getenv("GENRE_CACHE_MAX_ITEMS", "2048"))
+# Rows kept on disk; the least recently stored go first
+GENRE_CACHE_MAX_ROWS = int(os.getenv("GENRE_CACHE_MAX_ROWS", "20000"))
+
+# Audio features per track ID; they never change for a track, so there is no TTL
+AUDIO_FEATURES_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".audio_features_cache.sqlite"
+)
+AUDIO_FEATURES_CACHE_MAX_ITEMS = int(os.getenv("AUDIO_FEATURES_CACHE_MAX_ITEMS", "4096"))
+AUDIO_FEATURES_CACHE_MAX_ROWS = int(os.getenv("AUDIO_FEATURES_CACHE_MAX_ROWS", "50000"))
+
+# Local append-only log of recently-played history, synced incrementally with the `after` cursor
+PLAY_LOG_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".play_log.jsonl"
+)
+PLAY_LOG_MAX_ENTRIES = int(os.getenv("PLAY_LOG_MAX_ENTRIES", "5000"))
+# Between track changes history is re-checked at most this often
+PLAY_LOG_SYNC_INTERVAL = int(os.getenv("PLAY_LOG_SYNC_INTERVAL", "600"))
+
+# Client-side Spotify rate limit (token bucket over Spotify's rolling window). Spotify limits per
+# app, not per user, so in multi-tenant mode every user shares this one budget: raise it to match
+# the app's quota rather than scaling it with the number of users
+SPOTIFY_RATE_LIMIT_WINDOW = int(os.getenv("SPOTIFY_RATE_LIMIT_WINDOW", "30"))
+SPOTIFY_MAX_REQUESTS_PER_WINDOW = int(os.getenv("SPOTIFY_MAX_REQUESTS_PER_WINDOW", "60"))
+
+# Emitter: suppress unchanged contexts, optionally send deltas, and refresh full state periodically
+EMIT_KEEPALIVE_INTERVAL = int(os.getenv("EMIT_KEEPALIVE_INTERVAL", "300"))
+EMIT_MINUTE_BUCKET = int(os.getenv("EMIT_MINUTE_BUCKET", "5"))
+EMIT_DELTAS = os.getenv("EMIT_DELTAS", "false").lower() == "true"
+
+# Emitter offline buffer: events queued while disconnected, replayed (coalesced) on reconnect
+EMIT_BUFFER_SIZE = int(os.getenv("EMIT_BUFFER_SIZE", "100"))
+EMIT_FLUSH_INTERVAL = float(os.getenv("EMIT_FLUSH_INTERVAL", "0.5"))
+# Optional append-only spill file so queued events survive a client restart
+EMIT_SPILL_PATH = os.getenv("EMIT_SPILL_PATH")
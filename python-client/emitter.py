@@ -1,51 +1,309 @@
+import asyncio
+import hashlib
+import json
 import logging
+import time
+from collections import deque
 import socketio
+import config
+import metrics
+from utils import atomic_write_lines
 
 logger = logging.getLogger(__name__)
 
-# Socket.io client that sends vibe data to the Node.js server, with handlers for connection 
-# events and methods to emit vibe_idle and vibe_context events.
+# Async Socket.io client that sends vibe data to the Node.js server, with handlers for connection
+# events and coroutines to emit vibe_idle and vibe_context events. Contexts whose semantic content
+# hasn't changed are suppressed, with a full-state refresh every EMIT_KEEPALIVE_INTERVAL seconds.
+# While disconnected, events go to a bounded ring buffer that is coalesced and replayed on reconnect.
+# In multi-tenant mode many users' Emitters share one SharedConnection and tag payloads with `user`.
+
+CONTEXT_SECTIONS = ("track", "events", "recent_tracks", "local_analysis")
+
+EMITS = metrics.registry.counter(
+    "vibe_sync_emits_total", "Events handed to the emitter, by whether they were sent, buffered or suppressed",
+    labels=("event", "outcome"),
+)
+
+
+def context_fingerprint(track, events, recent_tracks, local_analysis=None, minute_bucket=None):
+    """Per-section hashes of what the analysis actually depends on: track identity and
+    enrichment (genres, audio features), event set and minute-bucketed timings, and the
+    local pre-score. Volatile fields (album art, popularity) are ignored."""
+    bucket = minute_bucket or config.EMIT_MINUTE_BUCKET
+    content = {
+        "track": [
+            track.get("name"), track.get("artist"), track.get("album"),
+            track.get("artist_genres"), track.get("audio_features"),
+        ],
+        "events": [
+            [e.get("summary"), e.get("start_time"), e.get("minutes_until", 0) // bucket]
+            for e in events
+        ],
+        "recent_tracks": [
+            [t.get("name"), t.get("artist"), t.get("genres"), t.get("audio_features")] for t in recent_tracks or []
+        ],
+        "local_analysis": local_analysis,
+    }
+    return {
+        section: hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()
+        for section, value in content.items()
+    }
+
+
+async def _connect(sio, server_url):
+    """Connect, or start retrying in the background. Returns the retry task, if any."""
+    logger.info(f"Connecting to {server_url}...")
+    try:
+        await sio.connect(server_url)
+    except socketio.exceptions.ConnectionError as e:
+        # Keep polling: emits are buffered until the background retry connects
+        logger.warning(f"Server unreachable ({e}), buffering emits and retrying in the background")
+        return asyncio.create_task(sio.connect(server_url, retry=True))
+    return None
+
+
+def _register_connection_handlers(sio, on_connect):
+    @sio.event
+    async def connect():
+        logger.info("Connected to Node.js Socket.io server")
+        on_connect()
+
+    @sio.event
+    async def disconnect():
+        logger.warning("Disconnected from Node.js Socket.io server")
+
+    @sio.event
+    async def connect_error(data):
+        logger.error(f"Socket.io connection error: {data}")
+
 
 class Emitter:
-    """Socket.io client that sends vibe data to the Node.js server."""
+    """Async Socket.io client that sends vibe data to the Node.js server.
 
-    def __init__(self, server_url):
+    Given a SharedConnection, it sends one user's events over that connection instead
+    of opening its own, with `user` added to every payload.
+    """
+
+    def __init__(self, server_url, user=None, connection=None):
         self.server_url = server_url
-        self.sio = socketio.Client(reconnection=True, reconnection_delay=5)
-        self._setup_handlers()
+        self.user = user
+        self._buffer = deque(maxlen=config.EMIT_BUFFER_SIZE)
+        self._spill_path = config.EMIT_SPILL_PATH
+        if self._spill_path and user is not None:
+            self._spill_path = f"{self._spill_path}.{user}"
+        self._spilled_lines = 0
+        # Events sent live, not replayed; a replay that sees this move stops, as its state is stale
+        self._live_sends = 0
+        self._flush_task = None
+        self._connect_task = None
+        # When a full context first reached the server, for time-to-first-emit
+        self.first_context_at = None
+        self._load_spilled()
+        self._reset_emit_state()
+        if connection is None:
+            self.sio = socketio.AsyncClient(reconnection=True, reconnection_delay=5)
+            _register_connection_handlers(self.sio, self._on_connect)
+        else:
+            self.sio = connection.sio
 
-    def _setup_handlers(self):
-        @self.sio.event
-        def connect():
-            logger.info("Connected to Node.js Socket.io server")
+    def _on_connect(self):
+        # The server may have restarted: next emit must carry full state
+        self._reset_emit_state()
+        if self._buffer and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush_buffer())
 
-        @self.sio.event
-        def disconnect():
-            logger.warning("Disconnected from Node.js Socket.io server")
+    def _reset_emit_state(self):
+        self._last_event = None
+        self._last_fingerprint = None
+        self._last_full_emit = 0.0
 
-        @self.sio.event
-        def connect_error(data):
-            logger.error(f"Socket.io connection error: {data}")
+    def _keepalive_due(self):
+        return time.monotonic() - self._last_full_emit >= config.EMIT_KEEPALIVE_INTERVAL
 
-    def connect(self):
+    async def connect(self):
         """Connect to the Node.js server."""
-        logger.info(f"Connecting to {self.server_url}...")
-        self.sio.connect(self.server_url)
+        self._connect_task = await _connect(self.sio, self.server_url)
 
-    def disconnect(self):
+    async def disconnect(self):
         """Disconnect from the Node.js server."""
-        self.sio.disconnect()
+        if self._connect_task is not None:
+            self._connect_task.cancel()
+        await self.sio.disconnect()
 
-    def emit_idle(self):
+    async def emit_idle(self):
         """Emit vibe_idle when no music is playing."""
-        self.sio.emit("vibe_idle", {})
+        if self._last_event == "vibe_idle" and not self._keepalive_due():
+            EMITS.inc(event="vibe_idle", outcome="suppressed")
+            logger.debug("Suppressed repeated vibe_idle")
+            return
+        await self._send("vibe_idle", {})
+        self._last_event = "vibe_idle"
+        self._last_fingerprint = None
+        self._last_full_emit = time.monotonic()
         logger.info("Emitted vibe_idle")
 
-    def emit_context(self, track, events, recent_tracks=None):
-        """Emit vibe_context with track, calendar, and recent listening data."""
-        self.sio.emit("vibe_context", {
-            "track": track,
-            "events": events,
-            "recent_tracks": recent_tracks or [],
-        })
-        logger.info(f"Emitted vibe_context: {track['name']} by {track['artist']}")
+    async def emit_context(self, track, events, recent_tracks=None, local_analysis=None):
+        """Emit vibe_context with track, calendar, and recent listening data.
+
+        Identical contexts are suppressed until the keepalive refresh is due. With
+        EMIT_DELTAS enabled, a context that differs only in some sections is sent as a
+        compact vibe_context_delta carrying just those sections. A confident local
+        pre-score is attached as local_analysis so the server can skip the LLM.
+        """
+        recent_tracks = recent_tracks or []
+        fingerprint = context_fingerprint(track, events, recent_tracks, local_analysis)
+        keepalive_due = self._keepalive_due()
+
+        if fingerprint == self._last_fingerprint and not keepalive_due:
+            EMITS.inc(event="vibe_context", outcome="suppressed")
+            logger.debug(f"Suppressed unchanged vibe_context: {track['name']} by {track['artist']}")
+            return
+
+        payload = {"track": track, "events": events, "recent_tracks": recent_tracks}
+        if local_analysis is not None:
+            payload["local_analysis"] = local_analysis
+        changed = [
+            k for k in CONTEXT_SECTIONS
+            if self._last_fingerprint is None or fingerprint[k] != self._last_fingerprint[k]
+        ]
+
+        if config.EMIT_DELTAS and not keepalive_due and len(changed) < len(CONTEXT_SECTIONS):
+            # A dropped local_analysis goes out as null, clearing it in the server's merged context
+            delta = {k: payload.get(k) for k in changed}
+            await self._send("vibe_context_delta", delta)
+            logger.info(f"Emitted vibe_context_delta ({', '.join(changed)}): {track['name']} by {track['artist']}")
+        else:
+            await self._send("vibe_context", payload)
+            self._last_full_emit = time.monotonic()
+            logger.info(f"Emitted vibe_context: {track['name']} by {track['artist']}")
+
+        self._last_event = "vibe_context"
+        self._last_fingerprint = fingerprint
+
+    async def _send(self, event, data, replay=False):
+        """Emit now if connected, otherwise queue for replay on reconnect."""
+        if self.sio.connected:
+            try:
+                await self.sio.emit(event, data if self.user is None else dict(data, user=self.user))
+                EMITS.inc(event=event, outcome="sent")
+                if not replay:
+                    self._live_sends += 1
+                if event == "vibe_context" and self.first_context_at is None:
+                    self.first_context_at = time.monotonic()
+                return
+            except (socketio.exceptions.BadNamespaceError, socketio.exceptions.ConnectionError) as e:
+                logger.warning(f"Emit of {event} failed ({e}), buffering")
+        self._enqueue(event, data)
+
+    def _enqueue(self, event, data):
+        if event == "vibe_context_delta":
+            # A delta is meaningless to a server that may have restarted; the next
+            # full context after reconnect supersedes it
+            EMITS.inc(event=event, outcome="dropped")
+            return
+        self._buffer.append((event, data))
+        EMITS.inc(event=event, outcome="buffered")
+        if self._spill_path:
+            try:
+                if self._spilled_lines + 1 >= 2 * self._buffer.maxlen:
+                    # Compact down to what the bounded buffer still holds
+                    atomic_write_lines(self._spill_path, (json.dumps(queued) for queued in self._buffer))
+                    self._spilled_lines = len(self._buffer)
+                else:
+                    with open(self._spill_path, "a") as f:
+                        f.write(json.dumps([event, data]) + "\n")
+                    self._spilled_lines += 1
+            except OSError as e:
+                logger.warning(f"Could not spill {event} to {self._spill_path}: {e}")
+        logger.info(f"Not connected, buffered {event} ({len(self._buffer)} queued)")
+
+    def _coalesced(self):
+        """Latest event per type, in the order they were last queued."""
+        latest = {}
+        for seq, (event, data) in enumerate(self._buffer):
+            latest[event] = (seq, data)
+        return [(event, data) for event, (seq, data) in sorted(latest.items(), key=lambda kv: kv[1][0])]
+
+    async def _flush_buffer(self):
+        """Replay buffered events after a reconnect, one at a time with a pause between
+        each so a reconnecting client doesn't burst stale state at the server. Once a
+        poll cycle sends fresh state, whatever is left of the replay is older and dropped."""
+        pending = self._coalesced()
+        logger.info(f"Replaying {len(pending)} of {len(self._buffer)} buffered events")
+        self._buffer.clear()
+        self._clear_spill()
+        live_sends = self._live_sends
+        for i, (event, data) in enumerate(pending):
+            if self._live_sends != live_sends:
+                logger.info(f"Fresh state sent, dropping {len(pending) - i} stale buffered events")
+                for stale_event, _ in pending[i:]:
+                    EMITS.inc(event=stale_event, outcome="dropped")
+                return
+            if not self.sio.connected:
+                # Dropped again mid-flush: requeue what's left for the next reconnect
+                for queued_event, queued_data in pending[i:]:
+                    self._enqueue(queued_event, queued_data)
+                return
+            await self._send(event, data, replay=True)
+            await asyncio.sleep(config.EMIT_FLUSH_INTERVAL)
+
+    def _load_spilled(self):
+        """Restore events spilled by a previous run that never reached the server."""
+        if not self._spill_path:
+            return
+        torn = False
+        try:
+            with open(self._spill_path, "r") as f:
+                for line in f:
+                    self._spilled_lines += 1
+                    try:
+                        event, data = json.loads(line)
+                    except ValueError:
+                        torn = True  # torn write from a crash
+                        continue
+                    self._buffer.append((event, data))
+        except FileNotFoundError:
+            return
+        if torn:
+            # Appending after a torn line would glue the next event onto it
+            self._spilled_lines = 2 * self._buffer.maxlen
+        if self._buffer:
+            logger.info(f"Loaded {len(self._buffer)} buffered events from {self._spill_path}")
+
+    def _clear_spill(self):
+        if not self._spill_path:
+            return
+        try:
+            open(self._spill_path, "w").close()
+            self._spilled_lines = 0
+        except OSError as e:
+            logger.warning(f"Could not clear spill file {self._spill_path}: {e}")
+
+
+class SharedConnection:
+    """One Socket.io connection multiplexing many users' Emitters, for the multi-tenant
+    poller: sockets stay at one however many users are polled."""
+
+    def __init__(self, server_url):
+        self.server_url = server_url
+        self.sio = socketio.AsyncClient(reconnection=True, reconnection_delay=5)
+        self.emitters = {}
+        self._connect_task = None
+        _register_connection_handlers(self.sio, self._on_connect)
+
+    def emitter(self, user):
+        """The Emitter for `user`'s events on this connection."""
+        emitter = self.emitters[user] = Emitter(self.server_url, user=user, connection=self)
+        return emitter
+
+    def _on_connect(self):
+        for emitter in self.emitters.values():
+            emitter._on_connect()
+
+    async def connect(self):
+        self._connect_task = await _connect(self.sio, self.server_url)
+
+    async def disconnect(self):
+        if self._connect_task is not None:
+            self._connect_task.cancel()
+        await self.sio.disconnect()
@@ -0,0 +1,119 @@
+import bisect
+import datetime
+import heapq
+import time
+from collections import namedtuple
+
+# time-sorted index over calendar events: start/end are parsed to epoch seconds once when the
+# index is built, and "current event", "next event" and "free gap" queries are answered by bisection
+
+# start/end in epoch seconds alongside the raw API item
+IndexedEvent = namedtuple("IndexedEvent", ["start", "end", "item"])
+
+
+def parse_event_time(time_field):
+    """Parse an event start/end object ({dateTime} or all-day {date}) to an aware datetime."""
+    value = time_field.get("dateTime", time_field.get("date"))
+    if value is None:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    # All-day events carry a bare date, interpreted in local time
+    return parsed if parsed.tzinfo else parsed.astimezone()
+
+
+class EventIndex:
+    """Calendar events sorted by start time with precomputed epoch bounds.
+
+    Built from raw API items whenever the event set changes; per-cycle queries
+    cost O(log n + k) for k results, however wide the stored window is.
+    """
+
+    def __init__(self, items=()):
+        entries = []
+        for item in items:
+            if item.get("status") == "cancelled" or "start" not in item:
+                continue
+            start = parse_event_time(item["start"])
+            end = parse_event_time(item.get("end", item["start"]))
+            if start is None or end is None:
+                continue
+            entries.append(IndexedEvent(start.timestamp(), end.timestamp(), item))
+        entries.sort(key=lambda entry: entry.start)
+        self._set_entries(entries)
+
+    @classmethod
+    def merge(cls, indexes):
+        """K-way merge of already-sorted indexes (one per calendar) into one.
+
+        The same meeting on several calendars shares an iCalUID; only the first
+        copy of each (iCalUID, start) is kept, so recurring instances survive.
+        """
+        merged = []
+        seen = set()
+        for entry in heapq.merge(*(index._entries for index in indexes), key=lambda entry: entry.start):
+            uid = entry.item.get("iCalUID")
+            if uid is not None:
+                if (uid, entry.start) in seen:
+                    continue
+                seen.add((uid, entry.start))
+            merged.append(entry)
+        index = cls()
+        index._set_entries(merged)
+        return index
+
+    def _set_entries(self, entries):
+        self._entries = entries
+        self._starts = [entry.start for entry in entries]
+        self._ends = [entry.end for entry in entries]
+        # Running max of end times: bounds how far back an event overlapping `now` can start
+        self._max_ends = []
+        latest = float("-inf")
+        for end in self._ends:
+            latest = max(latest, end)
+            self._max_ends.append(latest)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def current(self, now=None):
+        """Events in progress at `now`, latest-starting first."""
+        now = time.time() if now is None else now
+        in_progress = []
+        i = bisect.bisect_right(self._starts, now) - 1
+        while i >= 0 and self._max_ends[i] > now:
+            if self._ends[i] > now:
+                in_progress.append(self._entries[i])
+            i -= 1
+        return in_progress
+
+    def next_event(self, now=None, within_minutes=None):
+        """First event starting after `now` (optionally within N minutes), or None."""
+        now = time.time() if now is None else now
+        i = bisect.bisect_right(self._starts, now)
+        if i == len(self._starts):
+            return None
+        if within_minutes is not None and self._starts[i] - now > within_minutes * 60:
+            return None
+        return self._entries[i]
+
+    def free_gap(self, now=None):
+        """Seconds of free time from `now` until the next event: 0 while one is in
+        progress, None if nothing else is scheduled."""
+        now = time.time() if now is None else now
+        if self.current(now):
+            return 0.0
+        i = bisect.bisect_right(self._starts, now)
+        return self._starts[i] - now if i < len(self._starts) else None
+
+    def window(self, now=None, hours=2):
+        """Events overlapping [now, now + hours], ordered by start."""
+        now = time.time() if now is None else now
+        lo = bisect.bisect_right(self._starts, now)
+        hi = bisect.bisect_left(self._starts, now + hours * 3600)
+        return list(reversed(self.current(now))) + self._entries[lo:hi]
@@ -1,60 +1,218 @@
 import time
+
+# Taken before anything else loads, as the zero for time-to-first-emit
+PROCESS_STARTED = time.monotonic()
+
+import asyncio
+import importlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import config
-from spotify_client import SpotifyClient
-from calendar_client import CalendarClient
-from emitter import Emitter
+import metrics
+from scheduler import PollScheduler
+from prescorer import local_analysis
+from token_manager import TokenManager
 from utils import setup_logging
 
 # main entry point for the Python client that initializes Spotify and Calendar clients,
-# connects to the Node.js server via the Emitter, and runs a polling loop to fetch data and emit events.
+# connects to the Node.js server via the Emitter, and runs an asyncio polling loop that fetches
+# all sources concurrently and emits events. The client modules (spotipy, googleapiclient,
+# socketio) are imported and initialized in worker threads at startup, concurrently, rather
+# than at module load.
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
-BACKOFF_INTERVAL = 120
 
+async def _fetch(func, *args, deadline, default, stage, **kwargs):
+    """Run a blocking client call in a worker thread, giving up after `deadline` seconds.
 
-def poll_cycle(spotify, calendar, emitter):
-    """Single iteration of the polling loop."""
-    track = spotify.get_now_playing()
+    On timeout the await is cancelled and `default` is returned; the worker thread itself
+    finishes in the background, bounded by the client's own request timeout. The wait is
+    timed as `stage` in the per-stage metrics.
+    """
+    try:
+        with metrics.span(stage=stage):
+            return await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), timeout=deadline)
+    except asyncio.TimeoutError:
+        metrics.DEADLINES_EXCEEDED.inc(stage=stage)
+        logger.warning(f"{stage} exceeded its {deadline}s deadline, skipping this cycle")
+        return default
 
-    if track is None:
-        emitter.emit_idle()
-        return
 
-    events = calendar.get_upcoming_events(hours=2)
-    logger.info(f"Calendar returned {len(events)} events: {[e['summary'] for e in events]}")
-    recent_tracks = spotify.get_recent_tracks()
-    emitter.emit_context(track, events, recent_tracks)
+async def poll_cycle(spotify, calendar, emitter):
+    """Single iteration of the polling loop.
 
+    Spotify, Calendar and recent-tracks fetches run concurrently, so cycle latency is
+    bounded by the slowest source rather than their sum. `calendar` may be None while
+    it is still initializing.
+    """
+    with metrics.span(stage="cycle"):
+        track_task = asyncio.create_task(
+            _fetch(spotify.get_now_playing, resolve_genres=False, resolve_features=False,
+                   deadline=config.SPOTIFY_DEADLINE, default=spotify.UNAVAILABLE, stage="now_playing")
+        )
+        if calendar is not None:
+            events_task = asyncio.create_task(
+                _fetch(calendar.get_upcoming_events, hours=2,
+                       deadline=config.CALENDAR_DEADLINE, default=[], stage="calendar")
+            )
+        else:
+            # Calendar still starting up: emit without events, they follow once it's ready
+            events_task = asyncio.create_task(asyncio.sleep(0, result=[]))
+        recent_task = asyncio.create_task(
+            _fetch(spotify.get_recent_tracks, resolve_genres=False, resolve_features=False,
+                   deadline=config.SPOTIFY_DEADLINE, default=[], stage="recent_tracks")
+        )
+
+        try:
+            track = await track_task
+            if track is spotify.UNAVAILABLE:
+                # Skipped, throttled or failed: listeners keep the last context instead of going idle
+                return
+            if track is None:
+                with metrics.span(stage="emit"):
+                    await emitter.emit_idle()
+                return
+
+            events, recent_tracks = await asyncio.gather(events_task, recent_task)
+        finally:
+            # Nothing is playing (or a fetch failed): don't wait on the other sources
+            events_task.cancel()
+            recent_task.cancel()
+
+        # Genres and audio features for now playing + recent tracks, one batched lookup each
+        artist_ids = [track.get("artist_id")] + [t.get("artist_id") for t in recent_tracks]
+        track_ids = [track.get("track_id")] + [t.get("track_id") for t in recent_tracks]
+        genres, features = await asyncio.gather(
+            _fetch(spotify.resolve_genres, artist_ids,
+                   deadline=config.SPOTIFY_DEADLINE, default={}, stage="genres"),
+            _fetch(spotify.resolve_audio_features, track_ids,
+                   deadline=config.SPOTIFY_DEADLINE, default={}, stage="audio_features"),
+        )
+        spotify.attach_genres(track, recent_tracks, genres)
+        spotify.attach_audio_features(track, recent_tracks, features)
+
+        logger.info(f"Calendar returned {len(events)} events: {[e['summary'] for e in events]}")
+        with metrics.span(stage="emit"):
+            await emitter.emit_context(track, events, recent_tracks, local_analysis=local_analysis(track, events))
 
-def main():
-    spotify = SpotifyClient()
-    calendar = CalendarClient()
-    emitter = Emitter(config.NODE_SERVER_URL)
 
-    emitter.connect()
-    logger.info(f"Polling every {config.POLLING_INTERVAL}s.")
+def _create_spotify():
+    return importlib.import_module("spotify_client").SpotifyClient()
 
+
+def _create_calendar():
+    return importlib.import_module("calendar_client").CalendarClient()
+
+
+async def _create_calendar_later(delay):
+    await asyncio.sleep(delay)
+    return await asyncio.to_thread(_create_calendar)
+
+
+def _register_first_emit(emitter):
+    # Left out of scrapes until a vibe_context has actually been sent (None - float raises)
+    metrics.registry.gauge(
+        "vibe_sync_time_to_first_emit_seconds", "Process start to the first vibe_context sent to the server",
+        lambda: emitter.first_context_at - PROCESS_STARTED,
+    )
+
+
+def _start_metrics_server():
+    """Serve /metrics when METRICS_PORT is set; a taken port costs the endpoint, not the client."""
+    if not config.METRICS_PORT:
+        return
+    try:
+        metrics.start_server(config.METRICS_PORT)
+    except OSError as e:
+        logger.warning(f"Couldn't serve metrics on port {config.METRICS_PORT}, continuing without: {e}")
+
+
+async def run():
+    # Spotify, Calendar and the socket start concurrently, each client's imports included;
+    # polling begins as soon as Spotify is ready, without waiting on Calendar
+    spotify_ready = asyncio.create_task(asyncio.to_thread(_create_spotify))
+    calendar_ready = asyncio.create_task(asyncio.to_thread(_create_calendar))
+    emitter_module = await asyncio.to_thread(importlib.import_module, "emitter")
+    emitter = emitter_module.Emitter(config.NODE_SERVER_URL)
+    _register_first_emit(emitter)
+    connected = asyncio.create_task(emitter.connect())
+    scheduler = PollScheduler()
+    tokens = TokenManager()
+    _start_metrics_server()
+
+    spotify = await spotify_ready
+    tokens.register(spotify.token_source)
+    tokens.start()
+    await connected
+    logger.info(f"Adaptive polling, at most {config.ADAPTIVE_MAX_INTERVAL}s between polls while playing.")
+
+    calendar = None
     try:
         while True:
+            if calendar is None and calendar_ready.done():
+                try:
+                    calendar = calendar_ready.result()
+                except Exception as e:
+                    logger.error(
+                        f"Calendar init failed, polling without it and retrying in {config.CALENDAR_INIT_RETRY}s: {e}",
+                        exc_info=True,
+                    )
+                    calendar_ready = asyncio.create_task(_create_calendar_later(config.CALENDAR_INIT_RETRY))
+                else:
+                    tokens.register(calendar.token_source)
             try:
-                poll_cycle(spotify, calendar, emitter)
+                await poll_cycle(spotify, calendar, emitter)
             except Exception as e:
                 logger.error(f"Poll cycle error: {e}", exc_info=True)
-                if "rate" in str(e).lower() or "limit" in str(e).lower():
-                    spotify.rate_limited = True
 
-            if spotify.rate_limited:
-                logger.warning(f"Rate limited, backing off to {BACKOFF_INTERVAL}s polling")
-                time.sleep(BACKOFF_INTERVAL)
+            delay = scheduler.next_delay(spotify.playback, breaker=spotify.breaker)
+            logger.debug(f"Next poll in {delay:.1f}s")
+            if calendar is None:
+                # Poll again as soon as Calendar is ready, so its events follow right away
+                await asyncio.wait({calendar_ready}, timeout=delay)
             else:
-                time.sleep(config.POLLING_INTERVAL)
+                await asyncio.sleep(delay)
+    finally:
+        tokens.stop()
+        calendar_ready.cancel()
+        await emitter.disconnect()
+
+
+async def run_tenants():
+    """Multi-tenant mode: poll every user in TENANTS_FILE over shared threads and one socket."""
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=config.TENANT_WORKERS, thread_name_prefix="poll")
+    )
+    import tenants
+    from emitter import SharedConnection
+
+    connection = SharedConnection(config.NODE_SERVER_URL)
+    users = await tenants.create_tenants(tenants.load_tenants(config.TENANTS_FILE), connection)
+    if not users:
+        logger.error(f"No pollable tenants in {config.TENANTS_FILE}")
+        return
+    tokens = TokenManager()
+    for tenant in users:
+        tokens.register(tenant.spotify.token_source)
+        tokens.register(tenant.calendar.token_source)
+    tokens.start()
+    _start_metrics_server()
+
+    await connection.connect()
+    try:
+        await tenants.TenantPoller(users, poll_cycle).run()
+    finally:
+        tokens.stop()
+        await connection.disconnect()
+
+
+def main():
+    try:
+        asyncio.run(run_tenants() if config.TENANTS_FILE else run())
     except KeyboardInterrupt:
         logger.info("Shutting down...")
-    finally:
-        emitter.disconnect()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# small key -> JSON value cache backed by SQLite, with an optional TTL and an LRU-bounded
+# in-memory layer so hot keys never touch disk and memory stays flat on long-running clients.
+# Expired and excess rows are purged from disk on open and then periodically on write.
+
+logger = logging.getLogger(__name__)
+
+# Seconds between on-disk purges while a client keeps writing
+PURGE_INTERVAL = 3600
+
+
+class PersistentCache:
+    """On-disk cache with TTL and a bounded in-memory LRU in front of it.
+
+    Writes go through SQLite transactions, so a crash mid-write never leaves a
+    corrupt cache behind. Safe to share between the poller's worker threads.
+    """
+
+    def __init__(self, path, ttl=None, max_items=1024, max_rows=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)")
+        self._db.commit()
+        self._purged_at = None
+        self.purge_expired()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys):
+        """Return {key: value} for every key that is cached and fresh."""
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is not None and not self._expired(entry[1]):
+                    self._memory.move_to_end(key)
+                    found[key] = entry[0]
+                else:
+                    missing.append(key)
+
+            if missing:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._db.execute(
+                    f"SELECT key, value, stored_at FROM cache WHERE key IN ({placeholders})", missing
+                ).fetchall()
+                for key, value, stored_at in rows:
+                    if self._expired(stored_at):
+                        continue
+                    found[key] = json.loads(value)
+                    self._remember(key, found[key], stored_at)
+
+            hit_count = sum(1 for key in keys if key in found)
+            self.hits += hit_count
+            self.misses += len(keys) - hit_count
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """Store several values in one transaction."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO cache (key, value, stored_at) VALUES (?, ?, ?)",
+                        [(key, json.dumps(value), now) for key, value in items.items()],
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist cache entries to {self.path}: {e}")
+            for key, value in items.items():
+                self._remember(key, value, now)
+            if time.monotonic() - self._purged_at >= PURGE_INTERVAL:
+                self._purge()
+
+    def purge_expired(self):
+        """Delete expired rows, and the oldest rows past max_rows, from disk."""
+        with self._lock:
+            self._purge()
+
+    def _purge(self):
+        self._purged_at = time.monotonic()
+        try:
+            with self._db:
+                if self.ttl is not None:
+                    self._db.execute("DELETE FROM cache WHERE stored_at < ?", (time.time() - self.ttl,))
+                if self.max_rows is not None:
+                    self._db.execute(
+                        "DELETE FROM cache WHERE key NOT IN (SELECT key FROM cache ORDER BY stored_at DESC LIMIT ?)",
+                        (self.max_rows,),
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not purge cache entries from {self.path}: {e}")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __contains__(self, key):
+        return key in self.get_many([key])
+
+    def __getitem__(self, key):
+        found = self.get_many([key])
+        if key not in found:
+            raise KeyError(key)
+        return found[key]
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def _remember(self, key, value, stored_at):
+        self._memory[key] = (value, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
@@ -0,0 +1,114 @@
+import datetime
+import json
+import logging
+import threading
+from utils import atomic_write_lines
+
+# append-only local log of Spotify plays, one JSON line per play keyed by played_at (epoch ms). The
+# newest played_at is the `after` cursor for the next recently-played request, so each sync only
+# downloads plays the log hasn't seen, and any window of history is served from here for free.
+
+logger = logging.getLogger(__name__)
+
+PLAY_FIELDS = ("played_at", "track_id", "name", "artist", "artist_id")
+
+
+def parse_played_at(value):
+    """Spotify's played_at ISO timestamp ("2026-02-17T13:55:01.123Z") to epoch milliseconds."""
+    try:
+        return int(datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+    except (AttributeError, ValueError):
+        return None
+
+
+class PlayLog:
+    """Plays ordered by played_at, kept in memory and appended to a JSON-lines file.
+
+    The file is compacted down to the newest `max_entries` plays (temp file + rename)
+    once it grows to twice that, so it stays small on long-running clients.
+    """
+
+    def __init__(self, path, max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self._plays = []
+        self._lines = 0
+        # Set when the file has a torn line, so the next write rewrites instead of appending to it
+        self._rewrite = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    self._lines += 1
+                    try:
+                        play = json.loads(line)
+                    except ValueError:
+                        # Torn last line from a crash mid-append
+                        self._rewrite = True
+                        continue
+                    if isinstance(play, dict) and isinstance(play.get("played_at"), int):
+                        self._plays.append(play)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Couldn't read play log {self.path}: {e}")
+            return
+        self._plays.sort(key=lambda play: play["played_at"])
+        del self._plays[:-self.max_entries]
+        logger.info(f"Loaded {len(self._plays)} plays from {self.path}")
+
+    @property
+    def cursor(self):
+        """played_at of the newest logged play (the `after` cursor), or None when empty."""
+        return self._plays[-1]["played_at"] if self._plays else None
+
+    def append(self, plays):
+        """Log plays newer than the cursor; returns how many were new."""
+        with self._lock:
+            cursor = self.cursor
+            new = sorted(
+                (play for play in plays if cursor is None or play["played_at"] > cursor),
+                key=lambda play: play["played_at"],
+            )
+            # The same play can come back on two pages
+            unique = []
+            for play in new:
+                if not unique or play["played_at"] != unique[-1]["played_at"]:
+                    unique.append({field: play.get(field) for field in PLAY_FIELDS})
+            if not unique:
+                return 0
+
+            self._plays.extend(unique)
+            del self._plays[:-self.max_entries]
+            try:
+                if self._rewrite or self._lines + len(unique) >= 2 * self.max_entries:
+                    atomic_write_lines(self.path, (json.dumps(play) for play in self._plays))
+                    self._lines = len(self._plays)
+                    self._rewrite = False
+                else:
+                    with open(self.path, "a") as f:
+                        f.writelines(json.dumps(play) + "\n" for play in unique)
+                    self._lines += len(unique)
+            except OSError as e:
+                logger.warning(f"Couldn't write play log {self.path}: {e}")
+            return len(unique)
+
+    def recent(self, limit=None, since_ms=None):
+        """Newest-first plays, at most `limit`, optionally only those at or after `since_ms`."""
+        plays = []
+        with self._lock:
+            logged = list(self._plays)
+        for play in reversed(logged):
+            if since_ms is not None and play["played_at"] < since_ms:
+                break
+            plays.append(play)
+            if limit is not None and len(plays) >= limit:
+                break
+        return plays
+
+    def __len__(self):
+        return len(self._plays)
+
@@ -0,0 +1,138 @@
+import logging
+import config
+
+# local rule-based pre-scorer: maps track features (audio features, genres, popularity) and the next
+# event's keywords/minutes_until to a heuristic compatibility score with a confidence value. Confident
+# results ride along in vibe_context as local_analysis so the server can skip its LLM call.
+
+logger = logging.getLogger(__name__)
+
+# Genre keyword -> rough energy (0 calm .. 1 intense); substring match, so "canadian pop" hits "pop"
+GENRE_ENERGY = {
+    "ambient": 0.15, "classical": 0.2, "piano": 0.2, "lo-fi": 0.25, "lofi": 0.25,
+    "chill": 0.3, "acoustic": 0.3, "sleep": 0.1, "soundtrack": 0.35, "jazz": 0.35,
+    "folk": 0.35, "soul": 0.45, "r&b": 0.5, "indie": 0.5, "pop": 0.7,
+    "hip hop": 0.75, "rap": 0.75, "rock": 0.75, "trap": 0.8, "dance": 0.85,
+    "house": 0.85, "techno": 0.85, "edm": 0.9, "punk": 0.9, "metal": 0.95,
+    "drum and bass": 0.95,
+}
+
+# Event intent -> (keywords, energy range the music should fall in)
+EVENT_INTENTS = {
+    "deep-focus": (("exam", "lecture", "study", "class", "deep work", "focus", "review",
+                    "reading", "homework", "thesis", "interview", "presentation"), (0.0, 0.5)),
+    "collaborative": (("meeting", "standup", "stand-up", "sync", "1:1", "call", "team"), (0.2, 0.65)),
+    "creative": (("design", "brainstorm", "writing", "sketch", "jam"), (0.3, 0.8)),
+    "relaxation": (("lunch", "dinner", "break", "yoga", "meditation", "nap", "coffee"), (0.0, 0.6)),
+    "active": (("gym", "workout", "run", "training", "hiit", "practice", "party"), (0.6, 1.0)),
+}
+
+# Score inside the target range, and points lost per unit of energy outside it
+IN_RANGE_SCORE = 90
+OUT_OF_RANGE_PENALTY = 250
+# Scores this close to the alert threshold are left to the LLM
+BORDERLINE_MARGIN = 15
+
+
+def prescore(track, events):
+    """Heuristic analysis of a context, shaped like the server's AI response plus `confidence`."""
+    energy, valence, track_confidence = _track_energy(track)
+    analysis = {
+        "music_mood": _mood_label(energy, valence),
+        "task_intent": "none",
+        "compatibility_score": 100,
+        "transition_suggestion": None,
+        "song_recommendations": [],
+        "confidence": 1.0,
+        "source": "local",
+    }
+
+    if not events:
+        analysis["task_intent"] = "No upcoming events"
+        return analysis
+
+    event = events[0]
+    minutes_until = event.get("minutes_until", 0)
+    if minutes_until >= config.PRESCORE_HORIZON_MINUTES:
+        # Too far off for the current track to matter; the next polls will re-check. The text
+        # stays the same from poll to poll, so an unchanged context is still suppressed
+        analysis["task_intent"] = f"Next event over {config.PRESCORE_HORIZON_MINUTES} minutes away"
+        analysis["confidence"] = 0.9
+        return analysis
+
+    intent, (low, high), intent_confidence = _event_intent(event)
+    distance = max(low - energy, energy - high, 0.0)
+    score = max(0, min(100, round(IN_RANGE_SCORE - distance * OUT_OF_RANGE_PENALTY)))
+
+    confidence = track_confidence * intent_confidence
+    if abs(score - config.COMPATIBILITY_THRESHOLD) < BORDERLINE_MARGIN:
+        confidence *= 0.5
+
+    analysis["task_intent"] = intent
+    analysis["compatibility_score"] = score
+    analysis["confidence"] = round(confidence, 2)
+    return analysis
+
+
+def local_analysis(track, events):
+    """The pre-score if it confidently says synced, else None.
+
+    Ambiguous contexts go to the LLM, and so do likely mismatches: the alert needs the
+    LLM's transition suggestion and song recommendations.
+    """
+    if not config.PRESCORE_ENABLED:
+        return None
+    analysis = prescore(track, events)
+    if analysis["compatibility_score"] < config.COMPATIBILITY_THRESHOLD:
+        return None
+    if analysis["confidence"] < config.PRESCORE_MIN_CONFIDENCE:
+        logger.debug(f"Pre-score {analysis['compatibility_score']} too uncertain "
+                     f"({analysis['confidence']}), deferring to the LLM")
+        return None
+    logger.info(f"Local pre-score {analysis['compatibility_score']} "
+                f"(confidence {analysis['confidence']}): {analysis['task_intent']}")
+    return analysis
+
+
+def _track_energy(track):
+    """(energy, valence, confidence) from audio features, falling back to genres, then popularity."""
+    features = track.get("audio_features")
+    if features and features.get("energy") is not None:
+        energy = 0.7 * features["energy"] + 0.3 * features.get("danceability", features["energy"])
+        return energy, features.get("valence"), 0.9
+
+    matched = [
+        level
+        for genre in track.get("artist_genres") or []
+        for keyword, level in GENRE_ENERGY.items()
+        if keyword in genre.lower()
+    ]
+    if matched:
+        energy = sum(matched) / len(matched)
+        spread = max(matched) - min(matched)
+        return energy, None, 0.7 if spread <= 0.2 else 0.5
+
+    # Chart hits skew upbeat; weak evidence either way
+    popularity = track.get("popularity") or 50
+    return 0.5 + (popularity - 50) / 250, None, 0.3
+
+
+def _event_intent(event):
+    """(intent, energy range, confidence) from keywords in the event's summary, then description."""
+    summary = (event.get("summary") or "").lower()
+    description = (event.get("description") or "").lower()
+    for text, confidence in ((summary, 0.9), (description, 0.6)):
+        for intent, (keywords, energy_range) in EVENT_INTENTS.items():
+            if any(keyword in text for keyword in keywords):
+                return intent, energy_range, confidence
+    return "unknown", (0.0, 1.0), 0.2
+
+
+def _mood_label(energy, valence):
+    if energy >= 0.65:
+        return "energizing" if valence is None or valence >= 0.4 else "intense"
+    if energy <= 0.35:
+        return "calming"
+    if valence is not None and valence < 0.35:
+        return "melancholic"
+    return "balanced"
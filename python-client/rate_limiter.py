@@ -0,0 +1,136 @@
+import random
+import threading
+import time
+import logging
+
+# client-side rate limiting for the Spotify API: a token bucket that throttles us before Spotify
+# has to, a circuit breaker that honors Retry-After without sleeping, and jittered backoff
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Allows `capacity` requests per `window` seconds, refilling continuously."""
+
+    def __init__(self, capacity, window):
+        self.capacity = capacity
+        self.refill_rate = capacity / window
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a token if one is available. Returns seconds to wait otherwise (0 on success)."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.refill_rate
+
+    def acquire(self, timeout):
+        """Block the calling thread until a token is available or `timeout` elapses."""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Stops calls to an API while it is rate limiting us or failing.
+
+    CLOSED: calls go through. OPEN: calls are rejected until the cooldown ends.
+    HALF_OPEN: one trial call is allowed; success closes, failure reopens.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, base_cooldown=5, max_cooldown=300):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self._failures = 0
+        self._trips = 0
+        self._open_until = 0.0
+        self._trial_in_flight = False
+        self._trial_owner = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    @property
+    def is_open(self):
+        return self.state == self.OPEN
+
+    def remaining(self):
+        """Seconds until the breaker lets a trial call through."""
+        with self._lock:
+            return max(0.0, self._open_until - time.monotonic())
+
+    def allow(self):
+        """Whether a call may be made now."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_owner = threading.get_ident()
+                return True
+            return False
+
+    def release_trial(self):
+        """Give back a trial this thread took but ended without recording an outcome."""
+        with self._lock:
+            if self._trial_in_flight and self._trial_owner == threading.get_ident():
+                self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trips = 0
+            self._open_until = 0.0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Count a transient failure; opens with jittered exponential cooldown past the threshold."""
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                cooldown = max(self.base_cooldown, backoff_delay(self._trips, self.base_cooldown, self.max_cooldown))
+                self._open(cooldown)
+
+    def trip(self, seconds):
+        """Open immediately for `seconds`, e.g. from a 429 Retry-After header."""
+        with self._lock:
+            self._open(seconds)
+
+    def _open(self, seconds):
+        self._trips += 1
+        self._failures = 0
+        self._trial_in_flight = False
+        self._open_until = max(self._open_until, time.monotonic() + seconds)
+        logger.warning(f"Circuit breaker open for {seconds:.1f}s")
+
+    def _state(self):
+        if self._open_until == 0.0:
+            return self.CLOSED
+        if time.monotonic() < self._open_until:
+            return self.OPEN
+        return self.HALF_OPEN
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
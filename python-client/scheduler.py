@@ -0,0 +1,58 @@
+import time
+import logging
+import config
+
+# adaptive poll scheduler: uses progress_ms/duration_ms from the last now-playing response to
+# sleep until just before the predicted track change, and backs off exponentially while idle
+
+logger = logging.getLogger(__name__)
+
+# Once a track has overrun its predicted end by this much (buffering, seeking), stop fast polling
+TRANSITION_GRACE = 30
+
+
+class PollScheduler:
+    """Decides how long to wait before the next poll cycle."""
+
+    def __init__(self, base_interval=None, max_interval=None, fast_interval=None,
+                 transition_lead=None, idle_max_interval=None):
+        self.base_interval = base_interval or config.POLLING_INTERVAL
+        self.max_interval = max_interval or config.ADAPTIVE_MAX_INTERVAL
+        self.fast_interval = fast_interval or config.ADAPTIVE_FAST_INTERVAL
+        self.transition_lead = transition_lead or config.TRACK_TRANSITION_LEAD
+        self.idle_max_interval = idle_max_interval or config.IDLE_MAX_INTERVAL
+        self._idle_polls = 0
+
+    def next_delay(self, playback, now=None, breaker=None):
+        """Seconds to sleep given the playback snapshot from SpotifyClient.playback.
+
+        While the Spotify circuit breaker is open, waits until it lets a trial call through.
+        """
+        if breaker is not None and breaker.is_open:
+            delay = max(breaker.remaining(), self.fast_interval)
+            logger.warning(f"Spotify circuit open, next poll in {delay:.0f}s")
+            return delay
+
+        if not playback or not playback.get("is_playing"):
+            delay = min(self.base_interval * (2 ** self._idle_polls), self.idle_max_interval)
+            self._idle_polls += 1
+            return delay
+
+        self._idle_polls = 0
+        remaining = self._remaining_seconds(playback, now)
+        if remaining is None or remaining < -TRANSITION_GRACE:
+            return self.base_interval
+        if remaining <= self.transition_lead:
+            return self.fast_interval
+        return max(self.fast_interval, min(remaining - self.transition_lead, self.max_interval))
+
+    @staticmethod
+    def _remaining_seconds(playback, now=None):
+        """Predicted seconds left in the current track, accounting for time since the fetch."""
+        progress_ms = playback.get("progress_ms")
+        duration_ms = playback.get("duration_ms")
+        if progress_ms is None or not duration_ms:
+            return None
+        now = time.monotonic() if now is None else now
+        elapsed = now - playback.get("fetched_at", now)
+        return (duration_ms - progress_ms) / 1000 - elapsed
@@ -1,93 +1,277 @@
 import logging
 import time
-import json
 import os
+import threading
+import requests
 import spotipy
+from spotipy.cache_handler import CacheFileHandler
 from spotipy.oauth2 import SpotifyOAuth
 import config
+import metrics
+from persistent_cache import PersistentCache
+from play_log import PlayLog, parse_played_at
+from rate_limiter import TokenBucket, CircuitBreaker, backoff_delay
+from utils import atomic_write_json
 
-#gets spotify data using spotipy, with retry/backoff for rate limits and in-memory caching for artist genres
+#gets spotify data using spotipy, with retry/backoff for rate limits and a persistent cache for artist genres
 
 logger = logging.getLogger(__name__)
 
 MAX_RETRIES = 2
 MAX_RETRY_AFTER = 60
+MAX_THROTTLE_WAIT = 5  # longest a call waits on the client-side token bucket
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_CAP = 4
+TRANSIENT_STATUSES = (500, 502, 503, 504)
+ARTIST_BATCH_SIZE = 50  # max ids per several-artists request
+FEATURES_BATCH_SIZE = 100  # max ids per audio-features request
+HISTORY_PAGE_SIZE = 50  # max plays per recently-played request
+HISTORY_MAX_PAGES = 4
+# Syncs after a track change to pick up the play it completed (Spotify can lag a poll behind)
+HISTORY_CHANGE_ATTEMPTS = 2
+AUDIO_FEATURE_FIELDS = ("valence", "energy", "tempo", "danceability")
 CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
 
+API_CALLS = metrics.registry.counter(
+    "spotify_api_requests_total", "Spotify API requests by outcome (ok, HTTP status or network_error)",
+    labels=("endpoint", "outcome"),
+)
+RETRIES = metrics.registry.counter("spotify_api_retries_total", "Spotify API retries after a transient error", labels=("endpoint",))
+SKIPPED_CALLS = metrics.registry.counter(
+    "spotify_api_skipped_total", "Spotify calls not made because the breaker was open or the rate limit hit",
+    labels=("reason",),
+)
+CALL_SECONDS = metrics.registry.histogram(
+    "spotify_api_call_seconds", "Spotify calls end to end, including throttling and retry backoff", labels=("endpoint",)
+)
 
-def _create_spotify_client():
-    """Create a Spotify client, using cached token directly if still valid to avoid rate-limited refresh."""
-    auth_manager = SpotifyOAuth(
-        client_id=config.SPOTIFY_CLIENT_ID,
-        client_secret=config.SPOTIFY_CLIENT_SECRET,
-        redirect_uri=config.SPOTIFY_REDIRECT_URI,
-        scope="user-read-currently-playing user-read-playback-state user-read-recently-played",
-        open_browser=True,
-    )
 
-    # Try to use the cached token directly without triggering a refresh
-    if os.path.exists(CACHE_PATH):
+# Refresh inline only once a token is this close to expiry; normally TokenManager got there first
+EXPIRY_GRACE = 10
+
+
+class AtomicCacheFileHandler(CacheFileHandler):
+    """spotipy token cache written via temp file + rename, so a crash never truncates .cache."""
+
+    def save_token_to_cache(self, token_info):
         try:
-            with open(CACHE_PATH, "r") as f:
-                token_info = json.load(f)
-            if not auth_manager.is_token_expired(token_info):
-                logger.info("Using cached Spotify token directly (still valid)")
-                return spotipy.Spotify(auth=token_info["access_token"], retries=0, requests_timeout=10)
-            else:
-                logger.info("Cached token expired, attempting refresh")
-        except Exception as e:
-            logger.warning(f"Could not read cached token: {e}")
+            atomic_write_json(self.cache_path, token_info)
+        except OSError as e:
+            logger.warning(f"Couldn't write token to cache at {self.cache_path}: {e}")
+
+
+class SpotifyTokenSource:
+    """spotipy auth manager that serves the cached access token and leaves refreshing to
+    TokenManager, instead of spotipy's check-and-refresh on every request."""
+
+    name = "spotify"
+
+    def __init__(self, cache_path=None, name=None, interactive=True):
+        if name is not None:
+            self.name = name
+        self._cache = AtomicCacheFileHandler(cache_path=cache_path or CACHE_PATH)
+        self._oauth = SpotifyOAuth(
+            client_id=config.SPOTIFY_CLIENT_ID,
+            client_secret=config.SPOTIFY_CLIENT_SECRET,
+            redirect_uri=config.SPOTIFY_REDIRECT_URI,
+            scope="user-read-currently-playing user-read-playback-state user-read-recently-played",
+            open_browser=True,
+            cache_handler=self._cache,
+        )
+        self._lock = threading.Lock()
+        self._token_info = self._cache.get_cached_token()
+        if self._token_info is None and interactive:
+            # First run: log in now, saved through the cache handler, so polling never
+            # starts (and blocks poll threads) before there is a token
+            self._oauth.get_access_token(as_dict=False)
+            self._token_info = self._cache.get_cached_token()
+        if not interactive and not (self._token_info or {}).get("refresh_token"):
+            raise ValueError(f"No refreshable Spotify token in {self._cache.cache_path}")
+
+    def get_access_token(self, as_dict=False):
+        """Called by spotipy before each request."""
+        token_info = self._token_info
+        if token_info is None:
+            raise ValueError("Spotify isn't authorized: the login at startup produced no token")
+        if token_info.get("expires_at", 0) - time.time() < EXPIRY_GRACE:
+            logger.info("Spotify token expired before a background refresh, refreshing inline")
+            self.refresh()
+        return self._token_info if as_dict else self._token_info["access_token"]
+
+    def expires_at(self):
+        token_info = self._token_info
+        return token_info.get("expires_at") if token_info else None
+
+    def refresh(self):
+        with self._lock:
+            self._token_info = self._oauth.refresh_access_token(self._token_info["refresh_token"])
+
+
+def _create_spotify_client(token_source, session):
+    """Create a Spotify client that takes its bearer token from token_source.
 
-    # Fallback: let spotipy handle auth normally
-    return spotipy.Spotify(auth_manager=auth_manager, retries=0, requests_timeout=10)
+    spotipy uses a session it is given as-is, without its own retry adapter, so every
+    429 and 5xx reaches _call_with_retry with its headers intact.
+    """
+    return spotipy.Spotify(auth_manager=token_source, requests_session=session, requests_timeout=10)
+
+
+def _retry_after(error):
+    """Seconds to wait from a 429's Retry-After header, capped at MAX_RETRY_AFTER."""
+    try:
+        retry_after = int(error.headers.get("Retry-After", 5)) if error.headers else 5
+    except (TypeError, ValueError):
+        retry_after = 5
+    return min(retry_after, MAX_RETRY_AFTER)
+
+
+def _register_cache_metrics(prefix, cache):
+    metrics.registry.read_counter(f"{prefix}_hits_total", "Lookups served from the cache", lambda: cache.hits)
+    metrics.registry.read_counter(f"{prefix}_misses_total", "Lookups that needed the API", lambda: cache.misses)
+    metrics.registry.gauge(
+        f"{prefix}_hit_ratio", "Share of lookups served from the cache",
+        lambda: round(cache.hits / max(1, cache.hits + cache.misses), 4),
+    )
+
+
+class SpotifyResources:
+    """What every user of one Spotify app has in common: artist genres and audio features
+    are the same for everyone, and the rate limit is per app. Shared between tenants, so
+    per-user cost stays a token and a play log."""
+
+    def __init__(self, pool_size=None):
+        self.genre_cache = PersistentCache(
+            config.GENRE_CACHE_PATH,
+            ttl=config.GENRE_CACHE_TTL,
+            max_items=config.GENRE_CACHE_MAX_ITEMS,
+            max_rows=config.GENRE_CACHE_MAX_ROWS,
+        )
+        self.features_cache = PersistentCache(
+            config.AUDIO_FEATURES_CACHE_PATH,
+            max_items=config.AUDIO_FEATURES_CACHE_MAX_ITEMS,
+            max_rows=config.AUDIO_FEATURES_CACHE_MAX_ROWS,
+        )
+        self.bucket = TokenBucket(config.SPOTIFY_MAX_REQUESTS_PER_WINDOW, config.SPOTIFY_RATE_LIMIT_WINDOW)
+        self.breaker = CircuitBreaker()
+        # One keep-alive connection pool to api.spotify.com for every client
+        self.session = requests.Session()
+        if pool_size:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self.session.mount("https://", adapter)
+        _register_cache_metrics("spotify_genre_cache", self.genre_cache)
+        _register_cache_metrics("spotify_audio_features_cache", self.features_cache)
 
 
 class SpotifyClient:
-    def __init__(self):
-        self.sp = _create_spotify_client()
-        self._genre_cache = {}
+    # get_now_playing's answer when Spotify couldn't be asked (breaker open, throttled, an API
+    # error), as opposed to None for nothing playing
+    UNAVAILABLE = object()
+
+    def __init__(self, token_source=None, resources=None, play_log_path=None):
+        self.token_source = token_source or SpotifyTokenSource()
+        resources = resources or SpotifyResources()
+        self.sp = _create_spotify_client(self.token_source, session=resources.session)
+        self._genre_cache = resources.genre_cache
+        self._features_cache = resources.features_cache
+        # Spotify returns 403 for apps without audio-features access; stop asking after that
+        self._audio_features_enabled = True
+        self.play_log = PlayLog(play_log_path or config.PLAY_LOG_PATH, max_entries=config.PLAY_LOG_MAX_ENTRIES)
+        self._history_lock = threading.Lock()
+        self._history_track = None
+        self._history_attempts = 0
+        self._history_synced_at = None
         self._last_track_cache = None
-        self.rate_limited = False
+        self.playback = None
+        self.bucket = resources.bucket
+        self.breaker = resources.breaker
+
+    @property
+    def rate_limited(self):
+        """True while the circuit breaker is holding Spotify calls back."""
+        return self.breaker.is_open
 
-    def _call_with_retry(self, func, *args, **kwargs):
-        """Call a Spotify API function with retry/backoff on 429 rate limits."""
-        for attempt in range(MAX_RETRIES):
+    def _call_with_retry(self, func, *args, unavailable=None, **kwargs):
+        """Call a Spotify API function through the rate limiter and circuit breaker.
+
+        Throttles on the client-side token bucket before Spotify has to, opens the
+        breaker for Retry-After on a 429 instead of sleeping, and retries transient
+        5xx/network errors with jittered exponential backoff. Returns `unavailable`
+        when the call was not made or did not succeed.
+        """
+        endpoint = getattr(func, "__name__", "unknown")
+        with metrics.span(CALL_SECONDS, endpoint=endpoint):
             try:
-                result = func(*args, **kwargs)
-                self.rate_limited = False
-                return result
-            except spotipy.exceptions.SpotifyException as e:
-                if e.http_status == 429:
-                    retry_after = int(e.headers.get("Retry-After", 5)) if e.headers else 5
-                    retry_after = min(retry_after, MAX_RETRY_AFTER)
-                    logger.warning(f"Rate limited (429). Retrying after {retry_after}s (attempt {attempt + 1}/{MAX_RETRIES})")
-                    self.rate_limited = True
-                    time.sleep(retry_after)
-                elif e.http_status == 401:
-                    logger.warning("Token expired mid-session, recreating client")
-                    self.sp = _create_spotify_client()
-                    return None
-                else:
-                    raise
-            except Exception as e:
-                if "rate" in str(e).lower() or "limit" in str(e).lower():
-                    logger.warning(f"Rate limit detected: {e}")
-                    self.rate_limited = True
-                    return None
-                raise
-        logger.error(f"Rate limited after {MAX_RETRIES} retries, backing off")
-        self.rate_limited = True
-        return None
+                for attempt in range(MAX_RETRIES):
+                    if not self.breaker.allow():
+                        SKIPPED_CALLS.inc(reason="breaker")
+                        logger.debug(f"Circuit open, skipping Spotify call for {self.breaker.remaining():.0f}s")
+                        return unavailable
+                    if not self.bucket.acquire(timeout=MAX_THROTTLE_WAIT):
+                        SKIPPED_CALLS.inc(reason="throttle")
+                        logger.warning("Client-side Spotify rate limit reached, skipping call")
+                        return unavailable
+                    try:
+                        result = func(*args, **kwargs)
+                        API_CALLS.inc(endpoint=endpoint, outcome="ok")
+                        self.breaker.record_success()
+                        return result
+                    except spotipy.exceptions.SpotifyException as e:
+                        API_CALLS.inc(endpoint=endpoint, outcome=str(e.http_status))
+                        if e.http_status == 429:
+                            retry_after = _retry_after(e)
+                            logger.warning(f"Rate limited (429). Holding Spotify calls for {retry_after}s")
+                            self.breaker.trip(retry_after)
+                            return unavailable
+                        elif e.http_status == 401:
+                            # Revoked or expired early: refresh now and retry, rather than lose the cycle
+                            logger.warning("Spotify token rejected (401), refreshing and retrying")
+                            try:
+                                self.token_source.refresh()
+                            except Exception as refresh_error:
+                                logger.error(f"Spotify token refresh failed: {refresh_error}")
+                                return unavailable
+                            # The retry is the same trial, not a second one racing it
+                            self.breaker.release_trial()
+                            continue
+                        elif e.http_status in TRANSIENT_STATUSES:
+                            logger.warning(f"Spotify returned {e.http_status} (attempt {attempt + 1}/{MAX_RETRIES})")
+                        else:
+                            raise
+                    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                        API_CALLS.inc(endpoint=endpoint, outcome="network_error")
+                        logger.warning(f"Spotify network error: {e} (attempt {attempt + 1}/{MAX_RETRIES})")
+
+                    self.breaker.record_failure()
+                    if attempt + 1 < MAX_RETRIES:
+                        RETRIES.inc(endpoint=endpoint)
+                        time.sleep(backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_CAP))
+                logger.error(f"Spotify call failed after {MAX_RETRIES} attempts")
+                return unavailable
+            finally:
+                # A half-open trial that ended without an outcome (throttled, 404, a bug) must
+                # not hold the breaker half-open forever
+                self.breaker.release_trial()
 # fetches the currently playing track name, returns none if nothing is playing
-    def get_now_playing(self):
-        """Returns track info dict or None if nothing is playing."""
+    def get_now_playing(self, resolve_genres=True, resolve_features=True):
+        """Returns track info dict, None if nothing is playing, or UNAVAILABLE if
+        Spotify couldn't be asked.
+
+        With resolve_genres/resolve_features=False only cached genres and audio
+        features are used, so the caller can resolve the rest in one batch via
+        resolve_genres() and resolve_audio_features().
+        """
         try:
-            result = self._call_with_retry(self.sp.current_user_playing_track)
+            result = self._call_with_retry(self.sp.current_user_playing_track, unavailable=self.UNAVAILABLE)
+            if result is self.UNAVAILABLE:
+                self._record_playback(None)
+                return self.UNAVAILABLE
+            self._record_playback(result)
 
             if result is None or not result.get("is_playing"):
                 return None
 
             track = result["item"]
+            track_id = track.get("id")
             artist_id = track["artists"][0]["id"]
 
             images = track["album"].get("images", [])
@@ -98,54 +282,246 @@ class SpotifyClient:
                 "artist": track["artists"][0]["name"],
                 "album": track["album"]["name"],
                 "album_art_url": album_art_url,
-                "artist_genres": self._get_artist_genres(artist_id),
+                "track_id": track_id,
+                "artist_id": artist_id,
+                "artist_genres": (
+                    self._get_artist_genres(artist_id) if resolve_genres
+                    else self._genre_cache.get(artist_id, [])
+                ),
                 "popularity": track.get("popularity", 0),
             }
+            features = (
+                self.resolve_audio_features([track_id]) if resolve_features
+                else self._features_cache.get_many([track_id])
+            )
+            self.attach_audio_features(track_info, [], features)
 
             self._last_track_cache = track_info
             return track_info
 
         except spotipy.exceptions.SpotifyException as e:
             logger.error(f"Spotify API error: {e}")
-            return None
+            return self.UNAVAILABLE
         except Exception as e:
-            if "rate" in str(e).lower() or "limit" in str(e).lower():
-                self.rate_limited = True
             logger.error(f"Spotify error: {e}")
             return None
+
+    def _record_playback(self, result):
+        """Keep a timing snapshot of the last now-playing response for the poll scheduler."""
+        if result is None:
+            self.playback = None
+            return
+        item = result.get("item") or {}
+        self.playback = {
+            "is_playing": bool(result.get("is_playing")),
+            "track_id": item.get("id"),
+            "progress_ms": result.get("progress_ms"),
+            "duration_ms": item.get("duration_ms"),
+            "fetched_at": time.monotonic(),
+        }
 # fetches last 5 recently played tracks (reduced from 10 to save API calls)
-    def get_recent_tracks(self, limit=5):
-        """Returns list of recently played tracks with name and artist."""
+    def get_recent_tracks(self, limit=5, resolve_genres=True, resolve_features=True):
+        """Returns up to `limit` distinct recently played tracks with name, artist, genres
+        and, where known, audio features.
+
+        Served from the local play log, which is first brought up to date when a sync
+        is due (see _history_sync_due), so steady playback costs no history requests.
+        """
         try:
-            results = self._call_with_retry(self.sp.current_user_recently_played, limit=limit)
-            if results is None:
-                return []
-            tracks = []
-            seen = set()
-            for item in results.get("items", []):
-                t = item["track"]
-                key = (t["name"], t["artists"][0]["name"])
-                if key in seen:
-                    continue
-                seen.add(key)
-                tracks.append({
-                    "name": t["name"],
-                    "artist": t["artists"][0]["name"],
-                    "genres": self._genre_cache.get(t["artists"][0].get("id"), []),
-                })
+            # A sync still running from a cycle that hit its deadline: serve the log as is
+            if self._history_lock.acquire(blocking=False):
+                try:
+                    if self._history_sync_due():
+                        self.sync_history()
+                finally:
+                    self._history_lock.release()
+            tracks = self.history(limit)
+            if resolve_genres:
+                genres = self.resolve_genres([t["artist_id"] for t in tracks])
+            else:
+                genres = self._genre_cache.get_many([t["artist_id"] for t in tracks])
+            self.attach_genres(None, tracks, genres)
+            track_ids = [t["track_id"] for t in tracks if t["track_id"]]
+            if resolve_features:
+                features = self.resolve_audio_features(track_ids)
+            else:
+                features = self._features_cache.get_many(track_ids)
+            self.attach_audio_features(None, tracks, features)
             return tracks
         except Exception as e:
             logger.error(f"Error fetching recent tracks: {e}")
             return []
+
+    def history(self, limit=None, within_minutes=None):
+        """Distinct tracks from the local play log, newest first; no API calls."""
+        since_ms = None
+        if within_minutes is not None:
+            since_ms = int((time.time() - within_minutes * 60) * 1000)
+        tracks = []
+        seen = set()
+        for play in self.play_log.recent(since_ms=since_ms):
+            key = (play["name"], play["artist"])
+            if key in seen:
+                continue
+            seen.add(key)
+            tracks.append({
+                "name": play["name"],
+                "artist": play["artist"],
+                "track_id": play["track_id"],
+                "artist_id": play["artist_id"],
+                "genres": [],
+            })
+            if limit is not None and len(tracks) >= limit:
+                break
+        return tracks
+
+    def _history_sync_due(self):
+        """Sync on startup, for a couple of polls after the playing track changes (the
+        previous one just became a play), and otherwise every PLAY_LOG_SYNC_INTERVAL."""
+        track_id = (self.playback or {}).get("track_id")
+        if track_id != self._history_track:
+            self._history_track = track_id
+            self._history_attempts = HISTORY_CHANGE_ATTEMPTS
+        if self._history_attempts > 0:
+            return True
+        return (
+            self._history_synced_at is None
+            or time.monotonic() - self._history_synced_at >= config.PLAY_LOG_SYNC_INTERVAL
+        )
+
+    def sync_history(self):
+        """Fetch plays newer than the play log's cursor into the log. Returns how many were added."""
+        added = 0
+        for _ in range(HISTORY_MAX_PAGES):
+            cursor = self.play_log.cursor
+            params = {"limit": HISTORY_PAGE_SIZE}
+            if cursor is not None:
+                params["after"] = cursor
+            results = self._call_with_retry(self.sp.current_user_recently_played, **params)
+            if results is None:
+                return added
+            items = results.get("items", [])
+            added += self.play_log.append(self._plays_from(items))
+            # Without a cursor there is nothing older worth backfilling; with one, a full
+            # page means more new plays are waiting
+            if cursor is None or len(items) < HISTORY_PAGE_SIZE:
+                break
+
+        self._history_synced_at = time.monotonic()
+        if added:
+            self._history_attempts = 0
+            logger.info(f"Logged {added} new plays ({len(self.play_log)} in history)")
+        elif self._history_attempts > 0:
+            self._history_attempts -= 1
+        return added
+
+    @staticmethod
+    def _plays_from(items):
+        plays = []
+        for item in items:
+            played_at = parse_played_at(item.get("played_at"))
+            if played_at is None:
+                continue
+            t = item["track"]
+            plays.append({
+                "played_at": played_at,
+                "track_id": t.get("id"),
+                "name": t["name"],
+                "artist": t["artists"][0]["name"],
+                "artist_id": t["artists"][0].get("id"),
+            })
+        return plays
 # looks up an artists genre
     def _get_artist_genres(self, artist_id):
-        """Get genres for the artist, with in-memory caching."""
-        if artist_id in self._genre_cache:
-            return self._genre_cache[artist_id]
+        """Get genres for the artist, with persistent caching."""
+        cached = self._genre_cache.get(artist_id)
+        if cached is not None:
+            return cached
         try:
             artist = self._call_with_retry(self.sp.artist, artist_id)
-            genres = artist.get("genres", []) if artist else []
+            if not artist:
+                # Rate limited or failed: don't persist an empty result
+                return []
+            genres = artist.get("genres", [])
             self._genre_cache[artist_id] = genres
             return genres
         except Exception:
             return []
+# resolves genres for every artist in a cycle with one batched request
+    def resolve_genres(self, artist_ids):
+        """Returns {artist_id: genres}, fetching all uncached artists in chunks of 50."""
+        ids = list(dict.fromkeys(a for a in artist_ids if a))
+        genres = self._genre_cache.get_many(ids)
+        missing = [a for a in ids if a not in genres]
+        if len(missing) == 1:
+            # One artist costs one request either way
+            genres[missing[0]] = self._get_artist_genres(missing[0])
+            return genres
+
+        fetched = {}
+        for i in range(0, len(missing), ARTIST_BATCH_SIZE):
+            chunk = missing[i:i + ARTIST_BATCH_SIZE]
+            try:
+                result = self._call_with_retry(self.sp.artists, chunk)
+            except Exception as e:
+                logger.warning(f"Batch artist lookup failed: {e}")
+                break
+            if not result:
+                break
+            for artist in result.get("artists", []):
+                if artist:
+                    fetched[artist["id"]] = artist.get("genres", [])
+
+        self._genre_cache.set_many(fetched)
+        genres.update(fetched)
+        return genres
+
+# resolves audio features for every track in a cycle; each track ID is fetched once, ever
+    def resolve_audio_features(self, track_ids):
+        """Returns {track_id: features} for tracks that have them, fetching uncached IDs in
+        chunks of 100. Tracks Spotify has no features for are cached as empty."""
+        ids = list(dict.fromkeys(t for t in track_ids if t))
+        cached = self._features_cache.get_many(ids)
+        missing = [t for t in ids if t not in cached]
+
+        fetched = {}
+        for i in range(0, len(missing), FEATURES_BATCH_SIZE):
+            if not self._audio_features_enabled:
+                break
+            chunk = missing[i:i + FEATURES_BATCH_SIZE]
+            try:
+                result = self._call_with_retry(self.sp.audio_features, chunk)
+            except spotipy.exceptions.SpotifyException as e:
+                if e.http_status == 403:
+                    logger.warning("Audio features are not available to this Spotify app, disabling lookups")
+                    self._audio_features_enabled = False
+                else:
+                    logger.warning(f"Audio features lookup failed: {e}")
+                break
+            except Exception as e:
+                logger.warning(f"Audio features lookup failed: {e}")
+                break
+            if not result:
+                break
+            # One entry per requested ID, None for tracks without features (e.g. local files)
+            for track_id, entry in zip(chunk, result):
+                fetched[track_id] = {k: entry[k] for k in AUDIO_FEATURE_FIELDS if k in entry} if entry else {}
+
+        self._features_cache.set_many(fetched)
+        cached.update(fetched)
+        return {track_id: features for track_id, features in cached.items() if features}
+
+    @staticmethod
+    def attach_audio_features(track, recent_tracks, features):
+        """Set audio_features on a now-playing track and recent tracks from resolve_audio_features()."""
+        for t in ([track] if track is not None else []) + list(recent_tracks or []):
+            if t.get("track_id") in features:
+                t["audio_features"] = features[t["track_id"]]
+
+    @staticmethod
+    def attach_genres(track, recent_tracks, genres):
+        """Fill artist_genres/genres on a now-playing track and recent tracks from resolve_genres()."""
+        if track is not None:
+            track["artist_genres"] = genres.get(track.get("artist_id"), track.get("artist_genres", []))
+        for t in recent_tracks or []:
+            t["genres"] = genres.get(t.get("artist_id"), t.get("genres", []))
@@ -0,0 +1,215 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+import metrics
+from calendar_client import CalendarClient, build_shared_service
+from scheduler import PollScheduler
+from spotify_client import SpotifyClient, SpotifyResources, SpotifyTokenSource
+
+# multi-tenant polling: loads the users listed in TENANTS_FILE and runs all their poll cycles on one
+# event loop. Users share the Spotify caches, rate limiter and connection pool, one Calendar service,
+# the blocking-call thread pool and one Socket.io connection; per user there is only tokens, a play
+# log, event store and schedule. Authorize a user with: python tenants.py authorize <user>
+
+logger = logging.getLogger(__name__)
+
+# User ids become directory and Socket.io room names
+USER_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+SPOTIFY_TOKEN_FILE = ".cache"
+GOOGLE_TOKEN_FILE = "google_token.json"
+
+SCHEDULE_LAG = metrics.registry.histogram(
+    "vibe_sync_tenant_schedule_lag_seconds", "How late tenant poll cycles start after falling due"
+)
+CYCLE_TIMEOUTS = metrics.registry.counter(
+    "vibe_sync_tenant_cycle_timeouts_total", "Tenant poll cycles cut off at TENANT_CYCLE_DEADLINE"
+)
+
+
+class Tenant:
+    """One user's clients and poll schedule."""
+
+    def __init__(self, user, spotify, calendar, emitter):
+        self.user = user
+        self.spotify = spotify
+        self.calendar = calendar
+        self.emitter = emitter
+        self.scheduler = PollScheduler()
+
+
+def load_tenants(path):
+    """Parse a tenants file: a JSON list of {"user": id, "calendar_ids": [...]} entries."""
+    with open(path) as f:
+        entries = json.load(f)
+    tenants = []
+    seen = set()
+    for entry in entries:
+        user = entry.get("user") if isinstance(entry, dict) else None
+        if not isinstance(user, str) or not USER_ID.match(user) or user in seen:
+            raise ValueError(f"Invalid or duplicate tenant user id in {path}: {user!r}")
+        seen.add(user)
+        tenants.append({"user": user, "calendar_ids": entry.get("calendar_ids")})
+    return tenants
+
+
+def tenant_dir(user):
+    base = config.TENANTS_DIR or os.path.dirname(os.path.abspath(config.TENANTS_FILE))
+    return os.path.join(base, user)
+
+
+def create_tenant(entry, connection, resources, calendar_service, calendar_pool):
+    """Build one user's clients on the shared resources, or None if they can't be polled."""
+    user = entry["user"]
+    user_dir = tenant_dir(user)
+    spotify_token = os.path.join(user_dir, SPOTIFY_TOKEN_FILE)
+    google_token = os.path.join(user_dir, GOOGLE_TOKEN_FILE)
+    if not (os.path.exists(spotify_token) and os.path.exists(google_token)):
+        # Authorization is interactive, which a shared poller can't do
+        logger.error(f"Tenant {user} isn't authorized, skipping (run: python tenants.py authorize {user})")
+        return None
+    try:
+        spotify = SpotifyClient(
+            token_source=SpotifyTokenSource(cache_path=spotify_token, name=f"spotify:{user}", interactive=False),
+            resources=resources,
+            play_log_path=os.path.join(user_dir, "play_log.jsonl"),
+        )
+        calendar = CalendarClient(
+            calendar_ids=entry["calendar_ids"],
+            token_path=google_token,
+            sync_state_path=os.path.join(user_dir, "calendar_sync.json"),
+            service=calendar_service,
+            pool=calendar_pool,
+            interactive=False,
+        )
+    except Exception as e:
+        logger.error(f"Couldn't set up tenant {user}, skipping: {e}")
+        return None
+    calendar.token_source.name = f"google:{user}"
+    return Tenant(user, spotify, calendar, connection.emitter(user))
+
+
+async def create_tenants(entries, connection):
+    """Set up every tenant concurrently on the default executor, sharing what can be shared."""
+    resources = SpotifyResources(pool_size=config.TENANT_WORKERS)
+    calendar_service = build_shared_service()
+    calendar_pool = ThreadPoolExecutor(max_workers=config.TENANT_WORKERS, thread_name_prefix="calendar")
+    created = await asyncio.gather(*(
+        asyncio.to_thread(create_tenant, entry, connection, resources, calendar_service, calendar_pool)
+        for entry in entries
+    ))
+    tenants = [tenant for tenant in created if tenant is not None]
+    logger.info(f"Polling {len(tenants)} of {len(entries)} tenants")
+    _check_rate_budget(len(tenants))
+    metrics.registry.gauge("vibe_sync_tenants", "Tenants being polled", lambda: len(tenants))
+    return tenants
+
+
+def _check_rate_budget(count):
+    """Warn when `count` users polling as slowly as they ever do while playing would already
+    need more than the shared Spotify budget."""
+    needed = count * config.SPOTIFY_RATE_LIMIT_WINDOW / config.ADAPTIVE_MAX_INTERVAL
+    if needed > config.SPOTIFY_MAX_REQUESTS_PER_WINDOW:
+        logger.warning(
+            f"{count} tenants need at least {needed:.0f} Spotify requests per {config.SPOTIFY_RATE_LIMIT_WINDOW}s "
+            f"but SPOTIFY_MAX_REQUESTS_PER_WINDOW is {config.SPOTIFY_MAX_REQUESTS_PER_WINDOW}; most polls will be "
+            f"throttled. Raise it to the Spotify app's quota."
+        )
+
+
+class TenantPoller:
+    """Runs every tenant's poll cycles on the current event loop.
+
+    Due cycles start earliest-deadline-first, at most max_concurrent at a time, so when
+    many users fall due together they queue in order rather than racing for threads.
+    Each user has at most one cycle in flight, and it is cut off after cycle_deadline.
+    """
+
+    def __init__(self, tenants, cycle, max_concurrent=None, cycle_deadline=None, startup_spread=None):
+        self.tenants = tenants
+        self.cycle = cycle
+        self.cycle_deadline = cycle_deadline or config.TENANT_CYCLE_DEADLINE
+        self._slots = asyncio.Semaphore(max_concurrent or config.TENANT_MAX_CONCURRENT_CYCLES)
+        # (due, seq, tenant); seq keeps ties first-come first-served
+        self._due = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._in_flight = set()
+        spread = config.TENANT_STARTUP_SPREAD if startup_spread is None else startup_spread
+        now = time.monotonic()
+        for i, tenant in enumerate(tenants):
+            self._schedule(tenant, now + spread * i / len(tenants))
+
+    def _schedule(self, tenant, due):
+        heapq.heappush(self._due, (due, next(self._seq), tenant))
+        self._wakeup.set()
+
+    async def run(self):
+        while True:
+            if not self._due:
+                # Every tenant is mid-cycle
+                await self._wait(None)
+                continue
+            delay = self._due[0][0] - time.monotonic()
+            if delay > 0:
+                await self._wait(delay)
+                continue
+            await self._slots.acquire()
+            due, _, tenant = heapq.heappop(self._due)
+            task = asyncio.create_task(self._run_cycle(tenant, due))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _wait(self, timeout):
+        """Sleep until `timeout` passes or a finished cycle reschedules its tenant."""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run_cycle(self, tenant, due):
+        SCHEDULE_LAG.observe(max(0.0, time.monotonic() - due))
+        try:
+            await asyncio.wait_for(
+                self.cycle(tenant.spotify, tenant.calendar, tenant.emitter), timeout=self.cycle_deadline
+            )
+        except asyncio.TimeoutError:
+            CYCLE_TIMEOUTS.inc()
+            logger.warning(f"Poll cycle for {tenant.user} exceeded {self.cycle_deadline}s, cut off")
+        except Exception as e:
+            logger.error(f"Poll cycle error for {tenant.user}: {e}", exc_info=True)
+        finally:
+            self._slots.release()
+        delay = tenant.scheduler.next_delay(tenant.spotify.playback, breaker=tenant.spotify.breaker)
+        self._schedule(tenant, time.monotonic() + delay)
+
+
+def authorize(user):
+    """Interactive Spotify and Google login for a tenant, saving tokens into its directory."""
+    if not USER_ID.match(user):
+        raise ValueError(f"Invalid user id: {user!r}")
+    user_dir = tenant_dir(user)
+    os.makedirs(user_dir, exist_ok=True)
+    SpotifyTokenSource(cache_path=os.path.join(user_dir, SPOTIFY_TOKEN_FILE)).get_access_token()
+    CalendarClient(
+        token_path=os.path.join(user_dir, GOOGLE_TOKEN_FILE),
+        sync_state_path=os.path.join(user_dir, "calendar_sync.json"),
+    )
+    logger.info(f"Tenant {user} authorized, tokens saved in {user_dir}")
+
+
+if __name__ == "__main__":
+    from utils import setup_logging
+
+    setup_logging()
+    if len(sys.argv) != 3 or sys.argv[1] != "authorize" or not config.TENANTS_FILE:
+        sys.exit("usage: TENANTS_FILE=tenants.json python tenants.py authorize <user>")
+    authorize(sys.argv[2])
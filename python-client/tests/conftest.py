@@ -0,0 +1,14 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_state_files(tmp_path, monkeypatch):
+    """Point on-disk client state (sync stores, caches) at a per-test temp dir."""
+    import config
+
+    monkeypatch.setattr(config, "CALENDAR_SYNC_STATE_PATH", str(tmp_path / "calendar_sync.json"))
+    monkeypatch.setattr(config, "GENRE_CACHE_PATH", str(tmp_path / "genre_cache.sqlite"))
+    monkeypatch.setattr(config, "AUDIO_FEATURES_CACHE_PATH", str(tmp_path / "audio_features_cache.sqlite"))
+    monkeypatch.setattr(config, "PLAY_LOG_PATH", str(tmp_path / "play_log.jsonl"))
+    monkeypatch.setattr(config, "GOOGLE_TOKEN_PATH", str(tmp_path / "google_token.json"))
+    monkeypatch.setattr("spotify_client.CACHE_PATH", str(tmp_path / "spotify_token_cache"))
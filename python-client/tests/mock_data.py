@@ -20,6 +20,13 @@ MOCK_ARTIST = {
     "genres": ["canadian pop", "pop"],
 }
 
+MOCK_ARTISTS = {
+    "artists": [
+        {"id": "artist1", "genres": ["canadian pop", "pop"]},
+        {"id": "artist2", "genres": ["dance pop", "pop"]},
+    ],
+}
+
 MOCK_AUDIO_FEATURES = [{
     "valence": 0.334,
     "energy": 0.730,
@@ -53,18 +60,21 @@ MOCK_RECENTLY_PLAYED = {
                 "name": "Starboy",
                 "artists": [{"id": "artist1", "name": "The Weeknd"}],
             },
+            "played_at": "2026-02-17T18:50:12.000Z",
         },
         {
             "track": {
                 "name": "Save Your Tears",
                 "artists": [{"id": "artist1", "name": "The Weeknd"}],
             },
+            "played_at": "2026-02-17T18:46:40.000Z",
         },
         {
             "track": {
                 "name": "Levitating",
                 "artists": [{"id": "artist2", "name": "Dua Lipa"}],
             },
+            "played_at": "2026-02-17T18:43:05.000Z",
         },
     ]
 }
@@ -1,3 +1,4 @@
+import datetime
 import pytest
 from unittest.mock import MagicMock, mock_open, patch
 from tests.mock_data import MOCK_CALENDAR_RESPONSE
@@ -68,3 +69,253 @@ def test_minutes_until():
 
     result = CalendarClient._minutes_until(future_str)
     assert 29 <= result <= 31  # Allow slight timing variance
+
+
+def _event(event_id, summary, start_offset_minutes, status="confirmed"):
+    import datetime
+
+    start = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=start_offset_minutes)
+    end = start + datetime.timedelta(minutes=30)
+    return {
+        "id": event_id,
+        "summary": summary,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": end.isoformat()},
+        "status": status,
+    }
+
+
+def _incremental_client(mock_build):
+    from calendar_client import CalendarClient
+
+    mock_service = MagicMock()
+    mock_build.return_value = mock_service
+    return CalendarClient(incremental=True), mock_service
+
+
+@patch("calendar_client.build")
+@patch("calendar_client.Credentials")
+@patch("calendar_client.os.path.exists", return_value=True)
+def test_incremental_sync_applies_deltas(mock_exists, mock_creds_cls, mock_build):
+    mock_creds_cls.from_authorized_user_file.return_value.valid = True
+    client, mock_service = _incremental_client(mock_build)
+    list_call = mock_service.events.return_value.list
+
+    list_call.return_value.execute.return_value = {
+        "items": [_event("a", "Standup", 20), _event("b", "Lecture", 60)],
+        "nextSyncToken": "token-1",
+    }
+    events = client.get_upcoming_events(hours=2)
+
+    assert [e["summary"] for e in events] == ["Standup", "Lecture"]
+    assert "timeMin" in list_call.call_args.kwargs
+
+    # Within the sync interval the local store answers without an API call
+    list_call.reset_mock()
+    client.get_upcoming_events(hours=2)
+    list_call.assert_not_called()
+
+    # A delta removes one event and adds another
+    list_call.return_value.execute.return_value = {
+        "items": [_event("a", "Standup", 20, status="cancelled"), _event("c", "Gym", 90)],
+        "nextSyncToken": "token-2",
+    }
+    client.sync()
+    events = client.get_upcoming_events(hours=2)
+
+    assert list_call.call_args.kwargs["syncToken"] == "token-1"
+    assert [e["summary"] for e in events] == ["Lecture", "Gym"]
+    assert client._sync_tokens["primary"] == "token-2"
+
+    # State survives a restart
+    restarted, _ = _incremental_client(mock_build)
+    assert restarted._sync_tokens["primary"] == "token-2"
+    assert set(restarted._events["primary"]) == {"b", "c"}
+
+
+@patch("calendar_client.build")
+@patch("calendar_client.Credentials")
+@patch("calendar_client.os.path.exists", return_value=True)
+def test_incremental_sync_full_resync_on_410(mock_exists, mock_creds_cls, mock_build):
+    from googleapiclient.errors import HttpError
+
+    mock_creds_cls.from_authorized_user_file.return_value.valid = True
+    client, mock_service = _incremental_client(mock_build)
+    client._sync_tokens["primary"] = "stale"
+    client._horizons["primary"] = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=7)
+    client._events["primary"] = {"old": _event("old", "Deleted Long Ago", 30)}
+
+    gone = HttpError(MagicMock(status=410), b"Sync token is no longer valid")
+    fresh = {"items": [_event("n", "Office Hours", 45)], "nextSyncToken": "fresh"}
+    mock_service.events.return_value.list.return_value.execute.side_effect = [gone, fresh]
+
+    events = client.get_upcoming_events(hours=2)
+
+    assert [e["summary"] for e in events] == ["Office Hours"]
+    assert client._sync_tokens["primary"] == "fresh"
+
+
+@patch("calendar_client.build")
+@patch("calendar_client.Credentials")
+@patch("calendar_client.os.path.exists", return_value=True)
+def test_failed_sync_serves_stored_events(mock_exists, mock_creds_cls, mock_build):
+    mock_creds_cls.from_authorized_user_file.return_value.valid = True
+    client, mock_service = _incremental_client(mock_build)
+    execute = mock_service.events.return_value.list.return_value.execute
+    execute.return_value = {"items": [_event("a", "Standup", 20)], "nextSyncToken": "token-1"}
+    client.sync()
+
+    # A network blip on the next sync doesn't blank out what the store already holds
+    execute.side_effect = ConnectionError("network unreachable")
+    client._last_sync = None
+    events = client.get_upcoming_events(hours=2)
+
+    assert [e["summary"] for e in events] == ["Standup"]
+    assert client._sync_tokens["primary"] == "token-1"
+
+
+@patch("calendar_client.build")
+@patch("calendar_client.Credentials")
+@patch("calendar_client.os.path.exists", return_value=True)
+def test_full_sync_is_bounded_by_a_horizon(mock_exists, mock_creds_cls, mock_build):
+    mock_creds_cls.from_authorized_user_file.return_value.valid = True
+    client, mock_service = _incremental_client(mock_build)
+    list_call = mock_service.events.return_value.list
+    list_call.return_value.execute.return_value = {
+        "items": [_event("a", "Standup", 20), _event("far", "Next Month", 60 * 24 * 30)],
+        "nextSyncToken": "token-1",
+    }
+
+    client.sync()
+
+    # A recurring series is only expanded up to the horizon, and anything past it is dropped
+    assert "timeMax" in list_call.call_args.kwargs
+    assert set(client._events["primary"]) == {"a"}
+
+    # Once the horizon runs low, the next sync is a full one that extends it
+    client._horizons["primary"] = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+    client.sync()
+    assert "syncToken" not in list_call.call_args.kwargs
+    assert client._horizons["primary"] - datetime.datetime.now(datetime.timezone.utc) > datetime.timedelta(days=6)
+
+
+@patch("calendar_client.atomic_write_json")
+@patch("calendar_client.build")
+@patch("calendar_client.Credentials")
+@patch("calendar_client.os.path.exists", return_value=True)
+def test_sync_state_only_written_when_events_change(mock_exists, mock_creds_cls, mock_build, mock_write):
+    mock_creds_cls.from_authorized_user_file.return_value.valid = True
+    client, mock_service = _incremental_client(mock_build)
+    list_call = mock_service.events.return_value.list
+    standup = _event("a", "Standup", 20)
+    list_call.return_value.execute.return_value = {"items": [standup], "nextSyncToken": "token-1"}
+
+    client.sync()
+    assert mock_write.call_count == 1
+
+    # Nothing changed: the stored state is still good, so the file isn't rewritten
+    list_call.return_value.execute.return_value = {"items": [], "nextSyncToken": "token-2"}
+    client.sync()
+    list_call.return_value.execute.return_value = {"items": [dict(standup)], "nextSyncToken": "token-3"}
+    client.sync()
+    assert mock_write.call_count == 1
+
+    list_call.return_value.execute.return_value = {"items": [_event("b", "Gym", 90)], "nextSyncToken": "token-4"}
+    client.sync()
+    assert mock_write.call_count == 2
+
+
+@patch("calendar_client.config.CALENDAR_BATCH_REQUESTS", False)
+@patch("calendar_client.build")
+@patch("calendar_client.Credentials")
+@patch("calendar_client.os.path.exists", return_value=True)
+def test_multiple_calendars_fetched_concurrently_and_merged(mock_exists, mock_creds_cls, mock_build):
+    import time
+    from calendar_client import CalendarClient
+
+    mock_creds_cls.from_authorized_user_file.return_value.valid = True
+    mock_service = MagicMock()
+    mock_build.return_value = mock_service
+
+    team_meeting = dict(_event("t1", "Team Sync", 30), iCalUID="sync@example.com")
+    items = {
+        "primary": [_event("p1", "Lecture", 10), dict(team_meeting, id="p2")],
+        "work": [team_meeting, _event("w2", "Deep Work", 60)],
+        "class": [_event("c1", "Office Hours", 20)],
+    }
+
+    def list_events(calendarId, **kwargs):
+        request = MagicMock()
+
+        def execute(**kwargs):
+            time.sleep(0.2)
+            return {"items": items[calendarId]}
+
+        request.execute.side_effect = execute
+        return request
+
+    mock_service.events.return_value.list.side_effect = list_events
+
+    client = CalendarClient(calendar_ids=["primary", "work", "class"])
+    started = time.monotonic()
+    events = client.get_upcoming_events(hours=2)
+
+    # Three calendars cost one round trip, not three
+    assert time.monotonic() - started < 0.5
+    # Merged by start time, with the meeting shared by two calendars listed once
+    assert [e["summary"] for e in events] == ["Lecture", "Office Hours", "Team Sync", "Deep Work"]
+
+
+class _FakeBatch:
+    """Stands in for BatchHttpRequest: runs each added request on execute()."""
+
+    def __init__(self, callback, executed):
+        self.callback = callback
+        self.requests = []
+        self.executed = executed
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        self.executed.append([request_id for request_id, _ in self.requests])
+        for request_id, request in self.requests:
+            try:
+                self.callback(request_id, request.execute(), None)
+            except Exception as e:
+                self.callback(request_id, None, e)
+
+
+@patch("calendar_client.build")
+@patch("calendar_client.Credentials")
+@patch("calendar_client.os.path.exists", return_value=True)
+def test_multiple_calendars_fetched_in_one_batch(mock_exists, mock_creds_cls, mock_build):
+    from calendar_client import CalendarClient
+
+    mock_creds_cls.from_authorized_user_file.return_value.valid = True
+    mock_service = MagicMock()
+    mock_build.return_value = mock_service
+
+    items = {
+        "primary": [_event("p1", "Lecture", 10)],
+        "work": [_event("w1", "Deep Work", 60)],
+    }
+
+    def list_events(calendarId, **kwargs):
+        request = MagicMock()
+        if calendarId == "broken":
+            request.execute.side_effect = Exception("404 Not Found")
+        else:
+            request.execute.return_value = {"items": items[calendarId]}
+        return request
+
+    executed = []
+    mock_service.events.return_value.list.side_effect = list_events
+    mock_service.new_batch_http_request.side_effect = lambda callback: _FakeBatch(callback, executed)
+
+    client = CalendarClient(calendar_ids=["primary", "broken", "work"])
+    events = client.get_upcoming_events(hours=2)
+
+    assert executed == [["primary", "broken", "work"]]
+    # A failing calendar drops out without taking the others with it
+    assert [e["summary"] for e in events] == ["Lecture", "Deep Work"]
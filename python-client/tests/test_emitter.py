@@ -1,58 +1,327 @@
+import asyncio
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from tests.mock_data import MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS
 
 
-@patch("emitter.socketio.Client")
+def _mock_async_client():
+    mock_sio = MagicMock()
+    mock_sio.connect = AsyncMock()
+    mock_sio.disconnect = AsyncMock()
+    mock_sio.emit = AsyncMock()
+    return mock_sio
+
+
+@patch("emitter.socketio.AsyncClient")
 def test_emit_idle(mock_client_cls):
     from emitter import Emitter
 
-    mock_sio = MagicMock()
+    mock_sio = _mock_async_client()
     mock_client_cls.return_value = mock_sio
 
     emitter = Emitter("http://localhost:3001")
-    emitter.emit_idle()
+    asyncio.run(emitter.emit_idle())
 
-    mock_sio.emit.assert_called_once_with("vibe_idle", {})
+    mock_sio.emit.assert_awaited_once_with("vibe_idle", {})
 
 
-@patch("emitter.socketio.Client")
+@patch("emitter.socketio.AsyncClient")
 def test_emit_context(mock_client_cls):
     from emitter import Emitter
 
-    mock_sio = MagicMock()
+    mock_sio = _mock_async_client()
     mock_client_cls.return_value = mock_sio
 
     emitter = Emitter("http://localhost:3001")
-    emitter.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS)
+    asyncio.run(emitter.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS))
 
-    mock_sio.emit.assert_called_once_with("vibe_context", {
+    mock_sio.emit.assert_awaited_once_with("vibe_context", {
         "track": MOCK_TRACK_INFO,
         "events": MOCK_CALENDAR_EVENTS,
+        "recent_tracks": [],
     })
 
 
-@patch("emitter.socketio.Client")
+@patch("emitter.socketio.AsyncClient")
 def test_connect(mock_client_cls):
     from emitter import Emitter
 
-    mock_sio = MagicMock()
+    mock_sio = _mock_async_client()
     mock_client_cls.return_value = mock_sio
 
     emitter = Emitter("http://localhost:3001")
-    emitter.connect()
+    asyncio.run(emitter.connect())
 
-    mock_sio.connect.assert_called_once_with("http://localhost:3001")
+    mock_sio.connect.assert_awaited_once_with("http://localhost:3001")
 
 
-@patch("emitter.socketio.Client")
+@patch("emitter.socketio.AsyncClient")
 def test_disconnect(mock_client_cls):
     from emitter import Emitter
 
-    mock_sio = MagicMock()
+    mock_sio = _mock_async_client()
+    mock_client_cls.return_value = mock_sio
+
+    emitter = Emitter("http://localhost:3001")
+    asyncio.run(emitter.disconnect())
+
+    mock_sio.disconnect.assert_awaited_once()
+
+
+@patch("emitter.socketio.AsyncClient")
+def test_first_context_time_is_taken_when_a_context_is_sent(mock_client_cls):
+    from emitter import Emitter
+
+    mock_sio = _mock_async_client()
+    mock_client_cls.return_value = mock_sio
+    emitter = Emitter("http://localhost:3001")
+
+    # Neither idle nor a buffered context counts as the first emit
+    asyncio.run(emitter.emit_idle())
+    mock_sio.connected = False
+    asyncio.run(emitter.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS))
+    assert emitter.first_context_at is None
+
+    mock_sio.connected = True
+    asyncio.run(emitter._flush_buffer())
+    assert emitter.first_context_at is not None
+
+
+@patch("emitter.socketio.AsyncClient")
+def test_emit_context_suppresses_unchanged_context(mock_client_cls):
+    from emitter import Emitter
+
+    mock_sio = _mock_async_client()
+    mock_client_cls.return_value = mock_sio
+    emitter = Emitter("http://localhost:3001")
+
+    # Popularity and a minute of countdown inside the same bucket don't change the vibe
+    later_events = [dict(MOCK_CALENDAR_EVENTS[0], minutes_until=46)]
+    asyncio.run(emitter.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS))
+    asyncio.run(emitter.emit_context(dict(MOCK_TRACK_INFO, popularity=93), later_events))
+
+    assert mock_sio.emit.await_count == 1
+
+    # A different track does
+    asyncio.run(emitter.emit_context(dict(MOCK_TRACK_INFO, name="Starboy"), MOCK_CALENDAR_EVENTS))
+    assert mock_sio.emit.await_count == 2
+
+
+@patch("emitter.config.EMIT_KEEPALIVE_INTERVAL", 0)
+@patch("emitter.socketio.AsyncClient")
+def test_emit_context_keepalive_resends_full_state(mock_client_cls):
+    from emitter import Emitter
+
+    mock_sio = _mock_async_client()
+    mock_client_cls.return_value = mock_sio
+    emitter = Emitter("http://localhost:3001")
+
+    asyncio.run(emitter.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS))
+    asyncio.run(emitter.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS))
+
+    assert [c.args[0] for c in mock_sio.emit.await_args_list] == ["vibe_context", "vibe_context"]
+
+
+@patch("emitter.config.EMIT_DELTAS", True)
+@patch("emitter.socketio.AsyncClient")
+def test_emit_context_sends_delta_for_small_changes(mock_client_cls):
+    from emitter import Emitter
+
+    mock_sio = _mock_async_client()
+    mock_client_cls.return_value = mock_sio
+    emitter = Emitter("http://localhost:3001")
+
+    recent = [{"name": "Starboy", "artist": "The Weeknd", "genres": []}]
+    asyncio.run(emitter.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS))
+    asyncio.run(emitter.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS, recent))
+
+    mock_sio.emit.assert_awaited_with("vibe_context_delta", {"recent_tracks": recent})
+
+
+@patch("emitter.config.EMIT_DELTAS", True)
+@patch("emitter.socketio.AsyncClient")
+def test_enrichment_and_local_analysis_are_not_suppressed(mock_client_cls):
+    from emitter import Emitter
+
+    mock_sio = _mock_async_client()
+    mock_client_cls.return_value = mock_sio
+    emitter = Emitter("http://localhost:3001")
+
+    bare = dict(MOCK_TRACK_INFO, artist_genres=[], audio_features=None)
+    enriched = dict(MOCK_TRACK_INFO, artist_genres=["synthwave"], audio_features={"energy": 0.73})
+    analysis = {"compatibility_score": 90, "confidence": 0.8, "source": "local"}
+    asyncio.run(emitter.emit_context(bare, MOCK_CALENDAR_EVENTS))
+
+    # Genres and audio features resolved a cycle later change what the server would score
+    asyncio.run(emitter.emit_context(enriched, MOCK_CALENDAR_EVENTS))
+    mock_sio.emit.assert_awaited_with("vibe_context_delta", {"track": enriched})
+
+    asyncio.run(emitter.emit_context(enriched, MOCK_CALENDAR_EVENTS, local_analysis=analysis))
+    mock_sio.emit.assert_awaited_with("vibe_context_delta", {"local_analysis": analysis})
+    assert mock_sio.emit.await_count == 3
+
+
+@patch("emitter.config.EMIT_DELTAS", True)
+@patch("emitter.socketio.AsyncClient")
+def test_emit_context_attaches_and_clears_local_analysis(mock_client_cls):
+    from emitter import Emitter
+
+    mock_sio = _mock_async_client()
     mock_client_cls.return_value = mock_sio
+    emitter = Emitter("http://localhost:3001")
+
+    analysis = {"compatibility_score": 90, "confidence": 0.8, "source": "local"}
+    recent = [{"name": "Starboy", "artist": "The Weeknd", "genres": []}]
+    asyncio.run(emitter.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS, local_analysis=analysis))
+    assert mock_sio.emit.await_args.args[1]["local_analysis"] == analysis
+
+    # The server merges deltas into its last context, so a dropped analysis must be cleared
+    asyncio.run(emitter.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS, recent))
+    mock_sio.emit.assert_awaited_with(
+        "vibe_context_delta", {"recent_tracks": recent, "local_analysis": None}
+    )
+
 
+@patch("emitter.socketio.AsyncClient")
+def test_emit_idle_suppresses_repeats(mock_client_cls):
+    from emitter import Emitter
+
+    mock_sio = _mock_async_client()
+    mock_client_cls.return_value = mock_sio
+    emitter = Emitter("http://localhost:3001")
+
+    asyncio.run(emitter.emit_idle())
+    asyncio.run(emitter.emit_idle())
+
+    mock_sio.emit.assert_awaited_once_with("vibe_idle", {})
+
+
+@patch("emitter.config.EMIT_FLUSH_INTERVAL", 0)
+@patch("emitter.socketio.AsyncClient")
+def test_buffers_while_disconnected_and_replays_latest_state(mock_client_cls):
+    from emitter import Emitter
+
+    mock_sio = _mock_async_client()
+    mock_sio.connected = False
+    mock_client_cls.return_value = mock_sio
     emitter = Emitter("http://localhost:3001")
-    emitter.disconnect()
 
-    mock_sio.disconnect.assert_called_once()
+    async def scenario():
+        await emitter.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS)
+        await emitter.emit_idle()
+        await emitter.emit_context(dict(MOCK_TRACK_INFO, name="Starboy"), MOCK_CALENDAR_EVENTS)
+        mock_sio.emit.assert_not_awaited()
+
+        mock_sio.connected = True
+        await emitter._flush_buffer()
+
+    asyncio.run(scenario())
+
+    # Only the newest event of each type goes out, in the order last queued
+    sent = [(c.args[0], c.args[1].get("track", {}).get("name")) for c in mock_sio.emit.await_args_list]
+    assert sent == [("vibe_idle", None), ("vibe_context", "Starboy")]
+    assert len(emitter._buffer) == 0
+
+
+@patch("emitter.socketio.AsyncClient")
+def test_buffer_is_bounded(mock_client_cls):
+    from emitter import Emitter
+
+    mock_sio = _mock_async_client()
+    mock_sio.connected = False
+    mock_client_cls.return_value = mock_sio
+
+    with patch("emitter.config.EMIT_BUFFER_SIZE", 3):
+        emitter = Emitter("http://localhost:3001")
+    for i in range(10):
+        asyncio.run(emitter.emit_context(dict(MOCK_TRACK_INFO, name=f"Track {i}"), MOCK_CALENDAR_EVENTS))
+
+    assert [data["track"]["name"] for _, data in emitter._buffer] == ["Track 7", "Track 8", "Track 9"]
+
+
+@patch("emitter.socketio.AsyncClient")
+def test_spilled_events_survive_restart(mock_client_cls, tmp_path):
+    from emitter import Emitter
+
+    mock_sio = _mock_async_client()
+    mock_sio.connected = False
+    mock_client_cls.return_value = mock_sio
+
+    with patch("emitter.config.EMIT_SPILL_PATH", str(tmp_path / "spill.jsonl")):
+        asyncio.run(Emitter("http://localhost:3001").emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS))
+        restarted = Emitter("http://localhost:3001")
+
+    assert [event for event, _ in restarted._buffer] == ["vibe_context"]
+
+
+@patch("emitter.socketio.AsyncClient")
+def test_spill_file_is_bounded(mock_client_cls, tmp_path):
+    from emitter import Emitter
+
+    mock_sio = _mock_async_client()
+    mock_sio.connected = False
+    mock_client_cls.return_value = mock_sio
+    spill = tmp_path / "spill.jsonl"
+
+    with patch("emitter.config.EMIT_SPILL_PATH", str(spill)), patch("emitter.config.EMIT_BUFFER_SIZE", 3):
+        emitter = Emitter("http://localhost:3001")
+        for i in range(20):
+            asyncio.run(emitter.emit_context(dict(MOCK_TRACK_INFO, name=f"Track {i}"), MOCK_CALENDAR_EVENTS))
+        restarted = Emitter("http://localhost:3001")
+
+    assert len(spill.read_text().splitlines()) < 6
+    assert [data["track"]["name"] for _, data in restarted._buffer] == ["Track 17", "Track 18", "Track 19"]
+
+
+@patch("emitter.config.EMIT_FLUSH_INTERVAL", 0.05)
+@patch("emitter.socketio.AsyncClient")
+def test_replay_stops_once_fresh_state_is_sent(mock_client_cls):
+    from emitter import Emitter
+
+    mock_sio = _mock_async_client()
+    mock_sio.connected = False
+    mock_client_cls.return_value = mock_sio
+    emitter = Emitter("http://localhost:3001")
+
+    async def scenario():
+        await emitter.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS)
+        await emitter.emit_idle()
+
+        mock_sio.connected = True
+        flush = asyncio.create_task(emitter._flush_buffer())
+        await asyncio.sleep(0.01)
+        # A poll cycle lands between two replayed events
+        await emitter.emit_context(dict(MOCK_TRACK_INFO, name="Starboy"), MOCK_CALENDAR_EVENTS)
+        await flush
+
+    asyncio.run(scenario())
+
+    # The buffered vibe_idle is older than the fresh context, so it must not follow it
+    sent = [(c.args[0], c.args[1].get("track", {}).get("name")) for c in mock_sio.emit.await_args_list]
+    assert sent == [("vibe_context", MOCK_TRACK_INFO["name"]), ("vibe_context", "Starboy")]
+
+
+@patch("emitter.socketio.AsyncClient")
+def test_shared_connection_multiplexes_users_over_one_socket(mock_client_cls):
+    from emitter import SharedConnection
+
+    mock_sio = _mock_async_client()
+    mock_client_cls.return_value = mock_sio
+
+    connection = SharedConnection("http://localhost:3001")
+    alice, bob = connection.emitter("alice"), connection.emitter("bob")
+
+    async def scenario():
+        await connection.connect()
+        await alice.emit_idle()
+        await bob.emit_context(MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS)
+        # Per-user suppression: alice repeating herself doesn't silence bob
+        await alice.emit_idle()
+        await bob.emit_idle()
+
+    asyncio.run(scenario())
+
+    assert mock_client_cls.call_count == 1
+    mock_sio.connect.assert_awaited_once_with("http://localhost:3001")
+    sent = [(c.args[0], c.args[1]["user"]) for c in mock_sio.emit.await_args_list]
+    assert sent == [("vibe_idle", "alice"), ("vibe_context", "bob"), ("vibe_idle", "bob")]
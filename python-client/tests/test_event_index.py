@@ -0,0 +1,57 @@
+import datetime
+from event_index import EventIndex
+
+NOW = datetime.datetime(2026, 2, 17, 12, 0, tzinfo=datetime.timezone.utc).timestamp()
+
+
+def _item(summary, start_offset_minutes, duration_minutes=30, status="confirmed"):
+    start = datetime.datetime.fromtimestamp(NOW, datetime.timezone.utc) + datetime.timedelta(minutes=start_offset_minutes)
+    end = start + datetime.timedelta(minutes=duration_minutes)
+    return {
+        "summary": summary,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": end.isoformat()},
+        "status": status,
+    }
+
+
+def _summaries(entries):
+    return [entry.item["summary"] for entry in entries]
+
+
+def _index():
+    return EventIndex([
+        _item("Gym", 300),
+        _item("All-hands", -240, duration_minutes=360),
+        _item("Standup", -10, duration_minutes=15),
+        _item("Lecture", 45, duration_minutes=75),
+        _item("Breakfast", -180),
+        _item("Cancelled", 20, status="cancelled"),
+    ])
+
+
+def test_current_events_include_long_overlapping_ones():
+    assert _summaries(_index().current(NOW)) == ["Standup", "All-hands"]
+    assert _summaries(_index().current(NOW + 10 * 60)) == ["All-hands"]
+
+
+def test_next_event_within_minutes():
+    index = _index()
+    assert index.next_event(NOW).item["summary"] == "Lecture"
+    assert index.next_event(NOW, within_minutes=30) is None
+    assert index.next_event(NOW + 400 * 60) is None
+
+
+def test_free_gap():
+    index = _index()
+    assert index.free_gap(NOW) == 0
+    # All-hands ends at +120; free from then until the Gym at +300
+    assert index.free_gap(NOW + 120 * 60) == 180 * 60
+    assert index.free_gap(NOW + 400 * 60) is None
+
+
+def test_window_orders_in_progress_then_upcoming():
+    index = _index()
+    assert _summaries(index.window(NOW, hours=2)) == ["All-hands", "Standup", "Lecture"]
+    assert _summaries(index.window(NOW, hours=24)) == ["All-hands", "Standup", "Lecture", "Gym"]
+    assert len(index) == 5
@@ -0,0 +1,141 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from tests.mock_data import MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS
+
+
+def _slow(value, delay):
+    def call(*args, **kwargs):
+        time.sleep(delay)
+        return value
+    return call
+
+
+def test_poll_cycle_fetches_sources_concurrently():
+    import main
+
+    spotify = MagicMock()
+    spotify.get_now_playing.side_effect = _slow(MOCK_TRACK_INFO, 0.2)
+    spotify.get_recent_tracks.side_effect = _slow([], 0.2)
+    calendar = MagicMock()
+    calendar.get_upcoming_events.side_effect = _slow(MOCK_CALENDAR_EVENTS, 0.2)
+    emitter = MagicMock()
+    emitter.emit_context = AsyncMock()
+
+    started = time.monotonic()
+    asyncio.run(main.poll_cycle(spotify, calendar, emitter))
+    elapsed = time.monotonic() - started
+
+    # Bounded by the slowest source, not the sum of all three
+    assert elapsed < 0.5
+    # Pop vs. a lecture reads as a likely mismatch, so it is left to the LLM
+    emitter.emit_context.assert_awaited_once_with(
+        MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS, [], local_analysis=None
+    )
+
+
+def test_poll_cycle_emits_idle_when_nothing_playing():
+    import main
+
+    spotify = MagicMock()
+    spotify.get_now_playing.return_value = None
+    spotify.get_recent_tracks.return_value = []
+    calendar = MagicMock()
+    calendar.get_upcoming_events.return_value = []
+    emitter = MagicMock()
+    emitter.emit_idle = AsyncMock()
+    emitter.emit_context = AsyncMock()
+
+    asyncio.run(main.poll_cycle(spotify, calendar, emitter))
+
+    emitter.emit_idle.assert_awaited_once()
+    emitter.emit_context.assert_not_awaited()
+
+
+def test_poll_cycle_keeps_last_context_when_spotify_unavailable():
+    import main
+
+    spotify = MagicMock()
+    spotify.get_now_playing.return_value = spotify.UNAVAILABLE
+    spotify.get_recent_tracks.return_value = []
+    calendar = MagicMock()
+    calendar.get_upcoming_events.return_value = []
+    emitter = MagicMock()
+    emitter.emit_idle = AsyncMock()
+    emitter.emit_context = AsyncMock()
+
+    asyncio.run(main.poll_cycle(spotify, calendar, emitter))
+
+    # A throttled or skipped call doesn't mean playback stopped
+    emitter.emit_idle.assert_not_awaited()
+    emitter.emit_context.assert_not_awaited()
+
+
+def test_poll_cycle_emits_before_calendar_is_ready():
+    import main
+
+    spotify = MagicMock()
+    spotify.get_now_playing.return_value = MOCK_TRACK_INFO
+    spotify.get_recent_tracks.return_value = []
+    emitter = MagicMock()
+    emitter.emit_context = AsyncMock()
+
+    asyncio.run(main.poll_cycle(spotify, None, emitter))
+
+    emitter.emit_context.assert_awaited_once()
+    assert emitter.emit_context.await_args.args[:2] == (MOCK_TRACK_INFO, [])
+
+
+def test_run_keeps_polling_when_calendar_init_fails(monkeypatch):
+    import emitter as emitter_module
+    import main
+
+    spotify = MagicMock()
+    emitter = MagicMock(connect=AsyncMock(), disconnect=AsyncMock(), first_context_at=None)
+    create_calendar = MagicMock(side_effect=RuntimeError("no credentials"))
+    cycles = []
+
+    async def cycle(spotify, calendar, emitter):
+        cycles.append(calendar)
+
+    monkeypatch.setattr(main, "_create_spotify", lambda: spotify)
+    monkeypatch.setattr(main, "_create_calendar", create_calendar)
+    monkeypatch.setattr(main, "poll_cycle", cycle)
+    monkeypatch.setattr(main, "TokenManager", MagicMock())
+    monkeypatch.setattr(main.PollScheduler, "next_delay", lambda self, playback, breaker: 0.01)
+    monkeypatch.setattr(main.config, "METRICS_PORT", 0)
+    monkeypatch.setattr(main.config, "CALENDAR_INIT_RETRY", 0.05)
+    monkeypatch.setattr(emitter_module, "Emitter", lambda url: emitter)
+
+    async def run_briefly():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(main.run(), timeout=0.3)
+
+    asyncio.run(run_briefly())
+
+    # Polling carried on without Calendar while its init was retried
+    assert len(cycles) > 5 and all(calendar is None for calendar in cycles)
+    assert create_calendar.call_count >= 2
+    emitter.disconnect.assert_awaited_once()
+
+
+@patch("main.config.CALENDAR_DEADLINE", 0.1)
+def test_poll_cycle_calendar_deadline():
+    import main
+
+    spotify = MagicMock()
+    spotify.get_now_playing.return_value = MOCK_TRACK_INFO
+    spotify.get_recent_tracks.return_value = []
+    calendar = MagicMock()
+    calendar.get_upcoming_events.side_effect = _slow(MOCK_CALENDAR_EVENTS, 0.5)
+    emitter = MagicMock()
+    emitter.emit_context = AsyncMock()
+
+    asyncio.run(main.poll_cycle(spotify, calendar, emitter))
+
+    # Calendar missed its deadline, so the cycle goes out without events (pre-scored as synced)
+    emitter.emit_context.assert_awaited_once()
+    args, kwargs = emitter.emit_context.await_args
+    assert args == (MOCK_TRACK_INFO, [], [])
+    assert kwargs["local_analysis"]["compatibility_score"] == 100
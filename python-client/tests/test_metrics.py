@@ -0,0 +1,123 @@
+import asyncio
+import time
+import urllib.request
+from unittest.mock import MagicMock
+
+import pytest
+
+import main
+import metrics
+from metrics import Counter, Histogram, Registry
+
+
+def test_counter_renders_one_series_per_label_set():
+    counter = Counter("calls_total", "Calls made", labels=("endpoint",))
+    counter.inc(endpoint="artists")
+    counter.inc(2, endpoint="artists")
+    counter.inc(endpoint="audio_features")
+
+    assert counter.value(endpoint="artists") == 3
+    assert counter.render() == [
+        "# HELP calls_total Calls made",
+        "# TYPE calls_total counter",
+        'calls_total{endpoint="artists"} 3',
+        'calls_total{endpoint="audio_features"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value)
+
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 4.250000" in lines
+    assert "latency_seconds_count 4" in lines
+
+
+def test_gauge_is_read_at_scrape_time_and_skipped_if_unreadable():
+    registry = Registry()
+    hits = [0]
+    registry.gauge("cache_hits", "Cache hits", lambda: hits[0])
+    registry.gauge("broken", "Raises", lambda: 1 / 0)
+
+    hits[0] = 7
+    rendered = registry.render()
+    assert "cache_hits 7" in rendered
+    assert "broken" not in rendered
+
+
+def test_cache_hits_and_misses_are_exposed_as_counters():
+    from spotify_client import SpotifyResources
+
+    resources = SpotifyResources()
+    resources.genre_cache.set("a1", ["pop"])
+    resources.genre_cache.get_many(["a1", "a2"])
+
+    rendered = metrics.registry.render()
+    assert "# TYPE spotify_genre_cache_hits_total counter" in rendered
+    assert "spotify_genre_cache_hits_total 1" in rendered
+    assert "spotify_genre_cache_misses_total 1" in rendered
+
+
+def test_span_records_even_when_the_block_raises():
+    histogram = Histogram("stage_seconds", "Stage time", labels=("stage",))
+    with pytest.raises(ValueError):
+        with metrics.span(histogram, stage="calendar"):
+            raise ValueError("boom")
+
+    assert histogram.count(stage="calendar") == 1
+
+
+def test_poll_cycle_records_per_stage_timings():
+    spotify = MagicMock()
+    spotify.get_now_playing.return_value = {"name": "Song", "artist": "Artist", "artist_id": "a1", "track_id": "t1"}
+    spotify.get_recent_tracks.return_value = []
+    spotify.resolve_genres.return_value = {}
+    spotify.resolve_audio_features.return_value = {}
+    calendar = MagicMock()
+    calendar.get_upcoming_events.return_value = []
+    emitter = MagicMock()
+    emitter.emit_context = MagicMock(side_effect=lambda *a, **k: asyncio.sleep(0))
+
+    stages = ("cycle", "now_playing", "calendar", "recent_tracks", "genres", "audio_features", "emit")
+    before = {stage: metrics.STAGE_SECONDS.count(stage=stage) for stage in stages}
+    asyncio.run(main.poll_cycle(spotify, calendar, emitter))
+
+    for stage in stages:
+        assert metrics.STAGE_SECONDS.count(stage=stage) == before[stage] + 1, stage
+
+
+def test_deadline_exceeded_is_counted():
+    before = metrics.DEADLINES_EXCEEDED.value(stage="slow")
+    result = asyncio.run(main._fetch(time.sleep, 0.2, deadline=0.01, default="fallback", stage="slow"))
+
+    assert result == "fallback"
+    assert metrics.DEADLINES_EXCEEDED.value(stage="slow") == before + 1
+
+
+def test_taken_metrics_port_is_not_fatal(monkeypatch, caplog):
+    server = metrics.start_server(0)
+    try:
+        monkeypatch.setattr(main.config, "METRICS_PORT", server.server_address[1])
+        main._start_metrics_server()
+        assert "continuing without" in caplog.text
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_endpoint_serves_prometheus_text():
+    server = metrics.start_server(0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            body = response.read().decode()
+            assert response.headers["Content-Type"].startswith("text/plain")
+        assert "# TYPE vibe_sync_stage_seconds histogram" in body
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,71 @@
+from unittest.mock import patch
+from persistent_cache import PURGE_INTERVAL, PersistentCache
+
+
+def test_values_survive_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = PersistentCache(path)
+    cache["artist1"] = ["canadian pop", "pop"]
+    cache.close()
+
+    reopened = PersistentCache(path)
+    assert reopened.get("artist1") == ["canadian pop", "pop"]
+    assert "artist2" not in reopened
+
+
+def test_get_many_returns_only_cached_keys(tmp_path):
+    cache = PersistentCache(str(tmp_path / "cache.sqlite"))
+    cache.set_many({"a": ["pop"], "b": []})
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": ["pop"], "b": []}
+    assert cache.hits == 2
+    assert cache.misses == 1
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    cache = PersistentCache(str(tmp_path / "cache.sqlite"), ttl=60)
+    with patch("persistent_cache.time.time", return_value=1000.0):
+        cache["artist1"] = ["pop"]
+    with patch("persistent_cache.time.time", return_value=1030.0):
+        assert cache.get("artist1") == ["pop"]
+    with patch("persistent_cache.time.time", return_value=1061.0):
+        assert cache.get("artist1") is None
+        cache.purge_expired()
+    assert len(cache) == 0
+
+
+def test_expired_rows_are_purged_on_open(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    with patch("persistent_cache.time.time", return_value=1000.0):
+        cache = PersistentCache(path, ttl=60)
+        cache["artist1"] = ["pop"]
+        cache.close()
+
+    with patch("persistent_cache.time.time", return_value=1061.0):
+        reopened = PersistentCache(path, ttl=60)
+    assert len(reopened) == 0
+
+
+def test_rows_on_disk_are_capped(tmp_path):
+    cache = PersistentCache(str(tmp_path / "cache.sqlite"), max_rows=3)
+    for i in range(5):
+        with patch("persistent_cache.time.time", return_value=1000.0 + i):
+            cache[f"track{i}"] = {"energy": i}
+
+    # Over the cap until the next purge, which runs periodically while writing
+    assert len(cache) == 5
+    with patch("persistent_cache.time.monotonic", return_value=cache._purged_at + PURGE_INTERVAL + 1):
+        cache["track5"] = {"energy": 5}
+    assert len(cache) == 3
+    assert [key for key, in cache._db.execute("SELECT key FROM cache ORDER BY key")] == ["track3", "track4", "track5"]
+
+
+def test_memory_layer_is_bounded(tmp_path):
+    cache = PersistentCache(str(tmp_path / "cache.sqlite"), max_items=2)
+    for i in range(5):
+        cache[f"artist{i}"] = [f"genre{i}"]
+
+    assert len(cache._memory) == 2
+    # Evicted entries are still served from disk
+    assert cache.get("artist0") == ["genre0"]
+    assert len(cache) == 5
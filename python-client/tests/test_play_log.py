@@ -0,0 +1,55 @@
+from play_log import PlayLog, parse_played_at
+
+
+def _play(played_at, name="Song"):
+    return {"played_at": played_at, "track_id": f"t{played_at}", "name": name, "artist": "Artist", "artist_id": "a1"}
+
+
+def test_parse_played_at_to_epoch_ms():
+    assert parse_played_at("2026-02-17T18:50:12.500Z") == 1771354212500
+    assert parse_played_at(None) is None
+    assert parse_played_at("not a time") is None
+
+
+def test_append_keeps_only_plays_newer_than_the_cursor(tmp_path):
+    log = PlayLog(str(tmp_path / "plays.jsonl"))
+    assert log.cursor is None
+
+    assert log.append([_play(2000), _play(1000)]) == 2
+    assert log.cursor == 2000
+    # Overlapping page: only 3000 is new
+    assert log.append([_play(3000), _play(2000), _play(1000)]) == 1
+    assert [p["played_at"] for p in log.recent()] == [3000, 2000, 1000]
+
+
+def test_recent_by_count_and_time_window(tmp_path):
+    log = PlayLog(str(tmp_path / "plays.jsonl"))
+    log.append([_play(t) for t in (1000, 2000, 3000, 4000)])
+
+    assert [p["played_at"] for p in log.recent(limit=2)] == [4000, 3000]
+    assert [p["played_at"] for p in log.recent(since_ms=2500)] == [4000, 3000]
+
+
+def test_log_survives_restart_and_skips_torn_line(tmp_path):
+    path = tmp_path / "plays.jsonl"
+    PlayLog(str(path)).append([_play(1000), _play(2000)])
+    with open(path, "a") as f:
+        f.write('{"played_at": 30')  # crash mid-append
+
+    reopened = PlayLog(str(path))
+    assert reopened.cursor == 2000
+    reopened.append([_play(3000)])
+
+    # The torn line was rewritten away rather than appended to
+    assert [p["played_at"] for p in PlayLog(str(path)).recent()] == [3000, 2000, 1000]
+
+
+def test_file_is_compacted_to_max_entries(tmp_path):
+    path = tmp_path / "plays.jsonl"
+    log = PlayLog(str(path), max_entries=3)
+    for t in range(1, 8):
+        log.append([_play(t * 1000)])
+
+    assert len(log) == 3
+    assert len(path.read_text().splitlines()) < 6
+    assert [p["played_at"] for p in PlayLog(str(path), max_entries=3).recent()] == [7000, 6000, 5000]
@@ -0,0 +1,61 @@
+from unittest.mock import patch
+from prescorer import prescore, local_analysis
+from tests.mock_data import MOCK_TRACK_INFO, MOCK_CALENDAR_EVENTS, MOCK_AUDIO_FEATURES
+
+
+def _track(**overrides):
+    return dict(MOCK_TRACK_INFO, **overrides)
+
+
+def _event(summary, minutes_until=20, description=""):
+    return [{"summary": summary, "description": description, "start_time": "", "minutes_until": minutes_until}]
+
+
+def test_no_events_is_confidently_synced():
+    analysis = local_analysis(MOCK_TRACK_INFO, [])
+    assert analysis["compatibility_score"] == 100
+    assert analysis["source"] == "local"
+
+
+def test_distant_event_is_confidently_synced():
+    analysis = local_analysis(MOCK_TRACK_INFO, _event("Exam", minutes_until=90))
+    assert analysis["compatibility_score"] == 100
+
+
+def test_distant_event_analysis_is_stable_across_polls():
+    # local_analysis is fingerprinted, so a per-minute countdown would defeat emit suppression
+    analyses = [local_analysis(MOCK_TRACK_INFO, _event("Exam", minutes_until=m)) for m in (94, 93, 92)]
+    assert analyses[0] == analyses[1] == analyses[2]
+
+
+def test_calm_genres_before_lecture_skip_the_llm():
+    analysis = local_analysis(_track(artist_genres=["ambient", "lo-fi beats"]), MOCK_CALENDAR_EVENTS)
+    assert analysis["task_intent"] == "deep-focus"
+    assert analysis["compatibility_score"] >= 60
+
+
+def test_likely_mismatch_is_left_to_the_llm():
+    analysis = prescore(_track(artist_genres=["metal"]), MOCK_CALENDAR_EVENTS)
+    assert analysis["compatibility_score"] < 60
+    assert local_analysis(_track(artist_genres=["metal"]), MOCK_CALENDAR_EVENTS) is None
+
+
+def test_unknown_event_is_ambiguous():
+    analysis = prescore(_track(artist_genres=["ambient"]), _event("Catch up with Sam"))
+    assert analysis["confidence"] < 0.6
+    assert local_analysis(_track(artist_genres=["ambient"]), _event("Catch up with Sam")) is None
+
+
+def test_audio_features_take_precedence_over_genres():
+    calm = {"valence": 0.2, "energy": 0.1, "tempo": 70.0, "danceability": 0.2}
+    analysis = prescore(_track(audio_features=calm), _event("Gym"))
+    assert analysis["music_mood"] == "calming"
+    assert analysis["compatibility_score"] < 60
+
+    analysis = prescore(_track(audio_features=MOCK_AUDIO_FEATURES[0]), _event("Gym"))
+    assert analysis["compatibility_score"] == 90
+
+
+@patch("prescorer.config.PRESCORE_ENABLED", False)
+def test_disabled():
+    assert local_analysis(MOCK_TRACK_INFO, []) is None
@@ -0,0 +1,90 @@
+import pytest
+from unittest.mock import patch
+from rate_limiter import TokenBucket, CircuitBreaker, backoff_delay
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    fake = FakeClock()
+    with patch("rate_limiter.time.monotonic", fake):
+        yield fake
+
+
+def test_token_bucket_throttles_and_refills(clock):
+    bucket = TokenBucket(capacity=3, window=30)  # one token every 10s
+
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_acquire() == pytest.approx(10)
+
+    clock.now += 10
+    assert bucket.try_acquire() == 0
+
+
+def test_token_bucket_acquire_gives_up_past_timeout(clock):
+    bucket = TokenBucket(capacity=1, window=60)
+    assert bucket.acquire(timeout=1)
+    assert not bucket.acquire(timeout=1)
+
+
+def test_breaker_trip_honors_retry_after(clock):
+    breaker = CircuitBreaker()
+    breaker.trip(30)
+
+    assert breaker.is_open
+    assert not breaker.allow()
+    assert breaker.remaining() == pytest.approx(30)
+
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    # Only one trial call at a time
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, base_cooldown=5)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.is_open
+    assert breaker.remaining() >= 5
+
+
+def test_failed_trial_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=3, base_cooldown=5)
+    breaker.trip(10)
+    clock.now += 10
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.is_open
+
+
+def test_released_trial_lets_the_next_call_through(clock):
+    breaker = CircuitBreaker()
+    breaker.trip(10)
+    clock.now += 10
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.release_trial()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, base=0.5, cap=4) <= 4
@@ -0,0 +1,67 @@
+import pytest
+from scheduler import PollScheduler
+
+
+def _scheduler():
+    return PollScheduler(base_interval=30, max_interval=90, fast_interval=2,
+                         transition_lead=3, idle_max_interval=120)
+
+
+def _playback(progress_s, duration_s, fetched_at=100.0, is_playing=True):
+    return {
+        "is_playing": is_playing,
+        "track_id": "abc123",
+        "progress_ms": int(progress_s * 1000),
+        "duration_ms": int(duration_s * 1000),
+        "fetched_at": fetched_at,
+    }
+
+
+def test_sleeps_until_just_before_track_end():
+    scheduler = _scheduler()
+    # 40s left, poll 3s before the predicted change
+    assert scheduler.next_delay(_playback(160, 200), now=100.0) == pytest.approx(37)
+
+
+def test_accounts_for_time_since_fetch():
+    scheduler = _scheduler()
+    # 5s of the remaining 40s already elapsed during the cycle
+    assert scheduler.next_delay(_playback(160, 200), now=105.0) == pytest.approx(32)
+
+
+def test_long_tracks_capped_at_max_interval():
+    scheduler = _scheduler()
+    assert scheduler.next_delay(_playback(0, 600), now=100.0) == 90
+
+
+def test_polls_fast_around_transition():
+    scheduler = _scheduler()
+    assert scheduler.next_delay(_playback(198, 200), now=100.0) == 2
+    # Overran the predicted end slightly (next track not reported yet)
+    assert scheduler.next_delay(_playback(200, 200), now=110.0) == 2
+
+
+def test_falls_back_to_base_interval_long_after_predicted_end():
+    scheduler = _scheduler()
+    assert scheduler.next_delay(_playback(200, 200), now=200.0) == 30
+
+
+def test_exponential_backoff_while_idle():
+    scheduler = _scheduler()
+    delays = [scheduler.next_delay(None) for _ in range(4)]
+    assert delays == [30, 60, 120, 120]
+
+    # Paused counts as idle; playing again resets the backoff
+    assert scheduler.next_delay(_playback(10, 200, is_playing=False)) == 120
+    scheduler.next_delay(_playback(10, 200), now=100.0)
+    assert scheduler.next_delay(None) == 30
+
+
+def test_waits_for_open_circuit_breaker():
+    from rate_limiter import CircuitBreaker
+
+    scheduler = _scheduler()
+    breaker = CircuitBreaker()
+    breaker.trip(45)
+
+    assert 44 <= scheduler.next_delay(_playback(160, 200), breaker=breaker) <= 45
@@ -4,6 +4,7 @@ from tests.mock_data import (
     MOCK_SPOTIFY_PLAYING,
     MOCK_SPOTIFY_NOT_PLAYING,
     MOCK_ARTIST,
+    MOCK_ARTISTS,
     MOCK_AUDIO_FEATURES,
     MOCK_RECENTLY_PLAYED,
 )
@@ -88,7 +89,7 @@ def test_get_recent_tracks(mock_spotify_cls, mock_oauth):
     mock_sp = MagicMock()
     mock_spotify_cls.return_value = mock_sp
     mock_sp.current_user_recently_played.return_value = MOCK_RECENTLY_PLAYED
-    mock_sp.artist.return_value = MOCK_ARTIST
+    mock_sp.artists.return_value = MOCK_ARTISTS
 
     client = SpotifyClient()
     result = client.get_recent_tracks(limit=10)
@@ -99,6 +100,10 @@ def test_get_recent_tracks(mock_spotify_cls, mock_oauth):
     assert result[0]["genres"] == ["canadian pop", "pop"]
     assert result[2]["name"] == "Levitating"
     assert result[2]["artist"] == "Dua Lipa"
+    assert result[2]["genres"] == ["dance pop", "pop"]
+    # Both artists resolved in a single batched request
+    mock_sp.artists.assert_called_once_with(["artist1", "artist2"])
+    mock_sp.artist.assert_not_called()
 
 
 @patch("spotify_client.SpotifyOAuth")
@@ -114,3 +119,276 @@ def test_get_recent_tracks_handles_error(mock_spotify_cls, mock_oauth):
     result = client.get_recent_tracks()
 
     assert result == []
+
+
+@patch("spotify_client.SpotifyOAuth")
+@patch("spotify_client.spotipy.Spotify")
+def test_recent_tracks_sync_incrementally_from_the_play_log(mock_spotify_cls, mock_oauth):
+    from spotify_client import SpotifyClient
+
+    mock_sp = MagicMock()
+    mock_spotify_cls.return_value = mock_sp
+    mock_sp.current_user_recently_played.return_value = MOCK_RECENTLY_PLAYED
+    mock_sp.artists.return_value = MOCK_ARTISTS
+
+    client = SpotifyClient()
+    client.get_recent_tracks()
+    mock_sp.current_user_recently_played.assert_called_once_with(limit=50)
+
+    # Same track still playing: served from the log, no history request
+    result = client.get_recent_tracks()
+    assert [t["name"] for t in result] == ["Starboy", "Save Your Tears", "Levitating"]
+    assert mock_sp.current_user_recently_played.call_count == 1
+
+    # Track changed: only plays after the newest logged one are requested
+    new_play = {
+        "track": {"name": "Blinding Lights", "artists": [{"id": "artist1", "name": "The Weeknd"}]},
+        "played_at": "2026-02-17T18:53:30.000Z",
+    }
+    mock_sp.current_user_recently_played.return_value = {"items": [new_play]}
+    client.playback = {"track_id": "next-track"}
+    result = client.get_recent_tracks()
+
+    # 2026-02-17T18:50:12Z, when Starboy was played
+    mock_sp.current_user_recently_played.assert_called_with(limit=50, after=1771354212000)
+    assert result[0]["name"] == "Blinding Lights"
+    assert mock_sp.current_user_recently_played.call_count == 2
+
+    # A fresh client (restart) serves history from disk before syncing
+    assert [t["name"] for t in SpotifyClient().history(limit=2)] == ["Blinding Lights", "Starboy"]
+
+
+@patch("spotify_client.SpotifyOAuth")
+@patch("spotify_client.spotipy.Spotify")
+def test_genre_cache_survives_restart(mock_spotify_cls, mock_oauth):
+    from spotify_client import SpotifyClient
+
+    mock_sp = MagicMock()
+    mock_spotify_cls.return_value = mock_sp
+    mock_sp.current_user_playing_track.return_value = MOCK_SPOTIFY_PLAYING
+    mock_sp.artist.return_value = MOCK_ARTIST
+
+    SpotifyClient().get_now_playing()
+    assert mock_sp.artist.call_count == 1
+
+    # A fresh client (cold start) resolves the same artist from disk
+    result = SpotifyClient().get_now_playing()
+    assert result["artist_genres"] == ["canadian pop", "pop"]
+    assert mock_sp.artist.call_count == 1
+
+
+@patch("spotify_client.SpotifyOAuth")
+@patch("spotify_client.spotipy.Spotify")
+def test_resolve_genres_batches_only_uncached_artists(mock_spotify_cls, mock_oauth):
+    from spotify_client import SpotifyClient
+
+    mock_sp = MagicMock()
+    mock_spotify_cls.return_value = mock_sp
+    ids = [f"artist{i}" for i in range(120)]
+    mock_sp.artists.side_effect = lambda chunk: {
+        "artists": [{"id": a, "genres": [f"{a}-genre"]} for a in chunk]
+    }
+
+    client = SpotifyClient()
+    client._genre_cache["artist0"] = ["cached"]
+    genres = client.resolve_genres(ids + ["artist5"])
+
+    assert genres["artist0"] == ["cached"]
+    assert genres["artist119"] == ["artist119-genre"]
+    # 119 uncached artists -> chunks of 50, 50, 19
+    assert [len(c.args[0]) for c in mock_sp.artists.call_args_list] == [50, 50, 19]
+
+    mock_sp.artists.reset_mock()
+    client.resolve_genres(ids)
+    mock_sp.artists.assert_not_called()
+
+
+@patch("spotify_client.SpotifyOAuth")
+@patch("spotify_client.spotipy.Spotify")
+def test_audio_features_fetched_once_per_track(mock_spotify_cls, mock_oauth):
+    from spotify_client import SpotifyClient
+
+    mock_sp = MagicMock()
+    mock_spotify_cls.return_value = mock_sp
+    mock_sp.audio_features.side_effect = lambda chunk: [
+        None if t == "local" else dict(MOCK_AUDIO_FEATURES[0], id=t) for t in chunk
+    ]
+
+    features = SpotifyClient().resolve_audio_features(["abc123", "def456", "local", "abc123"])
+    assert features["abc123"] == MOCK_AUDIO_FEATURES[0]
+    assert "local" not in features
+    mock_sp.audio_features.assert_called_once_with(["abc123", "def456", "local"])
+
+    # Features never change, so a restarted client answers from disk, misses included
+    mock_sp.audio_features.reset_mock()
+    features = SpotifyClient().resolve_audio_features(["abc123", "def456", "local"])
+    assert features["def456"]["energy"] == 0.730
+    mock_sp.audio_features.assert_not_called()
+
+
+@patch("spotify_client.SpotifyOAuth")
+@patch("spotify_client.spotipy.Spotify")
+def test_audio_features_disabled_after_403(mock_spotify_cls, mock_oauth):
+    import spotipy
+    from spotify_client import SpotifyClient
+
+    mock_sp = MagicMock()
+    mock_spotify_cls.return_value = mock_sp
+    mock_sp.audio_features.side_effect = spotipy.exceptions.SpotifyException(403, -1, "Forbidden")
+
+    client = SpotifyClient()
+    assert client.resolve_audio_features(["abc123"]) == {}
+    assert client.resolve_audio_features(["def456"]) == {}
+    assert mock_sp.audio_features.call_count == 1
+
+
+@patch("spotify_client.time.sleep")
+@patch("spotify_client.SpotifyOAuth")
+@patch("spotify_client.spotipy.Spotify")
+def test_rate_limit_opens_breaker_without_sleeping(mock_spotify_cls, mock_oauth, mock_sleep):
+    import spotipy
+    from spotify_client import SpotifyClient
+
+    mock_sp = MagicMock()
+    mock_spotify_cls.return_value = mock_sp
+    mock_sp.current_user_playing_track.side_effect = spotipy.exceptions.SpotifyException(
+        429, -1, "Too Many Requests", headers={"Retry-After": "20"}
+    )
+
+    client = SpotifyClient()
+    assert client.get_now_playing() is client.UNAVAILABLE
+    assert client.rate_limited
+    assert 19 <= client.breaker.remaining() <= 20
+    mock_sleep.assert_not_called()
+
+    # While the breaker is open, Spotify isn't called at all
+    client.get_now_playing()
+    assert mock_sp.current_user_playing_track.call_count == 1
+
+
+@patch("spotify_client.time.sleep")
+@patch("spotify_client.SpotifyOAuth")
+@patch("spotify_client.spotipy.Spotify")
+def test_transient_errors_are_retried(mock_spotify_cls, mock_oauth, mock_sleep):
+    import spotipy
+    from spotify_client import SpotifyClient
+
+    mock_sp = MagicMock()
+    mock_spotify_cls.return_value = mock_sp
+    mock_sp.current_user_playing_track.side_effect = [
+        spotipy.exceptions.SpotifyException(503, -1, "Service Unavailable"),
+        MOCK_SPOTIFY_NOT_PLAYING,
+    ]
+
+    client = SpotifyClient()
+    assert client.get_now_playing() is None
+    assert mock_sp.current_user_playing_track.call_count == 2
+    assert mock_sleep.call_count == 1
+    assert not client.rate_limited
+
+
+@patch("spotify_client.SpotifyOAuth")
+@patch("spotify_client.spotipy.Spotify")
+def test_half_open_trial_released_on_non_transient_error(mock_spotify_cls, mock_oauth):
+    import spotipy
+    from spotify_client import SpotifyClient
+
+    mock_sp = MagicMock()
+    mock_spotify_cls.return_value = mock_sp
+    mock_sp.current_user_playing_track.side_effect = [
+        spotipy.exceptions.SpotifyException(404, -1, "Not Found"),
+        MOCK_SPOTIFY_NOT_PLAYING,
+    ]
+
+    client = SpotifyClient()
+    client.breaker.trip(0)
+    assert client.breaker.state == client.breaker.HALF_OPEN
+    assert client.get_now_playing() is client.UNAVAILABLE
+
+    # The failed trial didn't leave the breaker stuck half-open
+    assert client.get_now_playing() is None
+    assert mock_sp.current_user_playing_track.call_count == 2
+    assert client.breaker.state == client.breaker.CLOSED
+
+
+@patch("spotify_client.SpotifyOAuth")
+@patch("spotify_client.spotipy.Spotify")
+def test_unauthorized_refreshes_token_and_retries(mock_spotify_cls, mock_oauth_cls):
+    import spotipy
+    from spotify_client import SpotifyClient
+
+    mock_sp = MagicMock()
+    mock_spotify_cls.return_value = mock_sp
+    mock_sp.current_user_playing_track.side_effect = [
+        spotipy.exceptions.SpotifyException(401, -1, "The access token expired"),
+        MOCK_SPOTIFY_PLAYING,
+    ]
+    mock_sp.artist.return_value = MOCK_ARTIST
+    mock_oauth_cls.return_value.refresh_access_token.return_value = {
+        "access_token": "new", "refresh_token": "r", "expires_at": 9999999999,
+    }
+
+    client = SpotifyClient()
+    client.token_source._token_info = {"access_token": "old", "refresh_token": "r", "expires_at": 0}
+    result = client.get_now_playing()
+
+    # The cycle isn't lost: refreshed and retried within the same call
+    assert result["name"] == "Blinding Lights"
+    mock_oauth_cls.return_value.refresh_access_token.assert_called_once_with("r")
+    assert client.token_source.get_access_token() == "new"
+    assert not client.rate_limited
+
+
+@patch("spotify_client.SpotifyOAuth")
+@patch("spotify_client.spotipy.Spotify")
+def test_unauthorized_half_open_trial_is_retried(mock_spotify_cls, mock_oauth_cls):
+    import spotipy
+    from spotify_client import SpotifyClient
+
+    mock_sp = MagicMock()
+    mock_spotify_cls.return_value = mock_sp
+    mock_sp.current_user_playing_track.side_effect = [
+        spotipy.exceptions.SpotifyException(401, -1, "The access token expired"),
+        MOCK_SPOTIFY_NOT_PLAYING,
+    ]
+    mock_oauth_cls.return_value.refresh_access_token.return_value = {
+        "access_token": "new", "refresh_token": "r", "expires_at": 9999999999,
+    }
+
+    client = SpotifyClient()
+    client.token_source._token_info = {"access_token": "old", "refresh_token": "r", "expires_at": 0}
+    client.breaker.trip(0)
+    assert client.breaker.state == client.breaker.HALF_OPEN
+
+    # The refreshed retry runs as the trial instead of being skipped, and closes the breaker
+    assert client.get_now_playing() is None
+    assert mock_sp.current_user_playing_track.call_count == 2
+    assert client.breaker.state == client.breaker.CLOSED
+
+
+@patch("spotify_client.SpotifyOAuth")
+def test_first_login_happens_when_the_client_is_built(mock_oauth_cls):
+    from spotify_client import SpotifyTokenSource
+
+    def login(as_dict=False):
+        cache = mock_oauth_cls.call_args.kwargs["cache_handler"]
+        cache.save_token_to_cache({"access_token": "fresh", "refresh_token": "r", "expires_at": 9999999999})
+
+    mock_oauth_cls.return_value.get_access_token.side_effect = login
+
+    token_source = SpotifyTokenSource()
+    mock_oauth_cls.return_value.get_access_token.assert_called_once()
+
+    # Poll threads only ever read the token, never wait on a login
+    assert token_source.get_access_token() == "fresh"
+    mock_oauth_cls.return_value.get_access_token.assert_called_once()
+
+
+def test_token_cache_written_atomically(tmp_path):
+    from spotify_client import AtomicCacheFileHandler
+
+    handler = AtomicCacheFileHandler(cache_path=str(tmp_path / ".cache"))
+    handler.save_token_to_cache({"access_token": "abc", "expires_at": 1})
+
+    assert handler.get_cached_token() == {"access_token": "abc", "expires_at": 1}
+    assert [p.name for p in tmp_path.iterdir()] == [".cache"]
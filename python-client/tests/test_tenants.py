@@ -0,0 +1,126 @@
+import asyncio
+import json
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+import config
+import tenants
+from tenants import TenantPoller, load_tenants
+
+
+def _tenant(user):
+    tenant = MagicMock()
+    tenant.user = user
+    tenant.spotify.playback = None
+    tenant.spotify.breaker.is_open = False
+    tenant.scheduler.next_delay.return_value = 3600
+    return tenant
+
+
+def test_load_tenants_validates_user_ids(tmp_path):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps([{"user": "alice", "calendar_ids": ["primary", "work"]}, {"user": "bob"}]))
+
+    assert load_tenants(str(path)) == [
+        {"user": "alice", "calendar_ids": ["primary", "work"]},
+        {"user": "bob", "calendar_ids": None},
+    ]
+
+    for bad in ([{"user": "../etc"}], [{"user": "bob"}, {"user": "bob"}], [{"calendar_ids": []}]):
+        path.write_text(json.dumps(bad))
+        with pytest.raises(ValueError):
+            load_tenants(str(path))
+
+
+def test_unauthorized_tenant_is_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TENANTS_DIR", str(tmp_path))
+
+    assert tenants.create_tenant({"user": "carol", "calendar_ids": None}, MagicMock(), None, None, None) is None
+
+
+def _write_tokens(user_dir, spotify_token, google_token):
+    user_dir.mkdir()
+    (user_dir / tenants.SPOTIFY_TOKEN_FILE).write_text(json.dumps(spotify_token))
+    (user_dir / tenants.GOOGLE_TOKEN_FILE).write_text(json.dumps(google_token))
+
+
+def test_tenant_without_refreshable_tokens_fails_fast(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TENANTS_DIR", str(tmp_path))
+    monkeypatch.setattr("spotify_client.SpotifyOAuth", MagicMock())
+    login = MagicMock()
+    monkeypatch.setattr("calendar_client.InstalledAppFlow", login)
+    spotify = {"access_token": "a", "refresh_token": "r", "expires_at": 9999999999}
+    google = {
+        "token": "t", "refresh_token": "r", "client_id": "id", "client_secret": "s", "expiry": "2999-01-01T00:00:00Z",
+    }
+
+    # No Spotify refresh token, and an expired Google token that only a login could replace
+    _write_tokens(tmp_path / "dave", {**spotify, "refresh_token": None}, google)
+    _write_tokens(tmp_path / "erin", spotify, {**google, "refresh_token": None, "expiry": "2020-01-01T00:00:00Z"})
+
+    for user in ("dave", "erin"):
+        entry = {"user": user, "calendar_ids": None}
+        assert tenants.create_tenant(entry, MagicMock(), MagicMock(), MagicMock(), None) is None
+    login.from_client_secrets_file.assert_not_called()
+
+
+def test_warns_when_tenants_outgrow_the_shared_spotify_budget(monkeypatch, caplog):
+    monkeypatch.setattr(config, "SPOTIFY_RATE_LIMIT_WINDOW", 30)
+    monkeypatch.setattr(config, "ADAPTIVE_MAX_INTERVAL", 90)
+    monkeypatch.setattr(config, "SPOTIFY_MAX_REQUESTS_PER_WINDOW", 60)
+
+    tenants._check_rate_budget(180)
+    assert not caplog.records
+    tenants._check_rate_budget(181)
+    assert "SPOTIFY_MAX_REQUESTS_PER_WINDOW" in caplog.text
+
+
+def test_poller_caps_concurrency_and_serves_users_in_due_order():
+    users = [_tenant(f"user{i}") for i in range(6)]
+    started, running, peak = [], [0], [0]
+
+    async def cycle(spotify, calendar, emitter):
+        started.append(next(u.user for u in users if u.spotify is spotify))
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.02)
+        running[0] -= 1
+
+    async def scenario():
+        poller = TenantPoller(users, cycle, max_concurrent=2, startup_spread=0.01)
+        task = asyncio.create_task(poller.run())
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(scenario())
+
+    assert started == [u.user for u in users]
+    assert peak[0] == 2
+    for user in users:
+        user.scheduler.next_delay.assert_called_once()
+
+
+def test_slow_tenant_is_cut_off_at_its_deadline_without_blocking_others():
+    slow, fast = _tenant("slow"), _tenant("fast")
+    finished = []
+
+    async def cycle(spotify, calendar, emitter):
+        if spotify is slow.spotify:
+            await asyncio.sleep(10)
+        finished.append(time.monotonic())
+
+    async def scenario():
+        poller = TenantPoller([slow, fast], cycle, max_concurrent=1, cycle_deadline=0.05, startup_spread=0)
+        task = asyncio.create_task(poller.run())
+        started = time.monotonic()
+        await asyncio.sleep(0.3)
+        task.cancel()
+        return started
+
+    started = asyncio.run(scenario())
+
+    assert len(finished) == 1 and finished[0] - started < 0.2
+    # The cut-off tenant is still rescheduled
+    slow.scheduler.next_delay.assert_called_once()
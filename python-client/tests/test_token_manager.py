@@ -0,0 +1,49 @@
+from token_manager import TokenManager, RETRY_INTERVAL
+
+
+class _Source:
+    def __init__(self, name, expires_at, fail=False):
+        self.name = name
+        self._expires_at = expires_at
+        self.fail = fail
+        self.refreshes = 0
+
+    def expires_at(self):
+        return self._expires_at
+
+    def refresh(self):
+        self.refreshes += 1
+        if self.fail:
+            raise RuntimeError("invalid_grant")
+        self._expires_at += 3600
+
+
+def test_refreshes_only_tokens_inside_the_margin():
+    manager = TokenManager(refresh_margin=300, check_interval=60)
+    soon, later, unknown = _Source("soon", 1200), _Source("later", 5000), _Source("unknown", None)
+    for source in (soon, later, unknown):
+        manager.register(source)
+
+    assert manager.refresh_due(now=1000) == ["soon"]
+    assert (soon.refreshes, later.refreshes, unknown.refreshes) == (1, 0, 0)
+    # Now good for another hour
+    assert manager.refresh_due(now=1000) == []
+
+
+def test_failed_refresh_backs_off():
+    manager = TokenManager(refresh_margin=300, check_interval=60)
+    broken = _Source("broken", 1100, fail=True)
+    manager.register(broken)
+
+    manager.refresh_due(now=1000)
+    manager.refresh_due(now=1000 + RETRY_INTERVAL - 1)
+    assert broken.refreshes == 1
+    manager.refresh_due(now=1000 + RETRY_INTERVAL)
+    assert broken.refreshes == 2
+
+
+def test_sleeps_until_next_token_is_due():
+    manager = TokenManager(refresh_margin=300, check_interval=60)
+    manager.register(_Source("spotify", 1330))
+    assert manager._next_wait(now=1000) == 30
+    assert TokenManager(refresh_margin=300, check_interval=60)._next_wait(now=1000) == 60
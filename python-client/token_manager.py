@@ -0,0 +1,74 @@
+import logging
+import threading
+import time
+import config
+
+# background OAuth token refresher shared by the Spotify and Google clients: each client registers a
+# token source (expires_at() + refresh()), and tokens are renewed shortly before they expire so no
+# poll cycle ever waits on, or fails because of, a refresh round trip
+
+logger = logging.getLogger(__name__)
+
+# After a failed refresh, wait this long before trying again
+RETRY_INTERVAL = 30
+
+
+class TokenManager:
+    """Refreshes registered tokens in a daemon thread, REFRESH_MARGIN seconds before expiry."""
+
+    def __init__(self, refresh_margin=None, check_interval=None):
+        self.refresh_margin = refresh_margin or config.TOKEN_REFRESH_MARGIN
+        self.check_interval = check_interval or config.TOKEN_CHECK_INTERVAL
+        self._sources = []
+        self._retry_at = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, source):
+        """Track a token source: needs a `name`, expires_at() -> epoch seconds or None, and refresh()."""
+        self._sources.append(source)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="token-manager", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def refresh_due(self, now=None):
+        """Refresh every token within the margin of expiry. Returns the names refreshed."""
+        now = time.time() if now is None else now
+        refreshed = []
+        for source in self._sources:
+            expires_at = source.expires_at()
+            if expires_at is None or expires_at - now > self.refresh_margin:
+                continue
+            if self._retry_at.get(source.name, 0) > now:
+                continue
+            try:
+                source.refresh()
+                self._retry_at.pop(source.name, None)
+                refreshed.append(source.name)
+                logger.info(f"Refreshed {source.name} token ahead of expiry")
+            except Exception as e:
+                self._retry_at[source.name] = now + RETRY_INTERVAL
+                logger.warning(f"Proactive {source.name} token refresh failed, retrying in {RETRY_INTERVAL}s: {e}")
+        return refreshed
+
+    def _next_wait(self, now):
+        """Sleep until the earliest token enters its refresh margin, at most check_interval."""
+        wait = self.check_interval
+        for source in self._sources:
+            expires_at = source.expires_at()
+            if expires_at is not None:
+                due = max(expires_at - self.refresh_margin, self._retry_at.get(source.name, 0))
+                wait = min(wait, due - now)
+        return max(1.0, wait)
+
+    def _run(self):
+        while True:
+            self.refresh_due()
+            if self._stop.wait(self._next_wait(time.time())):
+                return
@@ -1,5 +1,8 @@
+import json
 import logging
+import os
 import sys
+import tempfile
 
 #configures logging for python client
 def setup_logging():
@@ -11,3 +14,31 @@ def setup_logging():
             logging.FileHandler("vibe_sync.log"),
         ],
     )
+
+
+def atomic_write_json(path, data):
+    """Write JSON to `path` atomically (temp file + rename) so readers never see a partial file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def atomic_write_lines(path, lines):
+    """Rewrite a line-oriented file atomically, like atomic_write_json."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.writelines(line + "\n" for line in lines)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise